@@ -0,0 +1,104 @@
+import hashlib
+import math
+import numpy as np
+
+
+def hash64(value):
+    """Stable 64-bit hash of a value's str(); Python's hash() differs between processes."""
+    return int.from_bytes(hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    """Distinct count in 2**precision one-byte registers.
+
+    The relative standard error is 1.04 / sqrt(2**precision), 1.6% at the default 12 (4 KiB);
+    two sketches merge by taking the larger register, so per-day sketches combine into
+    any range with the same error as one pass over it.
+    """
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, np.uint8)
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def add_all(self, values):
+        if not values:
+            return
+        hashes = np.array([hash64(value) for value in values], np.uint64)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.intp)
+        # Rank = position of the first 1 bit in the remaining 64 - precision bits; the top
+        # 53 of them convert to float exactly, and a zero there is as good as all zeros
+        top = (hashes << np.uint64(self.precision)) >> np.uint64(11)
+        rank = np.full(len(hashes), 64 - self.precision + 1, np.uint8)
+        nonzero = top != 0
+        rank[nonzero] = np.minimum(53 - np.floor(np.log2(top[nonzero].astype(np.float64))), 64 - self.precision + 1)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are still empty
+            return m * math.log(m / zeros)
+        return float(raw)
+
+
+class SpaceSaving:
+    """Top items by weight with at most capacity counters (Metwally et al.).
+
+    Every item whose true weight is over total / capacity is kept. A kept item's count
+    overestimates its true weight by at most its error, which is never more than
+    total / capacity. Merging two summaries keeps those guarantees (Agarwal et al.).
+    """
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self.counters = {}
+        self.total = 0
+
+    def update(self, item, weight=1):
+        self.total += weight
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += weight
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = [weight, 0]
+        else:
+            smallest = min(self.counters, key=lambda key: self.counters[key][0])
+            floor = self.counters.pop(smallest)[0]
+            self.counters[item] = [floor + weight, floor]
+
+    def floor(self):
+        """Most an item outside the summary can have been seen."""
+        return min(counter[0] for counter in self.counters.values()) if len(self.counters) >= self.capacity else 0
+
+    def merge(self, other):
+        floors = (self.floor(), other.floor())
+        merged = {}
+        # In a fixed order (not a set's), so ties rank the same in every process
+        for item in [*self.counters, *(item for item in other.counters if item not in self.counters)]:
+            count = error = 0
+            for summary, floor in zip((self, other), floors):
+                counter = summary.counters.get(item)
+                if counter is None:
+                    count += floor
+                    error += floor
+                else:
+                    count += counter[0]
+                    error += counter[1]
+            merged[item] = [count, error]
+        self.counters = dict(sorted(merged.items(), key=lambda entry: -entry[1][0])[:self.capacity])
+        self.total += other.total
+
+    def top(self, k):
+        """[(item, estimated count, guaranteed count)] for the k largest counters."""
+        return [(item, count, count - error)
+                for item, (count, error) in sorted(self.counters.items(), key=lambda entry: -entry[1][0])[:k]]
@@ -0,0 +1,107 @@
+"""Check the vectorized concurrent-hits counting against the old per-record dict, and time both.
+
+Generates Docker timestamps (a few million by default, plus odd ones: offsets, short
+fractions, leap seconds, Feb 30, junk), counts hits per second the old way, with
+fromisoformat + strftime into a dict with a running maximum, and with
+ConcurrentHitsAccumulator, and requires the same per-second counts and the same peak. Small
+cases where busiest seconds tie with interleaved hits are checked the same way, also with
+every record in its own chunk.
+
+    python bench_concurrency.py --records 2000000
+"""
+import argparse
+import logging
+import random
+import time
+from datetime import datetime
+
+import numpy as np
+
+import fake_loki
+from concurrency import second_strings
+from report_accumulators import ConcurrentHitsAccumulator
+
+ODD_TIMESTAMPS = ["2025-06-16T10:00:00+07:00", "2025-06-16T10:00:00.5Z", "2025-06-16 10:00:01Z", "2025-06-16T23:59:60Z",
+                  "2025-02-30T00:00:00Z", "2025-06-16T24:00:00Z", "2025-06-16T10:00:02.1234567890Z", "not a time", "", None]
+
+# Tied busiest seconds whose hits interleave: the running maximum keeps the second that
+# reaches the peak count first, not the one seen first
+TIE_CASES = [
+    ["2025-06-16T00:00:01Z", "2025-06-16T00:00:02Z", "2025-06-16T00:00:02Z", "2025-06-16T00:00:01Z"],
+    ["2025-06-16T00:00:01Z", "2025-06-16T00:00:02Z", "2025-06-16T00:00:01Z", "2025-06-16T00:00:02Z"],
+    ["2025-06-16T00:00:03Z", "2025-06-16T00:00:01Z", "2025-06-16T00:00:02Z", "2025-06-16T00:00:02Z",
+     "2025-06-16T00:00:01Z", "2025-06-16T00:00:03Z", "2025-06-16T00:00:03Z", "2025-06-16T00:00:01Z"],
+]
+
+
+def make_timestamps(records, seed=0):
+    rnd = random.Random(seed)
+    start = 1750032000 * 10**9
+    timestamps = []
+    for i in range(records):
+        timestamps.append(fake_loki.rfc3339_nano(start + i * 25 * 10**6 + rnd.randrange(10**8)))
+        if i % 100000 == 0:
+            timestamps += ODD_TIMESTAMPS
+    return timestamps
+
+
+def old_counts(timestamps):
+    hits_per_second = {}
+    max_hits = 0
+    max_hits_timestamp = None
+    for timestamp in timestamps:
+        try:
+            dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+            second_key = dt.strftime('%Y-%m-%d %H:%M:%S')
+        except Exception:
+            continue
+        hits_per_second[second_key] = hits_per_second.get(second_key, 0) + 1
+        if hits_per_second[second_key] > max_hits:
+            max_hits = hits_per_second[second_key]
+            max_hits_timestamp = second_key
+    return hits_per_second, (max_hits_timestamp, max_hits)
+
+
+def new_counts(timestamps, chunk_records=None):
+    accumulator = ConcurrentHitsAccumulator()
+    if chunk_records:
+        accumulator.chunk_records = chunk_records
+    for timestamp in timestamps:
+        accumulator.add(timestamp, None, "logs_bench")
+    accumulator.close()
+    seconds, hits = accumulator.counts.per_second()
+    max_second, max_hits = accumulator.counts.running_peak(seconds, hits)
+    max_timestamp = None if max_second is None else second_strings(np.array([max_second]))[0]
+    return accumulator.hits_per_second(), (max_timestamp, max_hits)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=2000000, help="timestamps to count")
+    parser.add_argument("--repeat", type=int, default=3, help="best of this many runs")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    timestamps = make_timestamps(args.records)
+    timings = {old_counts: [], new_counts: []}
+    results = {}
+    for _ in range(args.repeat):
+        for count in (old_counts, new_counts):
+            started = time.perf_counter()
+            results[count] = count(timestamps)
+            timings[count].append(time.perf_counter() - started)
+    same = results[old_counts] == results[new_counts]
+    ties_same = all(old_counts(case) == new_counts(case, chunk_records) for case in TIE_CASES for chunk_records in (None, 1))
+    hits_per_second, (peak_second, peak_hits) = results[new_counts]
+    print(f"{len(timestamps)} timestamps, {len(hits_per_second)} seconds, peak {peak_hits} at {peak_second}")
+    print(f"parity with the per-record dict: {'OK' if same else 'MISMATCH'}")
+    print(f"tied peaks with interleaved hits: {'OK' if ties_same else 'MISMATCH'}")
+    for count, label in ((old_counts, "per-record dict:"), (new_counts, "vectorized:     ")):
+        best = min(timings[count])
+        print(f"{label} {best:.2f}s ({len(timestamps) / best:,.0f} timestamps/s)")
+    if not same or not ties_same:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
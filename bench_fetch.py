@@ -0,0 +1,118 @@
+"""Benchmark get_loki_logs against the local fake Loki (fake_loki.py).
+
+The stand-in runs in this process; every exporter case runs in its own subprocess so its
+peak RSS is measured on its own. For each case it reports records/s, requests issued
+(including injected failures that were retried) and peak RSS.
+
+    python bench_fetch.py --days 2 --peak-per-hour 20000 --concurrency 1 4 --adaptive off on --latency 0.05
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+import fake_loki
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def peak_rss_mb():
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / 1024 / 1024 if sys.platform == 'darwin' else rss / 1024
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 2**20
+        except (ImportError, AttributeError):
+            return None
+
+
+def run_case(case):
+    """Child side: run one exporter with the config overrides in case and print a RESULT line."""
+    os.chdir(REPO_DIR)
+    import get_loki_logs
+    get_loki_logs.config['CONFIG'].update(case['config'])
+    export = get_loki_logs.get_logs_ndjson if case['mode'] == 'ndjson' else get_loki_logs.get_logs_parquet
+    started = time.perf_counter()
+    records = int(export(case['start'], case['end']))
+    elapsed = time.perf_counter() - started
+    print("RESULT " + json.dumps({'records': records, 'seconds': elapsed, 'peak_rss_mb': peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    parser.add_argument("--modes", nargs="+", default=["ndjson", "parquet"], choices=["ndjson", "parquet"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4])
+    parser.add_argument("--adaptive", nargs="+", default=["off"], choices=["off", "on"])
+    parser.add_argument("--shard-hours", type=int, default=1)
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--start", default="2025-06-16T00:00:00Z")
+    parser.add_argument("--days", type=float, default=1)
+    parser.add_argument("--peak-per-hour", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.0, help="mean injected latency per request, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 429/5xx")
+    parser.add_argument("--port", type=int, default=3199)
+    args = parser.parse_args()
+
+    if args.run_case:
+        run_case(json.loads(args.run_case))
+        return
+
+    server = fake_loki.start_server(port=args.port, peak_per_hour=args.peak_per_hour,
+                                    latency=args.latency, error_rate=args.error_rate)
+    start = pd.Timestamp(args.start)
+    end = start + pd.Timedelta(days=args.days)
+
+    results = []
+    for mode, concurrency, adaptive in itertools.product(args.modes, args.concurrency, args.adaptive):
+        out_dir = tempfile.mkdtemp(prefix="bench_fetch_")
+        case = {
+            'mode': mode,
+            'start': start.isoformat().replace('+00:00', 'Z'),
+            'end': end.isoformat().replace('+00:00', 'Z'),
+            'config': {
+                'LOKI_URL': f"http://127.0.0.1:{args.port}/loki/api/v1/query_range",
+                'LIMIT': args.limit,
+                'CONCURRENCY': concurrency,
+                'SHARD_HOURS': args.shard_hours,
+                'ADAPTIVE': adaptive == "on",
+                'BACKOFF_SECONDS': 0.1,
+                'LOG_DIR_NDJSON': out_dir,
+                'LOG_DIR_PARQUET': out_dir,
+            }
+        }
+        requests_before = server.stats['requests']
+        print(f"running {mode} concurrency={concurrency} adaptive={adaptive} ...")
+        child = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-case", json.dumps(case)],
+                               cwd=REPO_DIR, capture_output=True, text=True)
+        shutil.rmtree(out_dir, ignore_errors=True)
+        result_lines = [line for line in child.stdout.splitlines() if line.startswith("RESULT ")]
+        if child.returncode != 0 or not result_lines:
+            print(child.stderr.strip().splitlines()[-1] if child.stderr.strip() else "case failed")
+            results.append((mode, concurrency, adaptive, None, server.stats['requests'] - requests_before))
+            continue
+        result = json.loads(result_lines[-1][len("RESULT "):])
+        results.append((mode, concurrency, adaptive, result, server.stats['requests'] - requests_before))
+
+    print(f"\n{'mode':<8} {'conc':>4} {'adapt':>5} {'records':>9} {'seconds':>8} {'records/s':>10} {'requests':>8} {'peak RSS MB':>11}")
+    for mode, concurrency, adaptive, result, requests_issued in results:
+        if result is None:
+            print(f"{mode:<8} {concurrency:>4} {adaptive:>5} {'FAILED':>9} {'':>8} {'':>10} {requests_issued:>8}")
+            continue
+        rss = f"{result['peak_rss_mb']:.0f}" if result['peak_rss_mb'] is not None else "n/a"
+        print(f"{mode:<8} {concurrency:>4} {adaptive:>5} {result['records']:>9} {result['seconds']:>8.2f} "
+              f"{result['records'] / result['seconds']:>10.0f} {requests_issued:>8} {rss:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Compare Parquet layouts for one day of logs: file size and scan time per setting.
+
+Writes the same day (synthetic lines from fake_loki, or an existing day file with --input)
+once per layout, then times a full read and a tenant-filtered, column-projected dataset
+scan, and counts the row groups whose statistics survive the tenant filter.
+
+    python bench_parquet_layout.py --rows 500000 --tenant kemenkeu.go.id --row-group-sizes 100000 1000000
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import fake_loki
+from log_files import open_log, iter_blocks
+from parquet_logs import parse_log_block, parquet_layout, sort_table
+
+DAY_NS = 86400 * 10**9
+SCAN_COLUMNS = ['apiName', 'applicationOwner', 'applicationName', 'proxyResponseCode', 'time']
+
+LAYOUTS = [
+    ("zstd 3", {'PARQUET_COMPRESSION': 'zstd', 'PARQUET_COMPRESSION_LEVEL': 3}),
+    ("zstd 9", {'PARQUET_COMPRESSION': 'zstd', 'PARQUET_COMPRESSION_LEVEL': 9}),
+    ("snappy, sort tenant+time", {'PARQUET_SORT_BY': ['apiCreatorTenantDomain', 'time']}),
+    ("zstd 3, sort tenant+time", {'PARQUET_COMPRESSION': 'zstd', 'PARQUET_COMPRESSION_LEVEL': 3,
+                                  'PARQUET_SORT_BY': ['apiCreatorTenantDomain', 'time']}),
+]
+
+
+def synthetic_day(rows, seed=0):
+    rnd = random.Random(seed)
+    start = 1750032000 * 10**9
+    tables = []
+    for block_start in range(0, rows, 50000):
+        lines = [fake_loki.make_line(rnd, start + i * (DAY_NS // rows)) for i in range(block_start, min(rows, block_start + 50000))]
+        tables.append(parse_log_block('\n'.join(lines).encode())[0])
+    return pa.concat_tables(tables)
+
+
+def load_day(path):
+    if path.endswith('.parquet'):
+        return pq.read_table(path)
+    with open_log(path, binary=True) as f:
+        return pa.concat_tables([parse_log_block(block)[0] for block in iter_blocks(f)])
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def measure(table, path, sort_by, write_options, row_group_size, tenant, repeat):
+    started = time.perf_counter()
+    pq.write_table(sort_table(table, sort_by), path, row_group_size=row_group_size, **write_options)
+    write_seconds = time.perf_counter() - started
+
+    tenant_filter = pc.field('apiCreatorTenantDomain') == tenant
+    fragment = next(ds.dataset(path, format='parquet').get_fragments())
+    row_groups = fragment.metadata.num_row_groups
+    kept = len(fragment.split_by_row_group(tenant_filter))
+
+    full = best_of(repeat, lambda: pq.read_table(path))
+    filtered = best_of(repeat, lambda: ds.dataset(path, format='parquet').to_table(columns=SCAN_COLUMNS, filter=tenant_filter))
+    return os.path.getsize(path) / 2**20, write_seconds, full, filtered, f"{kept}/{row_groups}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--input", help="day file (.txt/.txt.gz/.txt.zst) or logs.parquet to rewrite instead of synthetic data")
+    parser.add_argument("--rows", type=int, default=300000, help="synthetic rows when no --input")
+    parser.add_argument("--tenant", default="kemenkeu.go.id", help="apiCreatorTenantDomain for the filtered scan")
+    parser.add_argument("--row-group-sizes", nargs="+", type=int, default=[100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    table = load_day(args.input) if args.input else synthetic_day(args.rows)
+    print(f"{table.num_rows} rows, filtering on apiCreatorTenantDomain == {args.tenant!r}\n")
+
+    cases = [("snappy, time sort (previous)", ['time'], {'compression': 'snappy'}, None)]
+    cases.append(("snappy + dictionary columns", *parquet_layout({}), None))
+    for row_group_size in args.row_group_sizes:
+        for name, settings in LAYOUTS:
+            cases.append((f"{name}, {row_group_size} rows/group", *parquet_layout(settings), row_group_size))
+
+    out_dir = tempfile.mkdtemp(prefix="bench_parquet_")
+    try:
+        print(f"{'layout':<42} {'MB':>8} {'write s':>8} {'full read s':>11} {'filtered s':>10} {'row groups':>10}")
+        for index, (name, sort_by, write_options, row_group_size) in enumerate(cases):
+            size, write_seconds, full, filtered, kept = measure(
+                table, os.path.join(out_dir, f"{index}.parquet"), sort_by, write_options, row_group_size, args.tenant, args.repeat)
+            print(f"{name:<42} {size:>8.1f} {write_seconds:>8.2f} {full:>11.3f} {filtered:>10.3f} {kept:>10}")
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
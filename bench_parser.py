@@ -0,0 +1,118 @@
+"""Micro-benchmark the single-pass Metric Value tokenizer against the per-field regex parsers it replaced.
+
+Builds a synthetic corpus from fake_loki's line generator plus a few awkward lines (commas
+and braces inside values, non-numeric latencies), checks that the new parse_log_line
+implementations return exactly what the old ones did, and reports lines/s for each. The
+Parquet converter's row-wise parser is also compared with the Arrow block parser.
+
+    python bench_parser.py --lines 200000
+"""
+import argparse
+import json
+import random
+import re
+import time
+
+import fake_loki
+from log_parser import parse_fields, parse_metric_values
+from parquet_logs import parse_log_block, parse_log_lines
+
+EXTRACT_FIELDS = {
+    "apiName": r'apiName=([^,]+)', "proxyResponseCode": r'proxyResponseCode=([^,]+)',
+    "errorType": r'errorType=([^,]+)', "destination": r'destination=([^,]+)',
+    "apiCreatorTenantDomain": r'apiCreatorTenantDomain=([^,]+)', "platform": r'platform=([^,]+)',
+    "apiMethod": r'apiMethod=([^,]+)', "apiVersion": r'apiVersion=([^,]+)',
+    "gatewayType": r'gatewayType=([^,]+)', "apiCreator": r'apiCreator=([^,]+)',
+    "responseCacheHit": r'responseCacheHit=([^,]+)', "backendLatency": r'backendLatency=(\d+)',
+    "correlationId": r'correlationId=([a-f0-9-]{36})', "requestMediationLatency": r'requestMediationLatency=(\d+)',
+    "keyType": r'keyType=([^,]+)', "apiId": r'apiId=([^,]+)', "applicationName": r'applicationName=([^,]+)',
+    "targetResponseCode": r'targetResponseCode=([^,]+)', "requestTimestamp": r'requestTimestamp=([^,]+)',
+    "applicationOwner": r'applicationOwner=([^,]+)', "userAgent": r'userAgent=([^,]+)',
+    "eventType": r'eventType=([^,]+)', "apiResourceTemplate": r'apiResourceTemplate=([^,]+)',
+    "responseLatency": r'responseLatency=(\d+)', "regionId": r'regionId=([^,]+)',
+    "responseMediationLatency": r'responseMediationLatency=(\d+)', "userIp": r'userIp=([^,]+)',
+    "applicationId": r'applicationId=([^,]+)', "apiType": r'apiType=([^,}]+)',
+}
+ANALYZE_FIELDS = [
+    "apiName", "apiCreator", "apiId", "apiCreatorTenantDomain", "backendLatency",
+    "requestMediationLatency", "responseMediationLatency", "applicationId", "applicationName",
+    "applicationOwner", "userIp", "proxyResponseCode", "targetResponseCode"
+]
+analyze_patterns = {key: re.compile(EXTRACT_FIELDS[key]) for key in ANALYZE_FIELDS}
+
+
+def legacy_extract_parse(log_line):
+    """extract_logs.parse_log_line before the tokenizer: every pattern searched twice."""
+    return {key: re.search(pattern, log_line).group(1) if re.search(pattern, log_line) else None
+            for key, pattern in EXTRACT_FIELDS.items()}
+
+
+def legacy_analyze_parse(log_line):
+    """splp_logs_analyze.parse_log_line before the tokenizer: precompiled, still searched twice."""
+    return {key: pattern.search(log_line).group(1) if pattern.search(log_line) else None
+            for key, pattern in analyze_patterns.items()}
+
+
+def legacy_convert_split(log_line):
+    """The Metric Value split convert_ndjson_to_parquet used before the tokenizer."""
+    metric_match = re.search(r'Metric Value: {(.*?)}', log_line)
+    if not metric_match:
+        return None
+    metric_values = {}
+    for pair in metric_match.group(1).split(', '):
+        if '=' in pair:
+            key, value = pair.split('=', 1)
+            metric_values[key] = value
+    return metric_values
+
+
+def make_corpus(lines, seed=0):
+    rnd = random.Random(seed)
+    start = 1750032000 * 10**9
+    corpus = [json.loads(fake_loki.make_line(rnd, start + i * 10**6))["log"] for i in range(lines)]
+    awkward = corpus[0]
+    corpus[1::97] = [awkward.replace("userAgent=Apache-HttpClient/4.5.13 (Java/11.0.16)",
+                                     "userAgent=Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko)")] * len(corpus[1::97])
+    corpus[2::89] = [awkward.replace("apiResourceTemplate=/*", "apiResourceTemplate=/pets/{petId}")] * len(corpus[2::89])
+    corpus[3::83] = [re.sub(r'backendLatency=\d+', 'backendLatency=', awkward)] * len(corpus[3::83])
+    return corpus
+
+
+def bench(name, parse, corpus, lines=None):
+    started = time.perf_counter()
+    for line in corpus:
+        parse(line)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<34} {(lines or len(corpus)) / elapsed:>12,.0f} lines/s")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=100000)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.lines)
+    extract_keys = list(EXTRACT_FIELDS)
+    mismatches = sum(legacy_extract_parse(line) != parse_fields(line, extract_keys) for line in corpus)
+    mismatches += sum(legacy_analyze_parse(line) != parse_fields(line, ANALYZE_FIELDS) for line in corpus)
+    print(f"parity check on {len(corpus)} lines: {'OK' if mismatches == 0 else f'{mismatches} MISMATCHES'}\n")
+
+    old = bench("extract_logs regex (29 fields)", legacy_extract_parse, corpus)
+    new = bench("tokenizer (29 fields)", lambda line: parse_fields(line, extract_keys), corpus)
+    print(f"{'speedup':<34} {old / new:>12.1f}x\n")
+    old = bench("splp_logs_analyze regex (13 fields)", legacy_analyze_parse, corpus)
+    new = bench("tokenizer (13 fields)", lambda line: parse_fields(line, ANALYZE_FIELDS), corpus)
+    print(f"{'speedup':<34} {old / new:>12.1f}x\n")
+    old = bench("convert split", legacy_convert_split, corpus)
+    new = bench("parse_metric_values", parse_metric_values, corpus)
+    print(f"{'speedup':<34} {old / new:>12.1f}x\n")
+
+    block = "\n".join(json.dumps({"log": line, "stream": "stdout", "time": "2025-06-16T00:00:00.000000001Z"})
+                      for line in corpus).encode()
+    rowwise = parse_log_lines(block.splitlines())[0]
+    vectorized = parse_log_block(block)[0]
+    print(f"parquet table parity: {'OK' if rowwise.equals(vectorized) else 'MISMATCH'}")
+    old = bench("convert row-wise", parse_log_lines, [block.splitlines()], len(corpus))
+    new = bench("convert Arrow block", parse_log_block, [block], len(corpus))
+    print(f"{'speedup':<34} {old / new:>12.1f}x")
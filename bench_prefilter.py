@@ -0,0 +1,140 @@
+"""Check the raw-line prefilter of splp_logs_analyze against decode-first filtering, and time both.
+
+Writes a day file of fake_loki records plus awkward ones (JSON escapes around the tenant and
+the cleanse words, records without a tenant, broken JSON), scans it once with the prefilter
+and once without for every level x cleanse selection, and requires identical processed
+counts and identical All Dataset, Recap and Concurrent Hits results. Pass --input to check
+and time an existing plain day file instead.
+
+    python bench_prefilter.py --lines 200000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import fake_loki
+from report_accumulators import AllDatasetAccumulator, RecapAccumulator, ConcurrentHitsAccumulator
+from splp_logs_analyze import scan_range, print_stages
+
+SELECTIONS = [("1", False), ("1", True), ("2", False), ("2", True)]
+SINGLE_REPORTS = [("1", False, RecapAccumulator), ("1", True, RecapAccumulator), ("2", True, ConcurrentHitsAccumulator)]
+
+
+def awkward_records(rnd, timestamp):
+    """Records whose raw bytes and decoded text disagree somewhere the filters look."""
+    line = json.loads(fake_loki.make_line(rnd, timestamp))["log"].rstrip("\n")
+    national = line.replace(line[line.index("apiCreatorTenantDomain="):].split(",", 1)[0], "apiCreatorTenantDomain=carbon.super")
+    time_value = fake_loki.rfc3339_nano(timestamp)
+    logs = [
+        national.replace("applicationName=", "applicationName=\test-"),     # tab + "est", not dirty
+        national.replace("applicationName=", "applicationName=\\test-"),    # backslash + "test", dirty
+        national.replace("applicationName=", "applicationName=démo-"),  # \u escape anywhere
+        national.replace("applicationName=", "applicationName=test-"),  # plain "test"
+        national.replace("applicationName=", "applicationName=\bimtek-"),   # backspace + "imtek"
+        national.replace("applicationName=", "applicationName=\"quoted\"-"),
+        line.split(", apiCreatorTenantDomain=")[0] + ", apiCreatorTenantDomain=carbon.super",  # tenant ends the string
+        line.split(", apiCreatorTenantDomain=")[0] + ", apiCreatorTenantDomain=kemenkeu.go.id\\",
+        line.replace("apiCreatorTenantDomain=", "apiCreatorTenantDomain=carbon.supér"),
+        line.replace("apiCreatorTenantDomain=", "tenant="),                 # no tenant at all
+    ]
+    records = [json.dumps({"log": log + "\n", "stream": "stdout", "time": time_value}) for log in logs]
+    records += [
+        json.dumps({"log": log + "\n", "stream": "stdout", "time": time_value}, ensure_ascii=False) for log in logs[2:4]]
+    # json.dumps never escapes ASCII; other writers may, so a word or tenant can be hidden in \u escapes
+    escaped = json.dumps({"log": national + "\n", "stream": "stdout", "time": time_value})
+    records += [escaped.replace("applicationName=", "applicationName=tes\\u0074-"),
+                escaped.replace("=carbon.super", "=carbon\\u002esuper")]
+    records += [
+        json.dumps({"log": {"text": national}, "stream": "stdout", "time": time_value}),  # log is not a string
+        json.dumps({"log": national + "\n", "stream": "stdout"}),                         # no time
+        fake_loki.make_line(rnd, timestamp)[:-40],                                         # cut off mid-record
+    ]
+    return records
+
+
+def write_corpus(path, lines, seed=0):
+    rnd = random.Random(seed)
+    start = 1750032000 * 10**9
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(lines):
+            timestamp = start + i * 10**6
+            f.write(fake_loki.make_line(rnd, timestamp) + "\n")
+            if i % 500 == 0:
+                f.write("\n".join(awkward_records(rnd, timestamp)) + "\n")
+
+
+def scan(path, out_dir, prefilter):
+    selections = []
+    for index, (iL, cleanse_data) in enumerate(SELECTIONS):
+        part_file = os.path.join(out_dir, f"{'raw' if prefilter else 'decoded'}_{index}.csv")
+        selections.append((iL, cleanse_data, {AllDatasetAccumulator: AllDatasetAccumulator(part_file),
+                                               RecapAccumulator: RecapAccumulator(),
+                                               ConcurrentHitsAccumulator: ConcurrentHitsAccumulator()}))
+    started = time.perf_counter()
+    stages, processed, accumulators = scan_range(path, 0, os.path.getsize(path), "logs_bench", selections, prefilter)
+    return time.perf_counter() - started, stages, processed, accumulators
+
+
+def results(accumulators):
+    rows = []
+    for partial in accumulators:
+        with open(partial[AllDatasetAccumulator].part_files[0], "rb") as f:
+            all_dataset = f.read()
+        counts = partial[ConcurrentHitsAccumulator].counts
+        seconds, api_codes, tenant_codes, hits = counts.table()
+        apis, tenants = list(counts.apis), list(counts.tenants)
+        concurrent = sorted(zip(seconds.tolist(), [apis[code] for code in api_codes], [tenants[code] for code in tenant_codes], hits.tolist()),
+                            key=repr)
+        rows.append((all_dataset, list(partial[RecapAccumulator].items()), concurrent))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--input", help="plain NDJSON day file to scan instead of the synthetic corpus")
+    parser.add_argument("--lines", type=int, default=100000, help="synthetic records when no --input")
+    parser.add_argument("--repeat", type=int, default=3, help="best of this many runs for the single-report timings")
+    args = parser.parse_args()
+
+    out_dir = tempfile.mkdtemp(prefix="bench_prefilter_")
+    path = args.input
+    if path is None:
+        path = os.path.join(out_dir, "logs_bench.txt")
+        write_corpus(path, args.lines)
+
+    decoded_seconds, decoded_stages, decoded_processed, decoded_accumulators = scan(path, out_dir, prefilter=False)
+    raw_seconds, raw_stages, raw_processed, raw_accumulators = scan(path, out_dir, prefilter=True)
+
+    same = decoded_processed == raw_processed and results(decoded_accumulators) == results(raw_accumulators)
+    print(f"{raw_stages['records']} records, selections National/Internal x raw/cleansed, processed {raw_processed}")
+    print(f"parity with decode-first filtering: {'OK' if same else 'MISMATCH'}")
+    print(f"\ndecode first: {decoded_seconds:.2f}s ({decoded_stages['records'] / decoded_seconds:,.0f} records/s)")
+    print(f"prefilter:    {raw_seconds:.2f}s ({raw_stages['records'] / raw_seconds:,.0f} records/s)")
+    print_stages(raw_stages)
+    decoded = {}
+    for iL, cleanse_data, accumulator_class in SINGLE_REPORTS:
+        print(f"\n{'National' if iL == '1' else 'Internal'}{', cleansed' if cleanse_data else ''} "
+              f"{accumulator_class.__name__[:-len('Accumulator')]} only (an interactive run):")
+        timings = {False: [], True: []}
+        for _ in range(args.repeat):
+            for prefilter in (False, True):
+                selections = [(iL, cleanse_data, {accumulator_class: accumulator_class()})]
+                started = time.perf_counter()
+                stages, processed, _ = scan_range(path, 0, os.path.getsize(path), "logs_bench", selections, prefilter)
+                timings[prefilter].append(time.perf_counter() - started)
+                decoded[prefilter] = stages["decoded"]
+        for prefilter in (False, True):
+            print(f"{'prefilter:   ' if prefilter else 'decode first:'} {min(timings[prefilter]):.2f}s, "
+                  f"decoded {decoded[prefilter]} of {stages['records']}")
+    for name in os.listdir(out_dir):
+        os.remove(os.path.join(out_dir, name))
+    os.rmdir(out_dir)
+    if not same:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
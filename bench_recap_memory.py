@@ -0,0 +1,84 @@
+"""Compare the memory of the compact RecapAccumulator with the old dict-of-dicts layout.
+
+Feeds the same synthetic month of recap keys (tens of thousands of client IPs, each calling a
+few APIs on some of the days) to both, checks they hold the same counts, and reports the
+traced memory and the (untraced) time of each.
+
+    python bench_recap_memory.py --hits 2000000 --days 30
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from report_accumulators import RecapAccumulator
+
+
+class DictRecap:
+    """The previous layout: {key tuple: {log_date: count}}."""
+
+    def __init__(self):
+        self.hits = {}
+
+    def add_count(self, key, log_date, count):
+        by_date = self.hits.get(key)
+        if by_date is None:
+            by_date = self.hits[key] = {}
+        by_date[log_date] = by_date.get(log_date, 0) + count
+
+    def items(self):
+        return self.hits.items()
+
+
+def make_hits(hits, days, seed=0):
+    rnd = random.Random(seed)
+    owners = [f"owner{i}" for i in range(300)]
+    apis = [(f"creator{i % 40}", f"api-{i}", "carbon.super" if i % 3 else f"tenant{i % 20}.go.id") for i in range(120)]
+    # Each client (owner, app, ip) calls a handful of APIs, on some of the days
+    clients = [(rnd.choice(owners), f"app-{rnd.randrange(900)}", f"10.{rnd.randrange(256)}.{rnd.randrange(256)}.{rnd.randrange(1, 255)}",
+                rnd.sample(apis, rnd.randrange(1, 6))) for _ in range(hits // 50)]
+    for _ in range(hits):
+        owner, app, ip, client_apis = rnd.choice(clients)
+        creator, api, tenant = rnd.choice(client_apis)
+        yield (creator, api, owner, app, ip, tenant), f"logs_2025-06-{rnd.randrange(days) + 1:02d}"
+
+
+def fill(accumulator_class, hits):
+    accumulator = accumulator_class()
+    for key, log_date in hits:
+        # Fresh strings per hit, as parsed log fields are
+        accumulator.add_count(tuple("".join(part) for part in key), log_date, 1)
+    return accumulator
+
+
+def measure(accumulator_class, hits):
+    started = time.perf_counter()
+    fill(accumulator_class, hits)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    accumulator = fill(accumulator_class, hits)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return accumulator, memory, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hits", type=int, default=2000000, help="recap hits to count")
+    parser.add_argument("--days", type=int, default=30, help="days the hits are spread over")
+    args = parser.parse_args()
+
+    hits = list(make_hits(args.hits, args.days))
+    old, old_memory, old_seconds = measure(DictRecap, hits)
+    new, new_memory, new_seconds = measure(RecapAccumulator, hits)
+    same = list(old.items()) == list(new.items())
+    print(f"{args.hits} hits, {len(new.rows)} keys over {len(new.days)} days")
+    print(f"same counts: {'OK' if same else 'MISMATCH'}")
+    print(f"dict of dicts: {old_memory / 2**20:8.1f} MiB, {old_seconds:.2f}s")
+    print(f"compact:       {new_memory / 2**20:8.1f} MiB, {new_seconds:.2f}s ({new_memory / old_memory:.0%} of the memory)")
+    if not same:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
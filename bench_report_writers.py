@@ -0,0 +1,99 @@
+"""Compare writing a Daily recap-shaped report with the old in-memory workbook and the report writers.
+
+The old way appends every row to a regular openpyxl Workbook, then fits each column over all
+of its cells before saving. The xlsx writer streams a write-only workbook sized from a sample;
+csv and parquet are timed too. Checks that the xlsx files hold the same cells and reports the
+time and the traced peak memory of each.
+
+    python bench_report_writers.py --rows 100000 --days 30
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import openpyxl
+
+from report_accumulators import RECAP_HEADER
+from report_writers import REPORT_WRITERS, open_report
+
+
+def make_rows(rows, days, seed=0):
+    rnd = random.Random(seed)
+    for _ in range(rows):
+        by_day = [rnd.choice([0, 0, rnd.randrange(1, 5000)]) for _ in range(days)]
+        yield ["Tidak Terdaftar", f"creator{rnd.randrange(40)}", f"api-{rnd.randrange(120)}", "Tidak Terdaftar",
+               "carbon.super", f"owner{rnd.randrange(300)}", f"app-{rnd.randrange(900)}",
+               f"10.{rnd.randrange(256)}.{rnd.randrange(256)}.{rnd.randrange(1, 255)}", sum(by_day)] + by_day
+
+
+def write_workbook(stem, header, rows):
+    """The previous writer: a full Workbook, then every cell stringified to fit the widths."""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Recap"
+    ws.append(header)
+    for row in rows:
+        ws.append(row)
+    for column_cells in ws.columns:
+        length = max(len(str(cell.value)) for cell in column_cells)
+        ws.column_dimensions[column_cells[0].column_letter].width = length + 2
+    wb.save(f"{stem}.xlsx")
+
+
+def write_report(report_format):
+    def write(stem, header, rows):
+        report = open_report(stem, report_format)
+        ws = report.sheet("Recap", header)
+        for row in rows:
+            ws.append(row)
+        report.close()
+    return write
+
+
+def measure(write, stem, header, rows):
+    started = time.perf_counter()
+    write(stem, header, rows)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    write(stem, header, rows)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def cells(path):
+    wb = openpyxl.load_workbook(path, read_only=True)
+    return [list(row) for row in wb.active.iter_rows(values_only=True)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000, help="recap rows to write")
+    parser.add_argument("--days", type=int, default=30, help="day columns of the Daily view")
+    args = parser.parse_args()
+
+    rows = list(make_rows(args.rows, args.days))
+    header = RECAP_HEADER + [f"logs_2025-06-{day + 1:02d}" for day in range(args.days)]
+    folder = tempfile.mkdtemp()
+    results = {"workbook": measure(write_workbook, os.path.join(folder, "old"), header, rows)}
+    for report_format in REPORT_WRITERS:
+        results[report_format] = measure(write_report(report_format), os.path.join(folder, report_format), header, rows)
+    same = cells(os.path.join(folder, "old.xlsx")) == cells(os.path.join(folder, "xlsx.xlsx"))
+    print(f"{args.rows} rows x {len(header)} columns")
+    print(f"same cells: {'OK' if same else 'MISMATCH'}")
+    old_seconds = results["workbook"][0]
+    for name, (seconds, peak) in results.items():
+        size = sum(os.path.getsize(os.path.join(folder, f)) for f in os.listdir(folder) if f.startswith("old" if name == "workbook" else name))
+        print(f"{name:>9}: {seconds:6.2f}s ({old_seconds / seconds:4.1f}x), peak {peak / 2**20:7.1f} MiB, {size / 2**20:6.1f} MiB on disk")
+    for f in os.listdir(folder):
+        os.remove(os.path.join(folder, f))
+    os.rmdir(folder)
+    if not same:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import calendar
+import logging
+from datetime import datetime
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Bucket widths in seconds for the peak and percentile report
+RESOLUTIONS = [(1, "1s"), (10, "10s"), (60, "1min"), (3600, "1h")]
+PERCENTILES = [50, 95, 99]
+UNKNOWN = "(unknown)"
+
+# Docker's own `time` format; anything else is left to datetime.fromisoformat
+DOCKER_TIME = r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?Z$'
+SECOND_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+def epoch_seconds(timestamps):
+    """(seconds, valid) arrays for a list of ISO timestamps.
+
+    seconds is the int64 epoch second of each timestamp's wall-clock time, the second the old
+    fromisoformat + strftime('%Y-%m-%d %H:%M:%S') key named. Docker's ...Z form is parsed in
+    bulk by Arrow and only trusted when it formats back to the same text (Arrow's strptime
+    rolls 23:59:60 or Feb 30 over); the rest go through fromisoformat one by one, and the
+    ones that fail are logged and left invalid.
+    """
+    try:
+        values = pa.array(timestamps, pa.string())
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        values = pa.array([timestamp if isinstance(timestamp, str) else None for timestamp in timestamps], pa.string())
+    head = pc.utf8_slice_codeunits(values, 0, 19)
+    parsed = pc.strptime(head, format=SECOND_FORMAT, unit='s', error_is_null=True)
+    canonical = pc.and_(pc.match_substring_regex(values, DOCKER_TIME), pc.equal(pc.strftime(parsed, format=SECOND_FORMAT), head))
+    valid = pc.fill_null(canonical, False).to_numpy(zero_copy_only=False).copy()
+    seconds = pc.fill_null(pc.cast(parsed, pa.int64()), 0).to_numpy(zero_copy_only=False).copy()
+    for index in np.flatnonzero(~valid):
+        timestamp = timestamps[index]
+        try:
+            dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+        except Exception as e:
+            logging.warning(f"Failed to process timestamp: {timestamp} - {str(e)}")
+            continue
+        seconds[index] = calendar.timegm(dt.timetuple())
+        valid[index] = True
+    return seconds, valid
+
+
+def second_strings(seconds):
+    """'YYYY-MM-DD HH:MM:SS' for an array of epoch seconds."""
+    return [text.replace('T', ' ') for text in np.datetime_as_string(seconds.astype('datetime64[s]')).tolist()]
+
+
+def group_sum(keys, hits):
+    """Sort by the key arrays (first one most significant) and sum hits per distinct key."""
+    order = np.lexsort(keys[::-1])
+    keys = [key[order] for key in keys]
+    changed = np.zeros(len(order), bool)
+    if len(order):
+        changed[0] = True
+    for key in keys:
+        changed[1:] |= key[1:] != key[:-1]
+    starts = np.flatnonzero(changed)
+    return [key[starts] for key in keys], np.add.reduceat(hits[order], starts) if len(starts) else hits[:0]
+
+
+def group_max(keys, values):
+    """(distinct keys, the largest value of each), keys sorted."""
+    order = np.argsort(keys, kind='stable')
+    keys, values = keys[order], values[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return keys[starts], np.maximum.reduceat(values, starts)
+
+
+def resolution_stats(seconds, series, hits, width):
+    """Per series at one bucket width: (series, active buckets, peak hits, peak bucket start, p50, p95, p99 hits).
+
+    Percentiles are over the buckets with at least one hit, like the per-second average; the
+    peak is the earliest bucket with the most hits.
+    """
+    (series, buckets), hits = group_sum([series, seconds // width], hits)
+    rows = []
+    bounds = np.flatnonzero(np.r_[True, series[1:] != series[:-1]]).tolist() + [len(series)] if len(series) else [0]
+    for begin, end in zip(bounds[:-1], bounds[1:]):
+        counts = hits[begin:end]
+        peak = int(np.argmax(counts))
+        rows.append((int(series[begin]), end - begin, int(counts[peak]), int(buckets[begin + peak]) * width,
+                     *np.percentile(counts, PERCENTILES).tolist()))
+    return rows
+
+
+class HitCounts:
+    """Hits per (second, API, tenant), counted from per-record arrays in bulk.
+
+    Each add() aggregates one chunk of records in log order; merge() folds in another
+    HitCounts (a later byte range) by remapping its API and tenant codes. The log position of
+    every second's last hit is kept for the legacy running-maximum peak.
+    """
+
+    def __init__(self):
+        self.apis = {}
+        self.tenants = {}
+        self.parts = []
+        self.lasts = []
+        self.records = 0
+
+    @staticmethod
+    def codes(names, values):
+        return np.fromiter((names.setdefault(value, len(names)) for value in values), np.int64, len(values))
+
+    @staticmethod
+    def arrow_codes(names, values):
+        encoded = pc.dictionary_encode(values)
+        if isinstance(encoded, pa.ChunkedArray):
+            encoded = encoded.combine_chunks()
+        mapping = [names.setdefault(value, len(names)) for value in encoded.dictionary.to_pylist()]
+        mapping.append(names.setdefault(None, len(names)) if encoded.null_count else -1)
+        return np.array(mapping, np.int64)[pc.fill_null(encoded.indices, -1).to_numpy(zero_copy_only=False)]
+
+    def add(self, seconds, api_codes, tenant_codes):
+        if not len(seconds):
+            return
+        unique, last = np.unique(seconds[::-1], return_index=True)
+        self.lasts.append((unique, len(seconds) - 1 - last + self.records))
+        self.records += len(seconds)
+        keys, hits = group_sum([seconds, api_codes, tenant_codes], np.ones(len(seconds), np.int64))
+        self.parts.append((*keys, hits))
+
+    def merge(self, other):
+        api_map = np.array([self.apis.setdefault(name, len(self.apis)) for name in other.apis], np.int64)
+        tenant_map = np.array([self.tenants.setdefault(name, len(self.tenants)) for name in other.tenants], np.int64)
+        for seconds, api_codes, tenant_codes, hits in other.parts:
+            self.parts.append((seconds, api_map[api_codes], tenant_map[tenant_codes], hits))
+        for seconds, last in other.lasts:
+            self.lasts.append((seconds, last + self.records))
+        self.records += other.records
+
+    def table(self):
+        """(seconds, api codes, tenant codes, hits), one row per distinct triple, sorted."""
+        if not self.parts:
+            empty = np.zeros(0, np.int64)
+            return empty, empty, empty, empty
+        if len(self.parts) > 1:
+            columns = [np.concatenate(column) for column in zip(*self.parts)]
+            keys, hits = group_sum(columns[:3], columns[3])
+            self.parts = [(*keys, hits)]
+        return self.parts[0]
+
+    def per_second(self):
+        """(seconds, hits) over all APIs and tenants, in time order."""
+        seconds, _, _, hits = self.table()
+        (seconds,), hits = group_sum([seconds], hits)
+        return seconds, hits
+
+    def running_peak(self, seconds, hits):
+        """(second, hits) of the busiest second, as the old running maximum picked it.
+
+        That maximum only moved on a strictly higher count, so among tied seconds it kept the
+        one that reached the peak first in the logs; a busiest second reaches the peak with
+        its last hit, so that is the tied second whose last hit comes first.
+        """
+        if not len(hits):
+            return None, 0
+        peak = hits.max()
+        busiest = seconds[hits == peak]
+        last_seconds = np.concatenate([part[0] for part in self.lasts])
+        last_seen = np.concatenate([part[1] for part in self.lasts])
+        # A second split over chunks has a last hit in each; only the latest one counts
+        candidates = np.isin(last_seconds, busiest)
+        candidate_seconds, reached = group_max(last_seconds[candidates], last_seen[candidates])
+        return int(candidate_seconds[np.argmin(reached)]), int(peak)
+
+    def resolution_rows(self):
+        """Rows of [scope, name, resolution, active buckets, peak hits, peak bucket, peak, p50, p95, p99 rate/s]."""
+        seconds, api_codes, tenant_codes, hits = self.table()
+        scopes = [("All", np.zeros(len(seconds), np.int64), ["All"]),
+                  ("API", api_codes, [UNKNOWN if name is None else name for name in self.apis]),
+                  ("Tenant", tenant_codes, [UNKNOWN if name is None else name for name in self.tenants])]
+        rows = []
+        for scope, series, names in scopes:
+            by_series = {}
+            for width, label in RESOLUTIONS:
+                for code, active, peak_hits, peak_start, *percentiles in resolution_stats(seconds, series, hits, width):
+                    by_series.setdefault(code, []).append(
+                        [scope, names[code], label, active, peak_hits, second_strings(np.array([peak_start]))[0],
+                         round(peak_hits / width, 3)] + [round(value / width, 3) for value in percentiles])
+            for code in sorted(by_series, key=lambda code: names[code]):
+                rows += by_series[code]
+        return rows
@@ -1,7 +1,3 @@
-import requests
-import json
-import re
-from datetime import datetime, timedelta
 import time
 import pandas as pd
 import os
@@ -9,139 +5,54 @@ import yaml
 import pyarrow as pa
 import pyarrow.parquet as pq
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from parquet_logs import parse_log_block, day_partition_path, parquet_layout, sort_table
+from log_files import log_file_date, open_log, iter_blocks
+from log_scan import get_worker_count
 
 tenantDomain = set()
 
-def parse_log_content(log_content):
-    """Parse the structured log content into a dictionary of fields."""
-    try:
-        log_message = log_content["log"]
-        
-        metric_match = re.search(r'Metric Value: {(.*?)}', log_message)
-        if metric_match:
-            metric_value_str = metric_match.group(1)
-            
-            metric_values = {}
-            for pair in metric_value_str.split(', '):
-                if '=' in pair:
-                    key, value = pair.split('=', 1)
-                    if key in ['proxyResponseCode', 'backendLatency', 'requestMediationLatency', 
-                             'targetResponseCode', 'responseLatency', 'responseMediationLatency']:
-                        value = int(value) if value.isdigit() else None
-                    elif key in ['responseCacheHit']:
-                        value = True if value.lower() == 'true' else False
-                    elif key in ['requestTimestamp']:
-                        value = pd.to_datetime(value).tz_localize(None) if value else None
-                    else:
-                        value = str(value) if value else None
-                    metric_values[key] = value
-            
-            default_values = {
-                'apiName': None,
-                'proxyResponseCode': None,
-                'errorType': None,
-                'destination': None,
-                'apiCreatorTenantDomain': None,
-                'platform': None,
-                'apiMethod': None,
-                'apiVersion': None,
-                'gatewayType': None,
-                'apiCreator': None,
-                'responseCacheHit': None,
-                'backendLatency': None,
-                'correlationId': None,
-                'requestMediationLatency': None,
-                'keyType': None,
-                'apiId': None,
-                'applicationName': None,
-                'targetResponseCode': None,
-                'requestTimestamp': None,
-                'applicationOwner': None,
-                'userAgent': None,
-                'eventType': None,
-                'apiResourceTemplate': None,
-                'regionId': None,
-                'responseLatency': None,
-                'responseMediationLatency': None,
-                'userIp': None,
-                'apiContext': None,
-                'applicationId': None,
-                'apiType': None,
-                'stream': str(log_content.get("stream")) if log_content.get("stream") else None,
-                'time': pd.to_datetime(log_content.get("time")).tz_localize(None) if log_content.get("time") else None
-            }
-            
-            default_values.update(metric_values)
-            
-            return default_values
-            
-    except Exception as e:
-        print(f"Error parsing log content: {str(e)}")
-        return None
+def load_settings():
+    """CONFIG from config.yaml for the PARQUET_* and ROW_GROUP_SIZE keys; defaults if it's missing."""
+    if not os.path.exists("config.yaml"):
+        return {}
+    with open("config.yaml") as f:
+        return yaml.safe_load(f).get('CONFIG', {})
 
-def write_logs_to_parquet(logs, current_date, log_dir):
-    parsed_logs = []
-    for log in logs:
-        parsed_log = parse_log_content(log)
-        if parsed_log:
-            parsed_logs.append(parsed_log)
-    
-    if not parsed_logs:
+def write_logs_to_parquet(tables, current_date, log_dir, settings):
+    table = pa.concat_tables(tables)
+    if table.num_rows == 0:
         print("No valid logs to write")
         return
         
-    df = pd.DataFrame(parsed_logs)
-
-    timestamp_columns = ['requestTimestamp', 'time']
-    for col in timestamp_columns:
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col]).dt.floor('us')
-    
-    df = df.sort_values("time", kind="stable")
+    sort_by, write_options = parquet_layout(settings)
+    table = sort_table(table, sort_by)
     
-    schema = pa.schema([
-        ('apiName', pa.string()),
-        ('proxyResponseCode', pa.int32()),
-        ('destination', pa.string()),
-        ('apiCreatorTenantDomain', pa.string()),
-        ('platform', pa.string()),
-        ('apiMethod', pa.string()),
-        ('apiVersion', pa.string()),
-        ('gatewayType', pa.string()),
-        ('apiCreator', pa.string()),
-        ('responseCacheHit', pa.bool_()),
-        ('backendLatency', pa.int32()),
-        ('correlationId', pa.string()),
-        ('requestMediationLatency', pa.int32()),
-        ('keyType', pa.string()),
-        ('apiId', pa.string()),
-        ('applicationName', pa.string()),
-        ('targetResponseCode', pa.int32()),
-        ('requestTimestamp', pa.timestamp('us')),
-        ('applicationOwner', pa.string()),
-        ('userAgent', pa.string()),
-        ('eventType', pa.string()),
-        ('apiResourceTemplate', pa.string()),
-        ('regionId', pa.string()),
-        ('responseLatency', pa.int32()),
-        ('responseMediationLatency', pa.int32()),
-        ('userIp', pa.string()),
-        ('apiContext', pa.string()),
-        ('applicationId', pa.string()),
-        ('apiType', pa.string()),
-        ('stream', pa.string()),
-        ('time', pa.timestamp('us'))
-    ])
-    
-    table = pa.Table.from_pandas(df, schema=schema)
-    
-    print_time_str = pd.Timestamp(current_date).strftime('%Y-%m-%d')
-    partition_path = os.path.join(log_dir, f'day={print_time_str}')
-    os.makedirs(partition_path, exist_ok=True)
+    parquet_path = day_partition_path(log_dir, current_date)
+    pq.write_table(table, parquet_path, row_group_size=int(settings.get('ROW_GROUP_SIZE', 100000)), **write_options)
+    print(f"Written {table.num_rows} records to {parquet_path}")
+    return table.num_rows
+
+def convert_file(file_path, parquet_dir, settings):
+    """Convert one day file into its day= partition and return its counts.
+
+    Top-level so it can run in a ProcessPoolExecutor worker; every file writes its own
+    partition, so workers never touch the same output.
+    """
+    started = time.time()
+    current_date = pd.to_datetime(log_file_date(file_path))
+    tables = []
+    decoded = errors = 0
+    with open_log(file_path, binary=True) as f:
+        for block in iter_blocks(f):
+            table, block_decoded, block_errors = parse_log_block(block)
+            tables.append(table)
+            decoded += block_decoded
+            errors += block_errors
     
-    parquet_path = os.path.join(partition_path, 'logs.parquet')
-    pq.write_table(table, parquet_path, compression='snappy')
-    print(f"Written {len(parsed_logs)} records to {parquet_path}")
+    written = write_logs_to_parquet(tables, current_date, parquet_dir, settings) if decoded else 0
+    return {'file': os.path.basename(file_path), 'records': decoded, 'written': written or 0,
+            'errors': errors, 'seconds': time.time() - started}
 
 def get_date_range():
     try:
@@ -183,14 +94,12 @@ def convert_ndjson_to_parquet():
     
     os.makedirs(parquet_dir, exist_ok=True)
     
-    ndjson_files = [f for f in os.listdir(ndjson_dir) if f.endswith('.txt')]
-    total_records = 0
+    ndjson_files = [f for f in os.listdir(ndjson_dir) if log_file_date(f) is not None]
     
     files_to_process = []
     for file_name in ndjson_files:
         try:
-            date_str = file_name.replace('logs_', '').replace('.txt', '')
-            file_date = pd.to_datetime(date_str)
+            file_date = pd.to_datetime(log_file_date(file_name))
             
             if start_date is None or (start_date <= file_date <= end_date):
                 files_to_process.append(file_name)
@@ -214,27 +123,46 @@ def convert_ndjson_to_parquet():
     else:
         print(f"\nProcessing files from {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
     
-    for file_name in files_to_process:
-        date_str = file_name.replace('logs_', '').replace('.txt', '')
-        current_date = pd.to_datetime(date_str)
-        
-        file_path = os.path.join(ndjson_dir, file_name)
-        print(f"\nProcessing {file_name}...")
-        
-        current_logs = []
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
+    workers = min(get_worker_count(), len(files_to_process))
+    settings = load_settings()
+    file_paths = [os.path.join(ndjson_dir, file_name) for file_name in files_to_process]
+    results = []
+    failed = []
+    
+    def report(file_name, result):
+        results.append(result)
+        print(f"[{len(results) + len(failed)}/{len(file_paths)}] {file_name}: {result['records']} records, "
+              f"{result['errors']} errors, {result['seconds']:.1f}s")
+    
+    if workers == 1:
+        for file_path in file_paths:
+            file_name = os.path.basename(file_path)
+            print(f"\nProcessing {file_name}...")
+            try:
+                report(file_name, convert_file(file_path, parquet_dir, settings))
+            except Exception as e:
+                failed.append(file_name)
+                print(f"Failed to convert {file_name}: {str(e)}")
+    else:
+        print(f"Converting {len(file_paths)} files with {workers} worker processes")
+        # Each worker parses whole days with Arrow; one Arrow thread per process avoids oversubscription
+        with ProcessPoolExecutor(max_workers=workers, initializer=pa.set_cpu_count, initargs=(1,)) as executor:
+            futures = {executor.submit(convert_file, file_path, parquet_dir, settings): os.path.basename(file_path)
+                       for file_path in file_paths}
+            for future in as_completed(futures):
+                file_name = futures[future]
                 try:
-                    log_content = json.loads(line.strip())
-                    current_logs.append(log_content)
-                except json.JSONDecodeError as e:
-                    print(f"Error parsing line in {file_name}: {str(e)}")
-                    continue
-        
-        if current_logs:
-            write_logs_to_parquet(current_logs, current_date, parquet_dir)
-            total_records += len(current_logs)
-            print(f"Converted {len(current_logs)} records from {file_name}")
+                    report(file_name, future.result())
+                except Exception as e:
+                    failed.append(file_name)
+                    print(f"Failed to convert {file_name}: {str(e)}")
+    
+    total_records = sum(result['records'] for result in results)
+    print(f"\nSummary: {len(results)} files converted, {len(failed)} failed")
+    print(f"Records read: {total_records}, written: {sum(result['written'] for result in results)}, "
+          f"lines with errors: {sum(result['errors'] for result in results)}")
+    for file_name in sorted(failed):
+        print(f"Failed: {file_name}")
     
     return total_records
 
@@ -1,21 +1,15 @@
 import json
-import re
-from collections import defaultdict
 from pathlib import Path
 import csv
 import sys
 import pandas as pd
-import openpyxl
 import logging
-import os
 from datetime import datetime
+from log_scan import get_worker_count, select_day_files, split_ranges, iter_range_lines, run_ranges, concat_parts
+from log_parser import parse_fields
 
 folder = Path("D:/SPLP_Logs")
 
-if not folder.exists() or not any(folder.iterdir()):
-    print("'logs' folder tidak ditemukan")
-    sys.exit()
-
 
 CSV_HEADERS = [
     "log_timestamp", "api_name", "proxy_response_code", "error_type", "destination",
@@ -28,72 +22,19 @@ CSV_HEADERS = [
 ]
 
 
-def iterate_logs(date):
-    total_records = 0
-    processed_records = 0
-    for file in folder.iterdir():
-        if not file.is_file():
-            continue
-        if date is not None:
-            if isinstance(date, tuple):
-                if not (date[0] <= file.stem.split('_')[1] <= date[1]):
-                    continue
-            else:  
-                if file.stem.split('_')[1] != date:
-                    continue
-        print("iterating through file : ", file.name)
-        with file.open("r", encoding="utf-8") as f:
-            for log_record in f:
-                if not log_record.strip():
-                    continue
-                try:
-                    total_records += 1  
-                    log_content = json.loads(log_record)
-                    log_line = log_content["log"]
-                    processed_records += 1
-                    yield log_content["time"], log_line, file.stem
-                except Exception:
-                    continue
-    print(f"\nTotal records in log: {total_records}")
-    print(f"Records Processed: {processed_records}")
+LOG_FIELDS = [
+    "apiName", "proxyResponseCode", "errorType", "destination", "apiCreatorTenantDomain", "platform",
+    "apiMethod", "apiVersion", "gatewayType", "apiCreator", "responseCacheHit", "backendLatency",
+    "correlationId", "requestMediationLatency", "keyType", "apiId", "applicationName",
+    "targetResponseCode", "requestTimestamp", "applicationOwner", "userAgent", "eventType",
+    "apiResourceTemplate", "responseLatency", "regionId", "responseMediationLatency", "userIp",
+    "applicationId", "apiType"
+]
 
 
 def parse_log_line(log_line):
     try:
-        return {
-            "apiName": re.search(r'apiName=([^,]+)', log_line).group(1) if re.search(r'apiName=([^,]+)', log_line) else None,
-            "proxyResponseCode": re.search(r'proxyResponseCode=([^,]+)', log_line).group(1) if re.search(r'proxyResponseCode=([^,]+)', log_line) else None,
-            "errorType": re.search(r'errorType=([^,]+)', log_line).group(1) if re.search(r'errorType=([^,]+)', log_line) else None,
-            "destination": re.search(r'destination=([^,]+)', log_line).group(1) if re.search(r'destination=([^,]+)', log_line) else None,
-            "apiCreatorTenantDomain": re.search(r'apiCreatorTenantDomain=([^,]+)', log_line).group(1) if re.search(r'apiCreatorTenantDomain=([^,]+)', log_line) else None,
-            "platform": re.search(r'platform=([^,]+)', log_line).group(1) if re.search(r'platform=([^,]+)', log_line) else None,
-            "apiMethod": re.search(r'apiMethod=([^,]+)', log_line).group(1) if re.search(r'apiMethod=([^,]+)', log_line) else None,
-            "apiVersion": re.search(r'apiVersion=([^,]+)', log_line).group(1) if re.search(r'apiVersion=([^,]+)', log_line) else None,
-            "gatewayType": re.search(r'gatewayType=([^,]+)', log_line).group(1) if re.search(r'gatewayType=([^,]+)', log_line) else None,
-            "apiCreator": re.search(r'apiCreator=([^,]+)', log_line).group(1) if re.search(r'apiCreator=([^,]+)', log_line) else None,
-            "responseCacheHit": re.search(r'responseCacheHit=([^,]+)', log_line).group(1) if re.search(r'responseCacheHit=([^,]+)', log_line) else None,
-            "backendLatency": re.search(r'backendLatency=(\d+)', log_line).group(1) if re.search(r'backendLatency=(\d+)', log_line) else None,
-            "correlationId": re.search(r'correlationId=([a-f0-9-]{36})', log_line).group(1) if re.search(r'correlationId=([a-f0-9-]{36})', log_line) else None,
-            "requestMediationLatency": re.search(r'requestMediationLatency=(\d+)', log_line).group(1) if re.search(r'requestMediationLatency=(\d+)', log_line) else None,
-            "keyType": re.search(r'keyType=([^,]+)', log_line).group(1) if re.search(r'keyType=([^,]+)', log_line) else None,
-            "apiId": re.search(r'apiId=([^,]+)', log_line).group(1) if re.search(r'apiId=([^,]+)', log_line) else None,
-            "applicationName": re.search(r'applicationName=([^,]+)', log_line).group(1) if re.search(r'applicationName=([^,]+)', log_line) else None,
-            "targetResponseCode": re.search(r'targetResponseCode=([^,]+)', log_line).group(1) if re.search(r'targetResponseCode=([^,]+)', log_line) else None,
-            "requestTimestamp": re.search(r'requestTimestamp=([^,]+)', log_line).group(1) if re.search(r'requestTimestamp=([^,]+)', log_line) else None,
-            "applicationOwner": re.search(r'applicationOwner=([^,]+)', log_line).group(1) if re.search(r'applicationOwner=([^,]+)', log_line) else None,
-            "userAgent": re.search(r'userAgent=([^,]+)', log_line).group(1) if re.search(r'userAgent=([^,]+)', log_line) else None,
-            "eventType": re.search(r'eventType=([^,]+)', log_line).group(1) if re.search(r'eventType=([^,]+)', log_line) else None,
-            "apiResourceTemplate": re.search(r'apiResourceTemplate=([^,]+)', log_line).group(1) if re.search(r'apiResourceTemplate=([^,]+)', log_line) else None,
-            "responseLatency": re.search(r'responseLatency=(\d+)', log_line).group(1) if re.search(r'responseLatency=(\d+)', log_line) else None,
-            "regionId": re.search(r'regionId=([^,]+)', log_line).group(1) if re.search(r'regionId=([^,]+)', log_line) else None,
-            "responseMediationLatency": re.search(r'responseMediationLatency=(\d+)', log_line).group(1) if re.search(r'responseMediationLatency=(\d+)', log_line) else None,
-            "userIp": re.search(r'userIp=([^,]+)', log_line).group(1) if re.search(r'userIp=([^,]+)', log_line) else None,
-            "applicationId": re.search(r'applicationId=([^,]+)', log_line).group(1) if re.search(r'applicationId=([^,]+)', log_line) else None,
-            "apiType": re.search(r'apiType=([^,}]+)', log_line).group(1) if re.search(r'apiType=([^,}]+)', log_line) else None
-        }
-    except AttributeError as e:
-        logging.warning(f"Failed to parse log line: Missing required field - {str(e)}", exc_info=True)
-        return None
+        return parse_fields(log_line, LOG_FIELDS)
     except Exception as e:
         logging.error(f"Unexpected error parsing log line: {str(e)}", exc_info=True)
         return None
@@ -134,41 +75,69 @@ def create_log_entry(timestamp, match):
     }
 
 
-def process_daily_logs(date):
-    day_writers = {}
-    for timestamp, log_line, log_date in iterate_logs(date):
-        match = parse_log_line(log_line)
-        if match is None:
-            continue
-        log_entry = create_log_entry(timestamp, match)
-        if log_date not in day_writers:
-            output_file = f'Processed Logs/{log_date}.csv'
-            file = open(output_file, 'w', encoding='utf-8', newline='', buffering=1024*1024)
-            writer = csv.writer(file)
-            writer.writerow(CSV_HEADERS)
-            day_writers[log_date] = (file, writer)
-            print(f"Created daily log file: {output_file}")
-        day_writers[log_date][1].writerow([log_entry.get(key, "") for key in CSV_HEADERS])
-    for file, _ in day_writers.values():
-        file.close()
-
-
-def process_single_file(date):
-    file_name = f"logs{('_' + date) if isinstance(date, str) else ('_' + '-'.join(date)) if isinstance(date, tuple) else ''}"
-    output_file = f'Processed Logs/{file_name}.csv'
-    with open(output_file, 'w', encoding='utf-8', newline='', buffering=1024*1024) as outfile:
+def scan_range(path, start, end, part_file):
+    """Write the CSV rows for one byte range of a day file to part_file; runs in a worker process."""
+    total_records = 0
+    processed_records = 0
+    with open(part_file, 'w', encoding='utf-8', newline='', buffering=1024*1024) as outfile:
         writer = csv.writer(outfile)
-        writer.writerow(CSV_HEADERS)
-        for timestamp, log_line, log_date in iterate_logs(date):
+        for log_record in iter_range_lines(path, start, end):
+            if not log_record.strip():
+                continue
+            try:
+                total_records += 1
+                log_content = json.loads(log_record)
+                timestamp, log_line = log_content["time"], log_content["log"]
+                processed_records += 1
+            except Exception:
+                continue
             match = parse_log_line(log_line)
             if match is None:
                 continue
             log_entry = create_log_entry(timestamp, match)
             writer.writerow([log_entry.get(key, "") for key in CSV_HEADERS])
+    return total_records, processed_records
+
+
+def scan_logs(date, workers, output_for):
+    """Scan the selected day files as byte ranges across workers and stitch each output CSV.
+
+    output_for maps a file's date to the CSV its rows go to; returns the CSVs written.
+    """
+    tasks = []
+    outputs = {}
+    for file, file_date in select_day_files(folder, date):
+        print("iterating through file : ", file.name)
+        output_file = output_for(file_date)
+        for start, end in split_ranges(file, workers):
+            part_file = f"{output_file}.part{len(tasks)}"
+            tasks.append((str(file), start, end, part_file))
+            outputs.setdefault(output_file, []).append(part_file)
+    results = run_ranges(scan_range, tasks, workers)
+    print(f"\nTotal records in log: {sum(total for total, _ in results)}")
+    print(f"Records Processed: {sum(processed for _, processed in results)}")
+    for output_file, part_files in outputs.items():
+        concat_parts(output_file, CSV_HEADERS, part_files)
+    return list(outputs)
+
+
+def process_daily_logs(date, workers):
+    for output_file in scan_logs(date, workers, lambda file_date: f'Processed Logs/logs_{file_date}.csv'):
+        print(f"Created daily log file: {output_file}")
+
+
+def process_single_file(date, workers):
+    file_name = f"logs{('_' + date) if isinstance(date, str) else ('_' + '-'.join(date)) if isinstance(date, tuple) else ''}"
+    output_file = f'Processed Logs/{file_name}.csv'
+    if not scan_logs(date, workers, lambda file_date: output_file):
+        concat_parts(output_file, CSV_HEADERS, [])
     print(f"Created single log file: {output_file}")
 
 
 if __name__ == "__main__":
+    if not folder.exists() or not any(folder.iterdir()):
+        print("'logs' folder tidak ditemukan")
+        sys.exit()
     try:
         time_range = input("1. All Date\n2. Single Date\n3. Date Range\nTime Range : ")
         if time_range == "1":
@@ -199,11 +168,12 @@ if __name__ == "__main__":
         if partition not in ["1", "2"]:
             logging.error("Invalid Partition Type")
             sys.exit(1)
+        workers = get_worker_count()
         Path("Processed Logs").mkdir(exist_ok=True)
         if partition == "1":
-            process_daily_logs(date)
+            process_daily_logs(date, workers)
         else:
-            process_single_file(date)
+            process_single_file(date, workers)
     except Exception as e:
         logging.error(f"An error occurred: {e}", exc_info=True)
         sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,213 @@
+import argparse
+import bisect
+import gzip
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from functools import lru_cache
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+HOUR_NS = 3600 * 10**9
+
+# Share of the peak hourly rate for each local (WIB, UTC+7) hour of the day
+HOURLY_PROFILE = [
+    0.04, 0.03, 0.03, 0.03, 0.05, 0.10, 0.25, 0.55,
+    0.85, 1.00, 1.00, 0.95, 0.80, 0.90, 0.95, 0.90,
+    0.75, 0.50, 0.30, 0.20, 0.15, 0.10, 0.08, 0.05
+]
+UTC_OFFSET_HOURS = 7
+
+TENANTS = ["carbon.super"] * 6 + ["kemenkeu.go.id", "bps.go.id", "jatengprov.go.id", "kemkes.go.id"]
+API_NAMES = [f"api-{name}" for name in (
+    "kependudukan", "pajak", "statistik", "kesehatan", "pendidikan", "perizinan",
+    "satudata", "opendata", "bansos", "kepegawaian", "aset", "anggaran")]
+APP_NAMES = ["portal", "dashboard", "sync-job", "mobile", "DefaultApplication", "dummy-app", "test-client"]
+OWNERS = [f"owner{i}" for i in range(40)] + ["admin"]
+
+
+def parse_time(value):
+    """Loki accepts nanosecond epochs or RFC3339 for start/end."""
+    if value.lstrip('-').isdigit():
+        return int(value)
+    seconds, _, fraction = value.rstrip('Z').partition('.')
+    dt = datetime.fromisoformat(seconds).replace(tzinfo=timezone.utc)
+    return int(dt.timestamp()) * 10**9 + int((fraction + '000000000')[:9])
+
+
+def rfc3339_nano(timestamp):
+    dt = datetime.fromtimestamp(timestamp // 10**9, tz=timezone.utc)
+    return dt.strftime('%Y-%m-%dT%H:%M:%S') + f".{timestamp % 10**9:09d}Z"
+
+
+def make_line(rnd, timestamp):
+    tenant = rnd.choice(TENANTS)
+    api_index = rnd.randrange(len(API_NAMES))
+    owner = rnd.choice(OWNERS)
+    creator = f"creator{api_index}" if tenant == "carbon.super" else f"creator{api_index}@{tenant}"
+    backend_latency = int(rnd.expovariate(1 / 120))
+    request_mediation = rnd.randrange(1, 20)
+    response_mediation = rnd.randrange(0, 5)
+    proxy_code = 200 if rnd.random() < 0.95 else rnd.choice([401, 404, 500, 503])
+    request_time = datetime.fromtimestamp(timestamp / 1e9, tz=timezone.utc)
+    metric_value = ", ".join([
+        f"apiName={API_NAMES[api_index]}",
+        f"proxyResponseCode={proxy_code}",
+        f"destination=http://backend-{api_index}.internal/v1",
+        f"apiCreatorTenantDomain={tenant}",
+        "platform=Other",
+        f"apiMethod={rnd.choice(['GET', 'GET', 'GET', 'POST'])}",
+        "apiVersion=1.0.0",
+        "gatewayType=SYNAPSE",
+        f"apiCreator={creator}",
+        "responseCacheHit=false",
+        f"backendLatency={backend_latency}",
+        f"correlationId={uuid.UUID(int=rnd.getrandbits(128))}",
+        f"requestMediationLatency={request_mediation}",
+        "keyType=PRODUCTION",
+        f"apiId={api_index:08x}-0000-4000-8000-000000000000",
+        f"applicationName={rnd.choice(APP_NAMES)}",
+        f"targetResponseCode={proxy_code}",
+        f"requestTimestamp={request_time.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3]}Z",
+        f"applicationOwner={owner}",
+        "userAgent=Apache-HttpClient/4.5.13 (Java/11.0.16)",
+        "eventType=response",
+        "apiResourceTemplate=/*",
+        "regionId=default",
+        f"responseLatency={backend_latency + request_mediation + response_mediation}",
+        f"responseMediationLatency={response_mediation}",
+        f"userIp=10.{rnd.randrange(256)}.{rnd.randrange(256)}.{rnd.randrange(1, 255)}",
+        f"apiContext=/t/{tenant}/{API_NAMES[api_index]}/1.0.0",
+        f"applicationId={rnd.randrange(1000):08x}-1111-4000-8000-000000000000",
+        "apiType=HTTP",
+    ])
+    log = (f"[{request_time.strftime('%Y-%m-%d %H:%M:%S,%f')[:-3]}]  INFO "
+           "{org.wso2.am.analytics.publisher.reporter.log.LogCounterMetric} - "
+           f"Metric Name: apim:response, Metric Value: {{{metric_value}}}\n")
+    return json.dumps({"log": log, "stream": "stdout", "time": rfc3339_nano(timestamp)})
+
+
+class SyntheticLogs:
+    """Deterministic synthetic `Metric Name: apim:response` entries with a daily traffic curve."""
+
+    def __init__(self, peak_per_hour, streams=2, seed=0):
+        self.peak_per_hour = peak_per_hour
+        self.streams = streams
+        self.seed = seed
+        self.hour_entries = lru_cache(maxsize=48)(self._hour_entries)
+
+    def _hour_entries(self, hour):
+        rnd = random.Random(hour * 1000003 + self.seed)
+        local_hour = (hour + UTC_OFFSET_HOURS) % 24
+        count = int(self.peak_per_hour * HOURLY_PROFILE[local_hour] * rnd.uniform(0.9, 1.1))
+        timestamps = sorted(hour * HOUR_NS + rnd.randrange(HOUR_NS) for _ in range(count))
+        entries = [(timestamp, rnd.randrange(self.streams), make_line(rnd, timestamp)) for timestamp in timestamps]
+        return timestamps, entries
+
+    def query(self, start, end, limit, forward=True):
+        entries = []
+        hours = range(start // HOUR_NS, (end - 1) // HOUR_NS + 1)
+        for hour in (hours if forward else reversed(hours)):
+            timestamps, hour_entries = self.hour_entries(hour)
+            low = bisect.bisect_left(timestamps, start)
+            high = bisect.bisect_left(timestamps, end)
+            selected = hour_entries[low:high] if forward else hour_entries[low:high][::-1]
+            entries.extend(selected[:limit - len(entries)])
+            if len(entries) >= limit:
+                break
+        return entries
+
+
+class LokiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, body, content_type="application/json"):
+        headers = {"Content-Type": content_type}
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=1)
+            headers["Content-Encoding"] = "gzip"
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        if url.path != "/loki/api/v1/query_range":
+            self.send_body(404, b"404 page not found", "text/plain")
+            return
+
+        with server.lock:
+            server.stats["requests"] += 1
+        if server.latency:
+            time.sleep(server.latency * random.uniform(0.5, 1.5))
+        if random.random() < server.error_rate:
+            with server.lock:
+                server.stats["errors"] += 1
+            self.send_body(random.choice([429, 500, 503]), b"injected failure", "text/plain")
+            return
+
+        params = parse_qs(url.query)
+        try:
+            start = parse_time(params["start"][0])
+            end = parse_time(params["end"][0])
+            limit = int(params.get("limit", ["100"])[0])
+            forward = params.get("direction", ["BACKWARD"])[0].upper() == "FORWARD"
+        except (KeyError, ValueError) as e:
+            self.send_body(400, f"bad request: {e}".encode(), "text/plain")
+            return
+        if limit > server.max_entries:
+            self.send_body(400, f"max entries limit per query exceeded, limit > max_entries_limit ({limit} > {server.max_entries})".encode(), "text/plain")
+            return
+
+        entries = server.logs.query(start, end, limit, forward)
+        streams = []
+        for stream_id in range(server.logs.streams):
+            values = [[str(timestamp), line] for timestamp, stream, line in entries if stream == stream_id]
+            if values:
+                streams.append({"stream": {"container": "splp-gw", "pod": f"splp-gw-{stream_id}"}, "values": values})
+        with server.lock:
+            server.stats["entries"] += len(entries)
+        body = json.dumps({"status": "success", "data": {"resultType": "streams", "result": streams}}).encode()
+        self.send_body(200, body)
+
+
+def start_server(host="127.0.0.1", port=3100, peak_per_hour=20000, latency=0.0, error_rate=0.0, max_entries=5000, seed=0):
+    """Start the stand-in in a daemon thread and return the server; stats live in server.stats."""
+    server = ThreadingHTTPServer((host, port), LokiHandler)
+    server.daemon_threads = True
+    server.logs = SyntheticLogs(peak_per_hour, seed=seed)
+    server.latency = latency
+    server.error_rate = error_rate
+    server.max_entries = max_entries
+    server.lock = threading.Lock()
+    server.stats = {"requests": 0, "errors": 0, "entries": 0}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for Loki's /loki/api/v1/query_range")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3100)
+    parser.add_argument("--peak-per-hour", type=int, default=20000, help="entries in the busiest hour")
+    parser.add_argument("--latency", type=float, default=0.0, help="mean added latency per request, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 429/5xx")
+    parser.add_argument("--max-entries", type=int, default=5000, help="max_entries_limit_per_query")
+    args = parser.parse_args()
+    server = start_server(args.host, args.port, args.peak_per_hour, args.latency, args.error_rate, args.max_entries)
+    print(f"Serving fake Loki on http://{args.host}:{args.port}/loki/api/v1/query_range")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(server.stats)
@@ -1,244 +1,365 @@
-import requests
 import json
-import re
-from datetime import datetime, timedelta
-import time
 import pandas as pd
 import os
 import yaml
-import pyarrow as pa
-import pyarrow.parquet as pq
 import sys
+from loki_client import LokiClient
+from parquet_logs import ParquetDayWriter, parquet_layout, day_file_path
+from log_files import log_file_name, compress_block
+from collections import deque, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 config = yaml.safe_load(open("config.yaml"))
 
-def parse_log_content(log_content):
-    try:
-        log_message = log_content["log"]
-        
-        metric_match = re.search(r'Metric Value: {(.*?)}', log_message)
-        if metric_match:
-            metric_value_str = metric_match.group(1)
-            
-            metric_values = {}
-            for pair in metric_value_str.split(', '):
-                if '=' in pair:
-                    key, value = pair.split('=', 1)
-                    if value.lower() == 'true':
-                        value = True
-                    elif value.lower() == 'false':
-                        value = False
-                    elif value.isdigit():
-                        value = int(value)
-                    metric_values[key] = value
-            
-            return {
-                **metric_values,
-                "stream": log_content.get("stream"),
-                "time": pd.to_datetime(log_content.get("time"))
-            }
-    except Exception as e:
-        print(f"Error parsing log content: {str(e)}")
+# The leading underscore keeps Arrow from reading the manifest as part of a Parquet dataset
+MANIFEST_FILE = "_manifest.json"
+LEGACY_MANIFEST_FILE = "manifest.json"
+
+def split_shards(start_date, end_date, shard_hours):
+    """Split [start_date, end_date) into UTC-aligned shards that never cross a day boundary."""
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date)
+    step = pd.Timedelta(hours=shard_hours)
+    shards = []
+    while start < end:
+        next_day = start.normalize() + pd.Timedelta(days=1)
+        shard_end = min(start.floor(step) + step, next_day, end)
+        shards.append((start, shard_end))
+        start = shard_end
+    return shards
+
+
+def make_client():
+    return LokiClient(
+        config['CONFIG']["LOKI_URL"],
+        pool_size=int(config['CONFIG'].get('CONCURRENCY', 1)),
+        max_retries=int(config['CONFIG'].get('MAX_RETRIES', 5)),
+        backoff=float(config['CONFIG'].get('BACKOFF_SECONDS', 1.0))
+    )
+
+
+class WindowSizer:
+    """Adapt the query window and page limit to the log density seen in the previous response.
+
+    The window is sized so a page is expected to hold about target_page entries, and the limit
+    leaves some headroom above that, both kept within the configured bounds and Loki's
+    max entries per query.
+    """
+
+    def __init__(self, target_page, max_limit, min_limit, min_window_seconds, max_window_seconds):
+        self.target_page = target_page
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.min_window = int(min_window_seconds * 1e9)
+        self.max_window = int(max_window_seconds * 1e9)
+        self.window = self.min_window
+        self.limit = max_limit
+
+    def observe(self, entries_count, span):
+        if entries_count == 0:
+            self.window = min(self.max_window, self.window * 4)
+            return
+        density = entries_count / max(span, 1)
+        self.window = int(min(self.max_window, max(self.min_window, self.target_page / density)))
+        expected = density * self.window
+        self.limit = int(min(self.max_limit, max(self.min_limit, expected * 1.5)))
+
+
+def make_window_sizer():
+    if not config['CONFIG'].get('ADAPTIVE', False):
         return None
+    return WindowSizer(
+        target_page=int(config['CONFIG'].get('TARGET_PAGE', 4000)),
+        max_limit=int(config['CONFIG'].get('MAX_LIMIT', 5000)),
+        min_limit=int(config['CONFIG']['LIMIT']),
+        min_window_seconds=float(config['CONFIG'].get('MIN_WINDOW_SECONDS', 60)),
+        max_window_seconds=float(config['CONFIG'].get('MAX_WINDOW_SECONDS', 86400))
+    )
 
-def write_logs_to_parquet(logs, current_date, log_dir):
-    parsed_logs = []
-    for log in logs:
-        parsed_log = parse_log_content(log)
-        if parsed_log:
-            parsed_logs.append(parsed_log)
-    
-    if not parsed_logs:
-        print("No valid logs to write")
-        return
-        
-    df = pd.DataFrame(parsed_logs)
-    
-    schema = pa.schema([
-        ('apiName', pa.string()),
-        ('proxyResponseCode', pa.int32()), 
-        ('destination', pa.string()),
-        ('apiCreatorTenantDomain', pa.string()),
-        ('platform', pa.string()),
-        ('apiMethod', pa.string()),
-        ('apiVersion', pa.string()),
-        ('gatewayType', pa.string()),
-        ('apiCreator', pa.string()),
-        ('responseCacheHit', pa.bool_()),
-        ('backendLatency', pa.int32()), 
-        ('correlationId', pa.string()),
-        ('requestMediationLatency', pa.int32()),
-        ('keyType', pa.string()),
-        ('apiId', pa.string()),
-        ('applicationName', pa.string()),
-        ('targetResponseCode', pa.int32()),
-        ('requestTimestamp', pa.timestamp('us')), 
-        ('applicationOwner', pa.string()),
-        ('userAgent', pa.string()),
-        ('eventType', pa.string()),
-        ('apiResourceTemplate', pa.string()),
-        ('regionId', pa.string()),
-        ('responseLatency', pa.int32()), 
-        ('responseMediationLatency', pa.int32()),
-        ('userIp', pa.string()),
-        ('apiContext', pa.string()),
-        ('applicationId', pa.string()),
-        ('apiType', pa.string()),
-        ('stream', pa.string()),
-        ('time', pa.timestamp('us'))  
-    ])
-    
-    table = pa.Table.from_pandas(df, schema=schema)
-    
-    print_time_str = pd.Timestamp(current_date).strftime('%Y-%m-%d')
-    partition_path = os.path.join(log_dir, f'day={print_time_str}')
-    os.makedirs(partition_path, exist_ok=True)
-    
-    parquet_path = os.path.join(partition_path, 'logs.parquet')
-    pq.write_table(table, parquet_path, compression='snappy')
-    print(f"Written {len(parsed_logs)} records to {parquet_path}")
 
+def fetch_shard(client, shard):
+    """Page through one shard with its own forward cursor.
 
-def get_logs_parquet(start_date, end_date):
-    url = config['CONFIG']["LOKI_URL"]
-    current_date = start_date
-    cur_end_date = end_date
-    total_record = 0
+    Returns the shard's raw log lines in time order and the Loki timestamp (ns) of the last one.
+    Lines are left undecoded; the cursor only needs Loki's own entry timestamps.
+    """
+    shard_start, shard_end = shard
     limit = int(config['CONFIG']['LIMIT'])
-    log_dir = config['CONFIG']['LOG_DIR_PARQUET']
-    
-    os.makedirs(log_dir, exist_ok=True)
+    cursor = shard_start.value
+    end = shard_end.value
+    seen_at_cursor = set()
+    logs = []
+    shard_last_timestamp = None
+    sizer = make_window_sizer()
+    window_end = end
 
-    current_logs = []
-    
-    print("iterating through : ", (pd.Timestamp(current_date)).date())
-
-    while current_date < end_date:
-        if (pd.Timestamp(current_date)).day != (pd.Timestamp(current_date) + pd.Timedelta(hours=1)).day:
-            if current_logs:
-                write_logs_to_parquet(current_logs, current_date, log_dir)
-                current_logs = []
-            print("iterating through : ", (pd.Timestamp(current_date)).date())
-        
-        if pd.Timestamp(current_date) + pd.Timedelta(hours=1) > pd.Timestamp(end_date):
-            cur_end_date = end_date
-        else:
-            cur_end_date = (pd.Timestamp(cur_end_date) + pd.Timedelta(hours=1)).isoformat().replace('+00:00', 'Z')
+    while cursor < end:
+        if sizer is not None:
+            window_end = min(end, cursor + sizer.window)
+            limit = sizer.limit
 
         params = {
             'query': config['CONFIG']['QUERY'],
-            "start": current_date,
-            "end": cur_end_date,
+            "start": cursor,
+            "end": window_end,
             "limit": limit,
             "direction" : "FORWARD"
         }
 
-        new_logs_found = False
-
-        response = requests.get(url, params=params, timeout=(10, 600))
-
-        if response.status_code == 200:
-            data = response.json()
-            logs_count = 0
-            for stream in data['data']['result']:
-                logs_count += len(stream['values'])
-                for value in stream['values']:
-                    log_content = json.loads(value[1])
-                    if current_date < log_content["time"]:
-                        current_date = log_content["time"]
-                        new_logs_found = True
-                    current_logs.append(log_content)
-            
-            total_record += logs_count
-            if logs_count < limit and cur_end_date == end_date:
-                print("last iteration : ", current_date, cur_end_date, logs_count)
+        entries = client.query_range_values(params)
+        entries.sort(key=lambda entry: entry[0])
+
+        # Loki's start bound is inclusive, so the entries sitting on the cursor come back again
+        new_entries = [entry for entry in entries if entry[0] != cursor or entry[1] not in seen_at_cursor]
+        logs.extend(line for timestamp, line in new_entries)
+        if new_entries:
+            shard_last_timestamp = new_entries[-1][0]
+
+        if sizer is not None:
+            sizer.observe(len(entries), (entries[-1][0] if len(entries) >= limit else window_end) - cursor)
+
+        if len(entries) < limit:
+            if window_end >= end:
+                break
+            cursor = window_end
+            seen_at_cursor = set()
+            continue
+        if not new_entries:
+            print("more than", limit, "entries share timestamp", cursor, ", skipping ahead 1ns")
+            cursor += 1
+            seen_at_cursor = set()
+            continue
+
+        last_timestamp = entries[-1][0]
+        if last_timestamp != cursor:
+            seen_at_cursor = set()
+        seen_at_cursor.update(line for timestamp, line in entries if timestamp == last_timestamp)
+        cursor = last_timestamp
+
+    return logs, shard_last_timestamp
+
+
+def iter_shard_logs(client, shards):
+    """Fetch shards on a bounded worker pool and yield (shard, logs, last_timestamp) back in time order."""
+    concurrency = int(config['CONFIG'].get('CONCURRENCY', 1))
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    pending = deque()
+    try:
+        for shard in shards:
+            pending.append((shard, executor.submit(fetch_shard, client, shard)))
+            if len(pending) > 2 * concurrency:
+                done_shard, future = pending.popleft()
+                yield (done_shard, *future.result())
+        while pending:
+            done_shard, future = pending.popleft()
+            yield (done_shard, *future.result())
+    finally:
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def window_key(shard):
+    shard_start, shard_end = shard
+    return f"{shard_start.isoformat()}/{shard_end.isoformat()}"
+
+
+def load_manifest(log_dir, compression='none'):
+    """Load the checkpoint manifest of completed windows, or start a new one if the query or compression changed."""
+    manifest_path = os.path.join(log_dir, MANIFEST_FILE)
+    legacy_path = os.path.join(log_dir, LEGACY_MANIFEST_FILE)
+    if os.path.exists(legacy_path) and not os.path.exists(manifest_path):
+        os.replace(legacy_path, manifest_path)
+    query = config['CONFIG']['QUERY']
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('query') == query and manifest.get('compression', 'none') == compression:
+            return manifest
+        print("Query or compression changed since the last run, ignoring", manifest_path)
+    return {'query': query, 'compression': compression, 'windows': {}}
+
+
+def save_manifest(log_dir, manifest):
+    manifest_path = os.path.join(log_dir, MANIFEST_FILE)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+
+def record_window(manifest, shard, records, last_timestamp, offset=None):
+    manifest['windows'][window_key(shard)] = {
+        'records': records,
+        'last_timestamp': pd.Timestamp(last_timestamp, tz='UTC').isoformat() if last_timestamp is not None else None,
+        'offset': offset
+    }
+
+
+def resume_points(manifest, shards_by_day, log_dir, compression):
+    """(shards still to fetch, {day: offset to cut its file back to}) for an NDJSON resume.
+
+    A day only resumes after the longest run of completed windows from its first shard whose
+    data is still in the day file; the windows after that run are dropped from the manifest
+    and fetched again, so a day file always holds its windows in time order. A missing day
+    file invalidates all of its windows.
+    """
+    shards = []
+    day_offsets = {}
+    skipped = 0
+    for day, day_shards in shards_by_day.items():
+        path = os.path.join(log_dir, log_file_name(day, compression))
+        size = os.path.getsize(path) if os.path.exists(path) else None
+        done = 0
+        reason = "day file missing" if size is None else "after a window that is not done"
+        for shard in day_shards:
+            window = manifest['windows'].get(window_key(shard))
+            if window is None or size is None or window.get('offset') is None:
+                break
+            if window['offset'] > size:
+                reason = "day file shorter than recorded"
                 break
-            if not new_logs_found:
-                current_date = cur_end_date
-                cur_end_date = (pd.Timestamp(cur_end_date) + pd.Timedelta(hours=1)).isoformat().replace('+00:00', 'Z')
+            done += 1
+        skipped += done
+        if done == len(day_shards):
+            continue
+        if done:
+            day_offsets[day] = manifest['windows'][window_key(day_shards[done - 1])]['offset']
+        # Without a completed prefix the file is rewritten from the start, so none of the day's windows hold
+        cut = day_shards[done][0] if done else None
+        stale = [key for key in manifest['windows']
+                 if key[:10] == day and (cut is None or pd.Timestamp(key.split('/')[0]) >= cut)]
+        if stale:
+            print(f"refetching {len(stale)} completed windows of {day} ({reason})")
+            for key in stale:
+                del manifest['windows'][key]
+        shards.extend(day_shards[done:])
+    if skipped:
+        print("skipping", skipped, "completed windows")
+    return shards, day_offsets
+
+
+def get_logs_parquet(start_date, end_date):
+    total_record = 0
+    log_dir = config['CONFIG']['LOG_DIR_PARQUET']
+    row_group_size = int(config['CONFIG'].get('ROW_GROUP_SIZE', 100000))
+    sort_by, write_options = parquet_layout(config['CONFIG'])
+    shard_hours = int(config['CONFIG'].get('SHARD_HOURS', 1))
+    archive_dir = config['CONFIG']['LOG_DIR_NDJSON'] if config['CONFIG'].get('ARCHIVE_NDJSON', False) else None
+    archive_compression = config['CONFIG'].get('NDJSON_COMPRESSION', 'none')
+    if archive_compression == 'none':
+        archive_compression = 'gzip'
+    compression_level = config['CONFIG'].get('COMPRESSION_LEVEL')
+    
+    os.makedirs(log_dir, exist_ok=True)
+    if archive_dir is not None:
+        os.makedirs(archive_dir, exist_ok=True)
+    manifest = load_manifest(log_dir)
+
+    # A Parquet day file can't be appended to, so a day is only skipped once all of its windows are done
+    # and its file was renamed into place (a day without records never gets one)
+    shards_by_day = defaultdict(list)
+    for shard in split_shards(start_date, end_date, shard_hours):
+        shards_by_day[shard[0].normalize()].append(shard)
+    shards = []
+    for day, day_shards in shards_by_day.items():
+        windows = [manifest['windows'].get(window_key(shard)) for shard in day_shards]
+        if all(windows) and (os.path.exists(day_file_path(log_dir, day)) or not any(window['records'] for window in windows)):
+            print("skipping completed day : ", day.date())
         else:
-            print(f"Error: {response.status_code}")
-            print(response.text)
-            current_date = cur_end_date
-            cur_end_date = (pd.Timestamp(cur_end_date) + pd.Timedelta(hours=1)).isoformat().replace('+00:00', 'Z')
-            print("iteration error on date range : ", current_date, cur_end_date)
+            shards.extend(day_shards)
+
+    client = make_client()
+    day_writer = None
+    archive_file = None
+    current_day = None
+    day_windows = []
+
+    for shard, logs, last_timestamp in iter_shard_logs(client, shards):
+        shard_start, shard_end = shard
+        if shard_start.normalize() != current_day:
+            if day_writer is not None:
+                day_writer.close()
+                if archive_file is not None:
+                    archive_file.close()
+                for window in day_windows:
+                    record_window(manifest, *window)
+                save_manifest(log_dir, manifest)
+            current_day = shard_start.normalize()
+            day_writer = ParquetDayWriter(current_day, log_dir, row_group_size, sort_by, write_options)
+            if archive_dir is not None:
+                archive_path = os.path.join(archive_dir, log_file_name(current_day.strftime('%Y-%m-%d'), archive_compression))
+                archive_file = open(archive_path, 'wb')
+            day_windows = []
+            print("iterating through : ", current_day.date())
 
-    if current_logs:
-        write_logs_to_parquet(current_logs, current_date, log_dir)
+        day_writer.write(logs)
+        if archive_file is not None and logs:
+            block = ''.join(line + '\n' for line in logs).encode('utf-8')
+            archive_file.write(compress_block(block, archive_compression, compression_level))
+        day_windows.append((shard, len(logs), last_timestamp))
+        total_record += len(logs)
 
+    if day_writer is not None:
+        day_writer.close()
+        if archive_file is not None:
+            archive_file.close()
+        for window in day_windows:
+            record_window(manifest, *window)
+        save_manifest(log_dir, manifest)
+
+    print(client.summary())
     return str(total_record)
 
 def get_logs_ndjson(start_date, end_date):
-    url = config['CONFIG']["LOKI_URL"]
-    current_date = start_date
-    cur_end_date = end_date
     total_record = 0
-    limit = int(config['CONFIG']['LIMIT'])
     log_dir = config['CONFIG']['LOG_DIR_NDJSON']
+    shard_hours = int(config['CONFIG'].get('SHARD_HOURS', 1))
+    compression = config['CONFIG'].get('NDJSON_COMPRESSION', 'none')
+    compression_level = config['CONFIG'].get('COMPRESSION_LEVEL')
     
     os.makedirs(log_dir, exist_ok=True)
+    manifest = load_manifest(log_dir, compression)
 
-    print_time = current_date
-    print_time_str = pd.Timestamp(print_time).strftime('%Y-%m-%d')
-    extract_path = os.path.join(log_dir, f'logs_{print_time_str}.txt')
-    outfile = open(extract_path, 'w', encoding='utf-8', buffering=1024*1024)
-    
-    print("iterating through : ", (pd.Timestamp(current_date)).date())
-
-    while current_date < end_date:
-        print(current_date)
-        if (pd.Timestamp(print_time)).day != (pd.Timestamp(current_date)).day:
-            outfile.close()
-            print_time = current_date
-            print_time_str = pd.Timestamp(print_time).strftime('%Y-%m-%d')
-            extract_path = os.path.join(log_dir, f'logs_{print_time_str}.txt')
-            outfile = open(extract_path, 'w', encoding='utf-8', buffering=1024*1024)
-            print("iterating through : ", (pd.Timestamp(current_date)).date())
-        
-        if pd.Timestamp(current_date) + pd.Timedelta(hours=1) > pd.Timestamp(end_date):
-            cur_end_date = end_date
-        else:
-            cur_end_date = (pd.Timestamp(cur_end_date) + pd.Timedelta(hours=1)).isoformat().replace('+00:00', 'Z')
+    shards_by_day = defaultdict(list)
+    for shard in split_shards(start_date, end_date, shard_hours):
+        shards_by_day[shard[0].strftime('%Y-%m-%d')].append(shard)
+    shards, day_offsets = resume_points(manifest, shards_by_day, log_dir, compression)
+    save_manifest(log_dir, manifest)
 
-        params = {
-            'query': config['CONFIG']['QUERY'],
-            "start": current_date,
-            "end": cur_end_date,
-            "limit": limit,
-            "direction" : "FORWARD"
-        }
+    client = make_client()
+    outfile = None
+    print_time_str = None
 
-        new_logs_found = False
-
-        response = requests.get(url, params=params, timeout=(10, 600))
-
-        if response.status_code == 200:
-            data = response.json()
-            logs_count = 0
-            for stream in data['data']['result']:
-                logs_count += len(stream['values'])
-                for value in stream['values']:
-                    log_content = json.loads(value[1])
-                    if current_date < log_content["time"]:
-                        current_date = log_content["time"]
-                        new_logs_found = True
-                    outfile.write(json.dumps(log_content) + '\n')
-            
-            total_record += logs_count
-            if logs_count < limit and cur_end_date == end_date:
-                print("last iteration : ", current_date, cur_end_date, logs_count)
-                break
-            if not new_logs_found:
-                current_date = cur_end_date
-                cur_end_date = (pd.Timestamp(cur_end_date) + pd.Timedelta(hours=1)).isoformat().replace('+00:00', 'Z')
-        else:
-            print(f"Error: {response.status_code}")
-            print(response.text)
-            current_date = cur_end_date
-            cur_end_date = (pd.Timestamp(cur_end_date) + pd.Timedelta(hours=1)).isoformat().replace('+00:00', 'Z')
-            print("iteration error on date range : ", current_date, cur_end_date)
+    for shard, logs, last_timestamp in iter_shard_logs(client, shards):
+        shard_start, shard_end = shard
+        if shard_start.strftime('%Y-%m-%d') != print_time_str:
+            if outfile is not None:
+                outfile.close()
+            print_time_str = shard_start.strftime('%Y-%m-%d')
+            extract_path = os.path.join(log_dir, log_file_name(print_time_str, compression))
+            if print_time_str in day_offsets and os.path.exists(extract_path):
+                with open(extract_path, 'r+b') as f:
+                    f.truncate(day_offsets[print_time_str])
+                outfile = open(extract_path, 'ab', buffering=1024*1024)
+                print("resuming : ", shard_start)
+            else:
+                outfile = open(extract_path, 'wb', buffering=1024*1024)
+                print("iterating through : ", shard_start.date())
+
+        # Each shard is one compressed block, so the checkpoint offset always falls on a block boundary
+        if logs:
+            block = ''.join(line + '\n' for line in logs).encode('utf-8')
+            outfile.write(compress_block(block, compression, compression_level))
+        outfile.flush()
+        os.fsync(outfile.fileno())
+        record_window(manifest, shard, len(logs), last_timestamp, os.fstat(outfile.fileno()).st_size)
+        save_manifest(log_dir, manifest)
+        total_record += len(logs)
 
-    outfile.close()
+    if outfile is not None:
+        outfile.close()
+    print(client.summary())
     return str(total_record)
 
 
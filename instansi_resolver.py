@@ -0,0 +1,126 @@
+from bisect import bisect_right
+from collections import deque
+
+NOT_REGISTERED = "Tidak Terdaftar"
+
+# Separates the patterns joined for first_containing; keys never contain it
+SEPARATOR = "\x00"
+
+
+class SubstringAutomaton:
+    """Aho–Corasick automaton over a list of patterns.
+
+    first(text) returns the lowest index of a pattern occurring anywhere in text, the same
+    answer as trying `pattern in text` for each pattern in order, in one pass over text.
+    """
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.best = [None]
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.best.append(None)
+                state = next_state
+            if self.best[state] is None:
+                self.best[state] = index
+        # Breadth-first so a state's fail target is finished before the state itself
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                fail = self.fail[state]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                fail = self.goto[fail].get(char, 0)
+                self.fail[next_state] = fail
+                # best covers every pattern ending here, including the suffixes reached by fail
+                if self.best[fail] is not None and (self.best[next_state] is None or self.best[fail] < self.best[next_state]):
+                    self.best[next_state] = self.best[fail]
+                queue.append(next_state)
+
+    def first(self, text):
+        goto, fail, best = self.goto, self.fail, self.best
+        found = best[0]
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            index = best[state]
+            if index is not None and (found is None or index < found):
+                found = index
+                if found == 0:
+                    break
+        return found
+
+
+class InstansiIndex:
+    """Nama Instansi lookups over one mapping column, keeping the mapping's row order.
+
+    Each lookup returns the first row, as the old loops over mapping.xlsx did, and is
+    memoized per key:
+      first_equal(key)       the pattern equals key (hash index)
+      first_within(key)      the pattern occurs in key (Aho–Corasick automaton)
+      first_containing(key)  key occurs in the pattern (one find over the joined column)
+    Patterns that aren't strings (empty cells) never match.
+    """
+
+    def __init__(self, patterns, names):
+        self.patterns = list(patterns)
+        self.names = list(names)
+        self.equal = {}
+        for row, pattern in enumerate(self.patterns):
+            if isinstance(pattern, str):
+                self.equal.setdefault(pattern, row)
+        self.rows = [row for row, pattern in enumerate(self.patterns) if isinstance(pattern, str)]
+        self.automaton = None
+        self.joined = None
+        self.within_cache = {}
+        self.containing_cache = {}
+
+    def first_equal(self, key):
+        return self.equal.get(key)
+
+    def first_within(self, key):
+        if not isinstance(key, str):
+            return None
+        if key not in self.within_cache:
+            if self.automaton is None:
+                self.automaton = SubstringAutomaton([self.patterns[row] for row in self.rows])
+            found = self.automaton.first(key)
+            self.within_cache[key] = None if found is None else self.rows[found]
+        return self.within_cache[key]
+
+    def first_containing(self, key):
+        if not isinstance(key, str) or SEPARATOR in key:
+            return None
+        if key not in self.containing_cache:
+            if self.joined is None:
+                self.joined = SEPARATOR.join(self.patterns[row] for row in self.rows)
+                self.starts = []
+                start = 0
+                for row in self.rows:
+                    self.starts.append(start)
+                    start += len(self.patterns[row]) + len(SEPARATOR)
+            position = self.joined.find(key) if self.rows else -1
+            self.containing_cache[key] = None if position == -1 else self.rows[bisect_right(self.starts, position) - 1]
+        return self.containing_cache[key]
+
+    def name(self, row, default=None):
+        return default if row is None else self.names[row]
+
+    def within(self, key, default=NOT_REGISTERED):
+        """Name of the first row whose pattern occurs in key, as splp_logs_analyze's recap columns use."""
+        return self.name(self.first_within(key), default)
+
+
+def first_row(*rows):
+    """Earliest of several candidate rows, ignoring the lookups that found nothing."""
+    return min((row for row in rows if row is not None), default=None)
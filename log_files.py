@@ -0,0 +1,67 @@
+import gzip
+import io
+import os
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Day files are logs_YYYY-MM-DD plus one of these; the extension picks the codec
+COMPRESSION_SUFFIXES = {'none': '.txt', 'gzip': '.txt.gz', 'zstd': '.txt.zst'}
+
+
+def log_file_name(date_str, compression='none'):
+    return f'logs_{date_str}{COMPRESSION_SUFFIXES[compression]}'
+
+
+def log_file_date(file_name):
+    """Return the YYYY-MM-DD of a logs_YYYY-MM-DD[.txt|.txt.gz|.txt.zst] file name, or None for other files."""
+    name = os.path.basename(str(file_name))
+    for suffix in sorted(COMPRESSION_SUFFIXES.values(), key=len, reverse=True):
+        if name.startswith('logs_') and name.endswith(suffix):
+            return name[len('logs_'):-len(suffix)]
+    return None
+
+
+def require_zstandard():
+    if zstandard is None:
+        raise RuntimeError("zstandard is required for .zst log files (pip install zstandard)")
+
+
+def open_log(path, binary=False):
+    """Open a day file for reading as text (or bytes), stream-decompressing by extension."""
+    path = str(path)
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb') if binary else gzip.open(path, 'rt', encoding='utf-8')
+    if path.endswith('.zst'):
+        require_zstandard()
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True)
+        reader = io.BufferedReader(reader, buffer_size=1024*1024)
+        return reader if binary else io.TextIOWrapper(reader, encoding='utf-8')
+    if binary:
+        return open(path, 'rb', buffering=1024*1024)
+    return open(path, 'r', encoding='utf-8', buffering=1024*1024)
+
+
+def iter_blocks(f, block_bytes=16*1024*1024):
+    """Yield ~block_bytes chunks of whole lines from a binary day file."""
+    while True:
+        lines = f.readlines(block_bytes)
+        if not lines:
+            return
+        yield b''.join(lines)
+
+
+def compress_block(data, compression='none', level=None):
+    """Encode a block of NDJSON bytes as one self-contained gzip member or zstd frame.
+
+    Day files are concatenations of these blocks, which both readers handle, so a file can
+    be appended to or truncated at any block boundary.
+    """
+    if compression == 'gzip':
+        return gzip.compress(data, compresslevel=level if level is not None else 6)
+    if compression == 'zstd':
+        require_zstandard()
+        return zstandard.ZstdCompressor(level=level if level is not None else 3).compress(data)
+    return data
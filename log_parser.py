@@ -0,0 +1,76 @@
+import re
+
+METRIC_PREFIX = 'Metric Value: {'
+
+# The per-field regexes parse_log_line used to run captured only part of some values;
+# these keep that behaviour so reports stay identical
+DIGIT_FIELDS = {'backendLatency', 'requestMediationLatency', 'responseLatency', 'responseMediationLatency'}
+UUID_FIELDS = {'correlationId'}
+BRACE_TERMINATED_FIELDS = {'apiType'}
+LEGACY_SPECIAL_FIELDS = DIGIT_FIELDS | UUID_FIELDS | BRACE_TERMINATED_FIELDS
+digits_pattern = re.compile(r'\d+')
+uuid_pattern = re.compile(r'[a-f0-9-]{36}')
+
+
+def parse_metric_values(log_line):
+    """Return every field of the `Metric Value: {k=v, ...}` block in one scan.
+
+    Returns None when the line has no Metric Value block.
+    """
+    start = log_line.find(METRIC_PREFIX)
+    if start == -1:
+        return None
+    start += len(METRIC_PREFIX)
+    end = log_line.rfind('}')
+    if end < start:
+        end = len(log_line)
+    return tokenize(log_line[start:end])
+
+
+def tokenize(text):
+    """Split `k=v, k=v, ...` into a dict.
+
+    A piece that doesn't start with `key=` is glued back onto the previous value, so commas
+    inside values (userAgent) and braces inside values (apiResourceTemplate) survive.
+    """
+    fields = {}
+    key = None
+    for piece in text.split(', '):
+        name, sep, value = piece.partition('=')
+        if sep and name.isidentifier():
+            fields[name] = value
+            key = name
+        elif key is not None:
+            fields[key] += ', ' + piece
+    return fields
+
+
+def legacy_value(key, value):
+    """Cut a tokenized value down to what the old `key=([^,]+)`-style regex captured."""
+    if value is None:
+        return None
+    if key in DIGIT_FIELDS:
+        match = digits_pattern.match(value)
+        return match.group(0) if match else None
+    if key in UUID_FIELDS:
+        match = uuid_pattern.match(value)
+        return match.group(0) if match else None
+    value = value.split(',', 1)[0]
+    if key in BRACE_TERMINATED_FIELDS:
+        value = value.split('}', 1)[0]
+    return value or None
+
+
+def parse_fields(log_line, keys):
+    """Extract keys from a log line with the same values the old per-field regexes returned."""
+    fields = parse_metric_values(log_line)
+    if fields is None:
+        fields = tokenize(log_line)
+    result = {}
+    for key in keys:
+        value = fields.get(key)
+        if value is None or key in LEGACY_SPECIAL_FIELDS:
+            result[key] = legacy_value(key, value)
+        else:
+            result[key] = value.partition(',')[0] or None
+    return result
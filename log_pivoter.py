@@ -1,6 +1,8 @@
 import pandas as pd
 import os
 import glob
+import shutil
+from instansi_resolver import InstansiIndex, first_row
 
 folder_path = 'Processed Logs'
 print('Finding all CSV files in ' + folder_path + ' ...')
@@ -11,33 +13,88 @@ if not csv_files:
 
 print(f'Found {len(csv_files)} files. Processing and grouping each file...')
 columns_to_keep = ['log_timestamp', 'api_name', 'api_creator', 'application_owner', 'application_name']
+group_keys = ['log_timestamp', 'api_name', 'api_creator', 'application_owner', 'application_name']
+
+# Grouped rows held in memory before they spill to disk, split by date, and are merged one
+# date at a time at the end; the output is the same either way. None = never spill
+MEMORY_BUDGET_MB = 1024
+spill_folder = os.path.join(folder_path, '.spill')
 
 print('Loading mapping Excel file...')
 mapping_df = pd.read_excel('mapping.xlsx')
 mapping_df['Akun Nasional'] = mapping_df['Akun Nasional'].astype(str)
 mapping_df['Domain'] = mapping_df['Domain'].astype(str)
 
+# Exact account match first, then the first mapping row whose value is a substring, as the
+# old per-row loops did; lookups are indexed and memoized per distinct key
+akun_index = InstansiIndex(mapping_df['Akun Nasional'], mapping_df['Nama Instansi'])
+domain_index = InstansiIndex(mapping_df['Domain'], mapping_df['Nama Instansi'])
+
 def find_nama_instansi(api_creator):
-    match = mapping_df[mapping_df['Akun Nasional'] == str(api_creator)]
-    if not match.empty:
-        return match.iloc[0]['Nama Instansi']
-    for _, row in mapping_df.iterrows():
-        if row['Domain'] in str(api_creator):
-            return row['Nama Instansi']
-    return None
+    key = str(api_creator)
+    row = akun_index.first_equal(key)
+    if row is None:
+        row = domain_index.first_within(key)
+    return akun_index.name(row)
 
 def find_nama_instansi_requester(application_owner):
+    key = str(application_owner)
     # Exact match
-    match = mapping_df[mapping_df['Akun Nasional'] == str(application_owner)]
-    if not match.empty:
-        return match.iloc[0]['Nama Instansi']
-    # Substring match
-    for _, row in mapping_df.iterrows():
-        if str(application_owner) in row['Akun Nasional'] or row['Akun Nasional'] in str(application_owner):
-            return row['Nama Instansi']
-    return None
+    row = akun_index.first_equal(key)
+    if row is None:
+        # Substring match either way round
+        row = first_row(akun_index.first_containing(key), akun_index.first_within(key))
+    return akun_index.name(row)
+
+def spill_grouped(grouped_frames, date_partitions):
+    """Write the held per-file groups to spill_folder, one pickle per date; date_partitions lists each date's pickles."""
+    spilled = pd.concat(grouped_frames, ignore_index=True)
+    print(f'  Memory budget reached, spilling {len(spilled)} grouped rows to {spill_folder}...')
+    try:
+        os.makedirs(spill_folder, exist_ok=True)
+        for date, rows in spilled.groupby('log_timestamp', sort=False):
+            pickles = date_partitions.setdefault(date, [])
+            pickles.append(os.path.join(spill_folder, f'{list(date_partitions).index(date)}_{len(pickles)}.pkl'))
+            rows.to_pickle(pickles[-1])
+    except Exception:
+        # A full disk or a permission error is not a bad input file; stop and leave no partial partitions
+        print(f'Error: Spilling to {spill_folder} failed, removing it.')
+        shutil.rmtree(spill_folder, ignore_errors=True)
+        raise
+
+def final_grouping(all_grouped_df):
+    final_grouped = all_grouped_df.groupby(group_keys, as_index=False).agg({
+        'occurrence': 'sum',
+        'Nama Instansi': 'first'
+    })
+
+    # Rename 'Nama Instansi' to 'Nama Instansi Pemilik API'
+    final_grouped = final_grouped.rename(columns={'Nama Instansi': 'Nama Instansi Pemilik API'})
+
+    # Add 'Nama Instansi Requester' by mapping application_owner to mapping.Akun Nasional with both exact and substring rules
+    final_grouped['Nama Instansi Requester'] = final_grouped['application_owner'].apply(find_nama_instansi_requester)
+    final_grouped['Nama Instansi Requester'] = final_grouped['Nama Instansi Requester'].fillna('Tidak Terdaftar')
+    final_grouped['Nama Instansi Requester'].replace('', 'Tidak Terdaftar', inplace=True)
+
+    # Reorder columns: log_timestamp, Nama Instansi Pemilik API, api_name, api_creator, Nama Instansi Requester, application_owner, application_name, occurrence
+    new_order = [
+        'log_timestamp',
+        'Nama Instansi Pemilik API',
+        'api_name',
+        'api_creator',
+        'Nama Instansi Requester',
+        'application_owner',
+        'application_name',
+        'occurrence'
+    ]
+    final_grouped = final_grouped[new_order]
+    return final_grouped
 
 all_grouped = []
+held_bytes = 0
+date_partitions = {}
+if os.path.isdir(spill_folder):
+    shutil.rmtree(spill_folder)
 for file in csv_files:
     print(f'  Loading and grouping {file}...')
     try:
@@ -59,47 +116,38 @@ for file in csv_files:
         grouped = df.groupby(['log_timestamp', 'api_name', 'api_creator', 'application_owner', 'application_name']).size().reset_index(name='occurrence')
         # Map Nama Instansi here for each file's grouped data
         grouped['Nama Instansi'] = grouped['api_creator'].apply(find_nama_instansi)
-        all_grouped.append(grouped)
     except Exception as e:
         print(f'    Skipping {file} due to error: {e}')
+        continue
+    all_grouped.append(grouped)
+    held_bytes += grouped.memory_usage(deep=True).sum()
+    if MEMORY_BUDGET_MB and held_bytes > MEMORY_BUDGET_MB * 1024 * 1024:
+        spill_grouped(all_grouped, date_partitions)
+        all_grouped = []
+        held_bytes = 0
 
-if not all_grouped:
+if not all_grouped and not date_partitions:
     print('No valid CSV files loaded.')
     exit(1)
 
-print('Concatenating all grouped results...')
-all_grouped_df = pd.concat(all_grouped, ignore_index=True)
-
-print('Final grouping and summing occurrences...')
-final_grouped = all_grouped_df.groupby(
-    ['log_timestamp', 'api_name', 'api_creator', 'application_owner', 'application_name'],
-    as_index=False
-).agg({
-    'occurrence': 'sum',
-    'Nama Instansi': 'first'
-})
-
-# Rename 'Nama Instansi' to 'Nama Instansi Pemilik API'
-final_grouped = final_grouped.rename(columns={'Nama Instansi': 'Nama Instansi Pemilik API'})
-
-# Add 'Nama Instansi Requester' by mapping application_owner to mapping.Akun Nasional with both exact and substring rules
-final_grouped['Nama Instansi Requester'] = final_grouped['application_owner'].apply(find_nama_instansi_requester)
-final_grouped['Nama Instansi Requester'] = final_grouped['Nama Instansi Requester'].fillna('Tidak Terdaftar')
-final_grouped['Nama Instansi Requester'].replace('', 'Tidak Terdaftar', inplace=True)
-
-# Reorder columns: log_timestamp, Nama Instansi Pemilik API, api_name, api_creator, Nama Instansi Requester, application_owner, application_name, occurrence
-new_order = [
-    'log_timestamp',
-    'Nama Instansi Pemilik API',
-    'api_name',
-    'api_creator',
-    'Nama Instansi Requester',
-    'application_owner',
-    'application_name',
-    'occurrence'
-]
-final_grouped = final_grouped[new_order]
-
-print('Saving mapped result to Report_By_Date.csv...')
-final_grouped.to_csv('Report_By_Date.csv', index=False)
+if not date_partitions:
+    print('Concatenating all grouped results...')
+    all_grouped_df = pd.concat(all_grouped, ignore_index=True)
+    print('Final grouping and summing occurrences...')
+    final_grouped = final_grouping(all_grouped_df)
+    print('Saving mapped result to Report_By_Date.csv...')
+    final_grouped.to_csv('Report_By_Date.csv', index=False)
+else:
+    if all_grouped:
+        spill_grouped(all_grouped, date_partitions)
+        all_grouped = []
+    # groupby sorts by log_timestamp first, so merging the dates in order gives the same file
+    print(f'Final grouping and summing occurrences, one of {len(date_partitions)} dates at a time...')
+    print('Saving mapped result to Report_By_Date.csv...')
+    try:
+        for number, date in enumerate(sorted(date_partitions)):
+            date_df = pd.concat([pd.read_pickle(pickle) for pickle in date_partitions[date]], ignore_index=True)
+            final_grouping(date_df).to_csv('Report_By_Date.csv', index=False, mode='w' if number == 0 else 'a', header=number == 0)
+    finally:
+        shutil.rmtree(spill_folder, ignore_errors=True)
 print('Done!')
\ No newline at end of file
@@ -0,0 +1,104 @@
+import csv
+import mmap
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from log_files import log_file_date, open_log
+
+MIN_RANGE_BYTES = 1024*1024
+MAX_RANGE_BYTES = 64*1024*1024
+
+
+def get_worker_count():
+    default = os.cpu_count() or 1
+    choice = input(f"Worker processes (default {default}, 1 = sequential): ").strip()
+    if not choice:
+        return default
+    if not choice.isdigit() or int(choice) < 1:
+        print("Invalid worker count. Please enter a positive number.")
+        sys.exit()
+    return int(choice)
+
+
+def date_matches(date, file_date):
+    """Whether a day file's date falls in date: None for all, 'YYYY-MM-DD', or a (start, end) tuple."""
+    if date is None:
+        return True
+    if isinstance(date, tuple):
+        return date[0] <= file_date <= date[1]
+    return file_date == date
+
+
+def select_day_files(folder, date):
+    """Day files in folder matching date: None for all, 'YYYY-MM-DD', or a (start, end) tuple.
+
+    Files come back in date order, whatever order the filesystem lists them in, so first-seen
+    report rows run in the same order as the Parquet dataset's day partitions.
+    """
+    files = []
+    for file in folder.iterdir():
+        file_date = log_file_date(file.name)
+        if not file.is_file() or file_date is None:
+            continue
+        if date_matches(date, file_date):
+            files.append((file, file_date))
+    return sorted(files, key=lambda item: (item[1], item[0].name))
+
+
+def split_ranges(path, workers):
+    """Split a plain day file into byte ranges that each end on a newline.
+
+    Ranges are sized so every worker gets a few of them. Compressed files can't be entered
+    mid-stream, so they come back as a single (0, None) range read from the start.
+    """
+    path = str(path)
+    if path.endswith(('.gz', '.zst')):
+        return [(0, None)]
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    range_bytes = min(max(size // (workers * 4), MIN_RANGE_BYTES), MAX_RANGE_BYTES)
+    ranges = []
+    start = 0
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        while start < size:
+            end = mm.find(b'\n', min(start + range_bytes, size) - 1)
+            end = size if end == -1 else end + 1
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def iter_range_lines(path, start, end):
+    """Yield the raw lines (bytes) of one byte range; end=None reads the whole file."""
+    if end is None:
+        with open_log(path, binary=True) as f:
+            yield from f
+        return
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        mm.seek(start)
+        while mm.tell() < end:
+            yield mm.readline()
+
+
+def run_ranges(func, tasks, workers):
+    """Call func(*task) for every task, across a process pool when workers > 1.
+
+    Results come back in task order, so partial results merge the same way the
+    sequential scan would have produced them.
+    """
+    if workers == 1 or len(tasks) <= 1:
+        return [func(*task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        return list(executor.map(func, *zip(*tasks)))
+
+
+def concat_parts(output_file, header, part_files):
+    """Write header and then each worker's part CSV, in order, into output_file."""
+    with open(output_file, 'w', encoding='utf-8', newline='', buffering=1024*1024) as outfile:
+        csv.writer(outfile).writerow(header)
+        for part_file in part_files:
+            with open(part_file, 'r', encoding='utf-8', newline='') as part:
+                shutil.copyfileobj(part, outfile, 1024*1024)
+            os.remove(part_file)
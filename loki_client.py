@@ -0,0 +1,121 @@
+import random
+import threading
+import time
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class LokiQueryError(Exception):
+    pass
+
+
+def read_values(response):
+    if ijson is not None and ijson.backend in ('yajl2_c', 'yajl2_cffi'):
+        response.raw.decode_content = True
+        return [(int(value[0]), value[1]) for value in ijson.items(response.raw, 'data.result.item.values.item')]
+    return [(int(value[0]), value[1]) for stream in response.json()['data']['result'] for value in stream['values']]
+
+
+class LokiClient:
+    """Shared query_range client for the exporters.
+
+    Keeps one pooled keep-alive session, asks for gzip, retries 429/5xx responses and
+    timeouts with bounded exponential backoff, and keeps per-request timing stats.
+    Safe to share between the shard worker threads.
+    """
+
+    def __init__(self, url, pool_size=4, max_retries=5, backoff=1.0, max_backoff=60.0, timeout=(10, 600)):
+        self.url = url
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Accept-Encoding': 'gzip'})
+
+        self.lock = threading.Lock()
+        self.request_times = []
+        self.retries = 0
+        self.failures = 0
+        self.bytes_received = 0
+
+    def query_range(self, params):
+        """GET query_range and return the decoded JSON body, retrying transient failures."""
+        return self._request(params, lambda response: response.json())
+
+    def query_range_values(self, params):
+        """GET query_range and return every stream's entries as (timestamp_ns, line) pairs.
+
+        The body is streamed through ijson's C backend when it is installed, so the log lines
+        are never materialised as a whole decoded document; otherwise it falls back to json().
+        """
+        return self._request(params, read_values, stream=True)
+
+    def _request(self, params, read, stream=False):
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            retry_after = None
+            try:
+                response = self.session.get(self.url, params=params, timeout=self.timeout, stream=stream)
+                try:
+                    if response.status_code == 200:
+                        result = read(response)
+                    else:
+                        error = f"Error: {response.status_code} {response.text[:500]}"
+                        retry_after = response.headers.get('Retry-After')
+                finally:
+                    response.close()
+            except (requests.Timeout, requests.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                    urllib3.exceptions.HTTPError) as e:
+                self._record(time.perf_counter() - started, 0, failed=True)
+                error = f"{type(e).__name__}: {e}"
+            else:
+                self._record(time.perf_counter() - started, response.raw.tell(),
+                             failed=response.status_code != 200)
+                if response.status_code == 200:
+                    return result
+                if response.status_code not in RETRY_STATUS:
+                    raise LokiQueryError(error)
+
+            if attempt >= self.max_retries:
+                raise LokiQueryError(f"giving up after {attempt + 1} attempts, last error: {error}")
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+            if retry_after is not None and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            print(f"{error}, retrying in {delay:.1f}s")
+            with self.lock:
+                self.retries += 1
+            time.sleep(delay)
+            attempt += 1
+
+    def _record(self, elapsed, size, failed):
+        with self.lock:
+            self.request_times.append(elapsed)
+            self.bytes_received += size
+            if failed:
+                self.failures += 1
+
+    def summary(self):
+        with self.lock:
+            times = sorted(self.request_times)
+            if not times:
+                return "No requests issued"
+            return (
+                f"Requests: {len(times)} (retries: {self.retries}, failed: {self.failures})\n"
+                f"Bytes received: {self.bytes_received}\n"
+                f"Request time: total {sum(times):.1f}s, mean {sum(times) / len(times):.3f}s, "
+                f"p50 {times[len(times) // 2]:.3f}s, p95 {times[int(len(times) * 0.95)]:.3f}s, max {times[-1]:.3f}s"
+            )
@@ -1,57 +1,60 @@
 import pandas as pd
 import re
+from instansi_resolver import InstansiIndex, NOT_REGISTERED, SEPARATOR
 
 df_mapping = pd.read_excel("mapping.xlsx")
 df_source = pd.read_excel("listapi.xlsx")
 
+# First matching mapping row, as the old per-row loops returned, from indexed and memoized lookups
+domain_index = InstansiIndex([str(domain) for domain in df_mapping["Domain"]], df_mapping["Nama Instansi"])
+akun_index = InstansiIndex([str(akun) for akun in df_mapping["Akun Nasional"]], df_mapping["Nama Instansi"])
+
+
+def admin_index(tipe=None):
+    """Rows of one Tipe Instansi (or all) searched by their normalized name, account and domain."""
+    rows = df_mapping if tipe is None else df_mapping[df_mapping["Tipe Instansi"] == tipe]
+    texts = [SEPARATOR.join([str(nama).lower().replace(" ", ""), str(akun).lower(), str(domain).lower()])
+             for nama, akun, domain in zip(rows["Nama Instansi"], rows["Akun Nasional"], rows["Domain"])]
+    return InstansiIndex(texts, rows["Nama Instansi"])
+
+
+admin_indexes = {tipe: admin_index(tipe) for tipe in [None, "Provinsi", "Kabupaten", "Kota"]}
+
+
+def find_admin_instansi(api_name, cleaned_str, tipe=None):
+    index = admin_indexes[tipe]
+    row = index.first_containing(cleaned_str)
+    if row is None:
+        return NOT_REGISTERED
+    print(api_name, index.names[row])
+    return index.names[row]
+
+
 def find_instansi(api_provider, api_name=None):
     if pd.isna(api_provider):
         return None
     if "@" in api_provider:
-        for _, row in df_mapping.iterrows():
-            domain = str(row["Domain"])
-            if pd.notna(domain) and domain in api_provider:
-                return row["Nama Instansi"]
+        return domain_index.name(domain_index.first_within(api_provider), NOT_REGISTERED)
     elif api_provider == "admin":
         api_name = str(api_name).lower()
         if "prov" in api_name:
             cleaned_str = re.sub(r'satudata|opendata|prov|data|open|-CSW|portal|-|_', '', api_name, flags=re.IGNORECASE)
             cleaned_str = cleaned_str.strip().replace(" ", "")
-            for _, row in df_mapping.iterrows():
-                nama_instansi = str(row["Nama Instansi"])
-                if pd.notna(nama_instansi) and (cleaned_str in nama_instansi.lower().replace(" ", "") or cleaned_str in str(row["Akun Nasional"]).lower() or cleaned_str in str(row["Domain"]).lower()) and row["Tipe Instansi"] == "Provinsi":
-                    print(api_name, row["Nama Instansi"])
-                    return row["Nama Instansi"]
+            return find_admin_instansi(api_name, cleaned_str, "Provinsi")
         elif "kab" in api_name:
             cleaned_str = re.sub(r'satudata|opendata|kab|data|open|-CSW|portal|-|_', '', api_name, flags=re.IGNORECASE)
             cleaned_str = cleaned_str.strip().replace(" ", "")
-            for _, row in df_mapping.iterrows():
-                nama_instansi = str(row["Nama Instansi"])
-                if pd.notna(nama_instansi) and (cleaned_str in nama_instansi.lower().replace(" ", "") or cleaned_str in str(row["Akun Nasional"]).lower() or cleaned_str in str(row["Domain"]).lower()) and row["Tipe Instansi"] == "Kabupaten":
-                    print(api_name, row["Nama Instansi"])
-                    return row["Nama Instansi"]
+            return find_admin_instansi(api_name, cleaned_str, "Kabupaten")
         elif "kota" in api_name:
             cleaned_str = re.sub(r'satudata|opendata|kota|data|open|-CSW|portal|-|_', '', api_name, flags=re.IGNORECASE)
             cleaned_str = cleaned_str.strip().replace(" ", "")
-            for _, row in df_mapping.iterrows():
-                nama_instansi = str(row["Nama Instansi"])
-                if pd.notna(nama_instansi) and (cleaned_str in nama_instansi.lower().replace(" ", "") or cleaned_str in str(row["Akun Nasional"]).lower() or cleaned_str in str(row["Domain"]).lower()) and row["Tipe Instansi"] == "Kota":
-                    print(api_name, row["Nama Instansi"])
-                    return row["Nama Instansi"]
+            return find_admin_instansi(api_name, cleaned_str, "Kota")
         else:
             cleaned_str = re.sub(r'satudata|opendata|data|open|-CSW|portal|-|_', '', api_name, flags=re.IGNORECASE)
             cleaned_str = cleaned_str.strip().replace(" ", "")
-            for _, row in df_mapping.iterrows():
-                nama_instansi = str(row["Nama Instansi"])
-                if pd.notna(nama_instansi) and (cleaned_str in nama_instansi.lower().replace(" ", "") or cleaned_str in str(row["Akun Nasional"]).lower() or cleaned_str in str(row["Domain"]).lower()):
-                    print(api_name, row["Nama Instansi"])
-                    return row["Nama Instansi"]
+            return find_admin_instansi(api_name, cleaned_str)
     else:
-        for _, row in df_mapping.iterrows():
-            akun = str(row["Akun Nasional"])
-            if pd.notna(akun) and akun in api_provider:
-                return row["Nama Instansi"]
-    return "Tidak Terdaftar"
+        return akun_index.name(akun_index.first_within(api_provider), NOT_REGISTERED)
 
 df_source["Nama Instansi"] = df_source.apply(lambda row: find_instansi(row["api_provider"], row["api_name"]), axis=1)
 
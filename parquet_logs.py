@@ -0,0 +1,347 @@
+import io
+import json
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.compute as pc
+import pyarrow.json as pa_json
+from log_parser import METRIC_PREFIX, parse_metric_values
+
+zone_suffix_pattern = r'(Z|[+-]\d{2}:?\d{2})$'
+
+INT_FIELDS = {'proxyResponseCode', 'backendLatency', 'requestMediationLatency',
+              'targetResponseCode', 'responseLatency', 'responseMediationLatency'}
+BOOL_FIELDS = {'responseCacheHit'}
+TIMESTAMP_FIELDS = ['requestTimestamp', 'time']
+
+# Columns that repeat a lot get dictionary pages; near-unique ones (correlationId, userIp,
+# timestamps) are written plain instead of building a dictionary and falling back
+DICTIONARY_COLUMNS = ['apiName', 'apiCreator', 'apiCreatorTenantDomain', 'applicationOwner', 'applicationName',
+                      'keyType', 'apiId', 'applicationId', 'apiContext', 'apiVersion', 'apiMethod', 'apiType',
+                      'apiResourceTemplate', 'destination', 'errorType', 'platform', 'gatewayType', 'eventType',
+                      'regionId', 'userAgent', 'stream', 'proxyResponseCode', 'targetResponseCode',
+                      'backendLatency', 'requestMediationLatency', 'responseLatency', 'responseMediationLatency']
+
+LOG_SCHEMA = pa.schema([
+    ('apiName', pa.string()),
+    ('proxyResponseCode', pa.int32()),
+    ('errorType', pa.string()),
+    ('destination', pa.string()),
+    ('apiCreatorTenantDomain', pa.string()),
+    ('platform', pa.string()),
+    ('apiMethod', pa.string()),
+    ('apiVersion', pa.string()),
+    ('gatewayType', pa.string()),
+    ('apiCreator', pa.string()),
+    ('responseCacheHit', pa.bool_()),
+    ('backendLatency', pa.int32()),
+    ('correlationId', pa.string()),
+    ('requestMediationLatency', pa.int32()),
+    ('keyType', pa.string()),
+    ('apiId', pa.string()),
+    ('applicationName', pa.string()),
+    ('targetResponseCode', pa.int32()),
+    ('requestTimestamp', pa.timestamp('us')),
+    ('applicationOwner', pa.string()),
+    ('userAgent', pa.string()),
+    ('eventType', pa.string()),
+    ('apiResourceTemplate', pa.string()),
+    ('regionId', pa.string()),
+    ('responseLatency', pa.int32()),
+    ('responseMediationLatency', pa.int32()),
+    ('userIp', pa.string()),
+    ('apiContext', pa.string()),
+    ('applicationId', pa.string()),
+    ('apiType', pa.string()),
+    ('stream', pa.string()),
+    ('time', pa.timestamp('us'))
+])
+
+
+def parse_log_content(log_content):
+    """Parse the structured log content into a dictionary of fields.
+
+    Integer and boolean fields are coerced here; timestamps are left as strings and
+    converted column-wise by logs_to_table.
+    """
+    try:
+        log_message = log_content["log"]
+
+        metric_values = parse_metric_values(log_message)
+        if metric_values is not None:
+            parsed_log = dict.fromkeys(LOG_SCHEMA.names)
+            parsed_log['stream'] = str(log_content.get("stream")) if log_content.get("stream") else None
+            parsed_log['time'] = log_content.get("time") or None
+
+            for key, value in metric_values.items():
+                if key in INT_FIELDS:
+                    value = int(value) if value.isdigit() else None
+                elif key in BOOL_FIELDS:
+                    value = value.lower() == 'true'
+                else:
+                    value = value if value else None
+                parsed_log[key] = value
+
+            return parsed_log
+
+    except Exception as e:
+        print(f"Error parsing log content: {str(e)}")
+        return None
+
+
+def logs_to_table(parsed_logs):
+    """Build a LOG_SCHEMA table from parsed logs, converting the timestamp columns in bulk.
+
+    Zone designators are dropped before parsing, so timestamps keep their wall-clock value,
+    and are floored to microseconds to fit the schema.
+    """
+    df = pd.DataFrame(parsed_logs, columns=LOG_SCHEMA.names)
+    for col in TIMESTAMP_FIELDS:
+        values = df[col].astype('string').str.replace(zone_suffix_pattern, '', regex=True)
+        df[col] = pd.to_datetime(values, format='ISO8601', errors='coerce').dt.floor('us')
+    return pa.Table.from_pandas(df, schema=LOG_SCHEMA, preserve_index=False)
+
+
+RAW_SCHEMA = pa.schema([('log', pa.string()), ('stream', pa.string()), ('time', pa.string())])
+
+
+def metric_bodies(log_messages):
+    """Column-wise parse_metric_values prologue: the text between `Metric Value: {` and the last `}`.
+
+    Null where a message has no Metric Value block.
+    """
+    parts = pc.split_pattern(log_messages, METRIC_PREFIX, max_splits=1)
+    has_block = pc.equal(pc.list_value_length(parts), 2)
+    rest = pc.list_element(pc.if_else(has_block, parts, pa.scalar([None, ''], parts.type)), 1)
+    body = pc.list_element(pc.split_pattern(rest, '}', max_splits=1, reverse=True), 0)
+    return pc.if_else(has_block, body, None)
+
+
+def tokenize_column(body):
+    """Column-wise log_parser.tokenize, as {key: values aligned with body}.
+
+    Bodies are split on ', ' in one go; pieces that don't start with `key=` are joined back
+    onto the key before them, and a repeated key keeps its last value, as in the dict.
+    """
+    nrows = len(body)
+    pieces = pc.split_pattern(body, ', ')
+    piece_rows = pc.list_parent_indices(pieces).to_numpy()
+    flat = pc.list_flatten(pieces)
+    if len(flat) == 0:
+        return {}
+    is_key = pc.match_substring_regex(flat, r'^[A-Za-z_]\w*=').to_numpy(zero_copy_only=False)
+    if is_key.all():
+        pairs = pc.split_pattern(flat, '=', max_splits=1)
+        group_rows = piece_rows
+    else:
+        # Cut at every key and at every row start so leading orphan pieces never join another row
+        cut = is_key.copy()
+        cut[np.flatnonzero(np.diff(piece_rows, prepend=-1))] = True
+        cuts = np.flatnonzero(cut)
+        groups = pa.ListArray.from_arrays(pa.array(np.append(cuts, len(flat)), pa.int32()), flat)
+        keyed = is_key[cuts]
+        pairs = pc.split_pattern(pc.binary_join(groups.filter(pa.array(keyed)), ', '), '=', max_splits=1)
+        group_rows = piece_rows[cuts[keyed]]
+
+    names = pc.dictionary_encode(pc.list_element(pairs, 0))
+    values = pc.list_element(pairs, 1)
+    codes = names.indices.to_numpy()
+    columns = {}
+    for code, name in enumerate(names.dictionary.to_pylist()):
+        positions = np.full(nrows, -1)
+        matched = np.flatnonzero(codes == code)
+        positions[group_rows[matched]] = matched
+        columns[name] = pc.take(values, pa.array(positions, mask=positions < 0))
+    return columns
+
+
+def to_timestamp_us(values):
+    values = pc.replace_substring_regex(values, zone_suffix_pattern, '')
+    try:
+        timestamps = pc.cast(values, pa.timestamp('ns'))
+    except pa.ArrowInvalid:
+        timestamps = pa.array(pd.to_datetime(values.to_pandas(), format='ISO8601', errors='coerce'), pa.timestamp('ns'))
+    return pc.cast(pc.floor_temporal(timestamps, unit='microsecond'), pa.timestamp('us'))
+
+
+def parse_log_block(data):
+    """Parse a block of NDJSON bytes into a LOG_SCHEMA table column-wise with Arrow kernels.
+
+    Gives the same rows as parse_log_content + logs_to_table. When Arrow can't read the
+    block, the lines that aren't valid JSON are reported and dropped and the rest retried;
+    if that fails too, the block goes through the per-line path. Returns (table, lines
+    decoded, lines that weren't valid JSON).
+    """
+    errors = 0
+    try:
+        raw = read_raw_block(data)
+    except pa.ArrowInvalid:
+        lines, errors = valid_json_lines(data)
+        try:
+            raw = read_raw_block(b'\n'.join(lines))
+        except pa.ArrowInvalid:
+            table, decoded, _ = parse_log_lines(lines)
+            return table, decoded, errors
+    return raw_to_table(raw), raw.num_rows, errors
+
+
+def read_raw_block(data):
+    return pa_json.read_json(io.BytesIO(data), parse_options=pa_json.ParseOptions(
+        explicit_schema=RAW_SCHEMA, unexpected_field_behavior='ignore'))
+
+
+def valid_json_lines(data):
+    """Split a block into its JSON lines, reporting the ones that don't decode."""
+    lines = []
+    errors = 0
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        try:
+            json.loads(line)
+        except json.JSONDecodeError as e:
+            print(f"Error parsing line: {str(e)}")
+            errors += 1
+            continue
+        lines.append(line)
+    return lines, errors
+
+
+def raw_to_table(raw):
+    """Build the LOG_SCHEMA table from a RAW_SCHEMA table of decoded lines."""
+    body = metric_bodies(raw['log'].combine_chunks())
+    keep = pc.is_valid(body)
+    fields = tokenize_column(body.filter(keep))
+    fields['stream'] = raw['stream'].combine_chunks().filter(keep)
+    fields['time'] = raw['time'].combine_chunks().filter(keep)
+    nrows = len(fields['time'])
+
+    columns = []
+    for field in LOG_SCHEMA:
+        values = fields.get(field.name)
+        if values is None:
+            columns.append(pa.nulls(nrows, field.type))
+            continue
+        if field.name in INT_FIELDS:
+            values = pc.cast(pc.if_else(pc.utf8_is_digit(values), values, None), field.type)
+        elif field.name in BOOL_FIELDS:
+            values = pc.equal(pc.utf8_lower(values), 'true')
+        elif field.name in TIMESTAMP_FIELDS:
+            values = to_timestamp_us(pc.if_else(pc.equal(values, ''), None, values))
+        else:
+            values = pc.if_else(pc.equal(values, ''), None, values)
+        columns.append(values)
+
+    return pa.Table.from_arrays(columns, schema=LOG_SCHEMA)
+
+
+def parse_log_lines(lines):
+    """Row-wise parse of raw NDJSON lines; malformed lines are reported and skipped."""
+    parsed_logs = []
+    decoded = errors = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            log_content = json.loads(line)
+        except json.JSONDecodeError as e:
+            print(f"Error parsing line: {str(e)}")
+            errors += 1
+            continue
+        decoded += 1
+        parsed_log = parse_log_content(log_content)
+        if parsed_log:
+            parsed_logs.append(parsed_log)
+    return logs_to_table(parsed_logs), decoded, errors
+
+
+def parquet_layout(settings):
+    """Return (sort keys, ParquetWriter options) from the PARQUET_* keys of config.yaml's CONFIG.
+
+    Defaults keep the old layout: snappy, sorted by time.
+    """
+    sort_by = settings.get('PARQUET_SORT_BY', ['time']) or []
+    options = {
+        'compression': settings.get('PARQUET_COMPRESSION', 'snappy'),
+        'use_dictionary': settings.get('PARQUET_DICTIONARY_COLUMNS', DICTIONARY_COLUMNS),
+        # The default 1 MB limit silently falls back to plain encoding on a busy day
+        'dictionary_pagesize_limit': 8*1024*1024,
+    }
+    if settings.get('PARQUET_COMPRESSION_LEVEL') is not None:
+        options['compression_level'] = int(settings['PARQUET_COMPRESSION_LEVEL'])
+    if sort_by:
+        options['sorting_columns'] = pq.SortingColumn.from_ordering(LOG_SCHEMA, [(key, 'ascending') for key in sort_by])
+    return sort_by, options
+
+
+def sort_table(table, sort_by):
+    if not sort_by:
+        return table
+    return table.take(pc.sort_indices(table, sort_keys=[(key, 'ascending') for key in sort_by]))
+
+
+def day_file_path(log_dir, current_date):
+    print_time_str = pd.Timestamp(current_date).strftime('%Y-%m-%d')
+    return os.path.join(log_dir, f'day={print_time_str}', 'logs.parquet')
+
+
+def day_partition_path(log_dir, current_date):
+    parquet_path = day_file_path(log_dir, current_date)
+    os.makedirs(os.path.dirname(parquet_path), exist_ok=True)
+    return parquet_path
+
+
+def partial_path(parquet_path):
+    """Where a day file is written until it is complete; the leading underscore keeps Arrow off it."""
+    folder, name = os.path.split(parquet_path)
+    return os.path.join(folder, f'_{name}.partial')
+
+
+class ParquetDayWriter:
+    """Stream one day of raw NDJSON log lines into day=YYYY-MM-DD/logs.parquet.
+
+    Lines are buffered and parsed a row group at a time with parse_log_block, so memory
+    stays bounded by one row group however big the day is. sort_by orders rows within each
+    row group only; write_options come from parquet_layout. Row groups go to a partial file
+    Arrow skips, renamed to logs.parquet once close() has written its footer, so a crash
+    mid-day never leaves an unreadable file in the dataset.
+    """
+
+    def __init__(self, current_date, log_dir, row_group_size, sort_by=None, write_options=None):
+        self.parquet_path = day_partition_path(log_dir, current_date)
+        self.partial_path = partial_path(self.parquet_path)
+        self.row_group_size = row_group_size
+        self.sort_by = sort_by
+        self.write_options = write_options or {'compression': 'snappy'}
+        self.buffer = []
+        self.records = 0
+        self.writer = None
+
+    def write(self, lines):
+        for line in lines:
+            self.buffer.append(line)
+            if len(self.buffer) >= self.row_group_size:
+                self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        table, _, _ = parse_log_block('\n'.join(self.buffer).encode('utf-8'))
+        self.buffer = []
+        if table.num_rows == 0:
+            return
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.partial_path, LOG_SCHEMA, **self.write_options)
+        self.writer.write_table(sort_table(table, self.sort_by), row_group_size=self.row_group_size)
+        self.records += table.num_rows
+
+    def close(self):
+        self.flush()
+        if self.writer is None:
+            print("No valid logs to write")
+            return
+        self.writer.close()
+        os.replace(self.partial_path, self.parquet_path)
+        print(f"Written {self.records} records to {self.parquet_path}")
@@ -0,0 +1,116 @@
+import re
+from pathlib import Path
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from parquet_logs import LOG_SCHEMA
+
+RECAP_KEY = ['apiCreator', 'apiName', 'applicationOwner', 'applicationName', 'userIp', 'apiCreatorTenantDomain']
+
+# The NDJSON reports cleanse on the whole raw line; here that is every string field of the
+# Metric Value block (stream is Docker's, not part of the line)
+CLEANSE_COLUMNS = [field.name for field in LOG_SCHEMA if field.type == pa.string() and field.name != 'stream']
+
+
+def open_dataset(parquet_dir):
+    """The day=YYYY-MM-DD partitioned dataset written by convert_ndjson_to_parquet / get_loki_logs.
+
+    Only the .parquet files of the day= partitions are read: the root also holds the fetcher's
+    checkpoint manifest, and unfinished day files keep a leading underscore until renamed.
+    """
+    files = sorted(str(path) for path in Path(parquet_dir).glob('day=*/*.parquet') if not path.name.startswith(('_', '.')))
+    return ds.dataset(files, format='parquet', partition_base_dir=str(parquet_dir),
+                      partitioning=ds.partitioning(pa.schema([('day', pa.string())]), flavor='hive'))
+
+
+def log_filter(date, iL, cleanse_words=None):
+    """Dataset filter for a report run: day partitions, National/Internal tenant, optional cleanse.
+
+    date is None, 'YYYY-MM-DD' or a (start, end) tuple, as in the NDJSON reports; it only
+    touches the day= partition key, so other days' files are never opened.
+    """
+    tenant = ds.field('apiCreatorTenantDomain')
+    expression = tenant == 'carbon.super' if iL == "1" else tenant != 'carbon.super'
+    if isinstance(date, tuple):
+        expression &= (ds.field('day') >= date[0]) & (ds.field('day') <= date[1])
+    elif date is not None:
+        expression &= ds.field('day') == date
+    if cleanse_words:
+        pattern = '|'.join(re.escape(word) for word in cleanse_words)
+        dirty = None
+        for column in CLEANSE_COLUMNS:
+            match = pc.coalesce(pc.match_substring_regex(ds.field(column), pattern=pattern), pa.scalar(False))
+            dirty = match if dirty is None else dirty | match
+        expression &= ~dirty
+    return expression
+
+
+def legacy_strings(values):
+    """Cut values at the first comma and turn '' into null, as parse_fields does for plain fields."""
+    first = pc.list_element(pc.split_pattern(values, ',', max_splits=1), 0)
+    return pc.if_else(pc.equal(first, ''), None, first)
+
+
+def differs(left, right):
+    """left != right with Python's None semantics: None == None, None != 'x'."""
+    both = pc.and_(pc.is_valid(left), pc.is_valid(right))
+    return pc.if_else(both, pc.not_equal(left, right), pc.xor(pc.is_valid(left), pc.is_valid(right)))
+
+
+def scan_batches(dataset, columns, expression):
+    """Record batches for the rows passing expression, day by day in file order.
+
+    Only partitions the expression can match are opened, and only the listed columns are
+    read; rows come back in the same order an NDJSON scan of the day files would see them.
+    """
+    for fragment in sorted(dataset.get_fragments(filter=expression), key=lambda fragment: fragment.path):
+        yield from fragment.to_batches(schema=dataset.schema, columns=columns, filter=expression)
+
+
+def recap_counts(dataset, expression):
+    """Successful cross-owner hits grouped by the recap key and day.
+
+    Returns a table of RECAP_KEY + day + count_all, in first-seen order: group_by does not
+    keep it, so every row carries its ordinal and the groups are sorted by their first one.
+    """
+    batches = []
+    offset = 0
+    for batch in recap_batches(dataset, expression):
+        batches.append(batch.append_column('ordinal', pa.array(range(offset, offset + batch.num_rows), pa.int64())))
+        offset += batch.num_rows
+    table = pa.Table.from_batches(batches, schema=pa.schema([(name, pa.string()) for name in RECAP_KEY + ['day']]
+                                                            + [('ordinal', pa.int64())]))
+    table = table.group_by(RECAP_KEY + ['day'], use_threads=False).aggregate([([], 'count_all'), ('ordinal', 'min')])
+    return table.sort_by('ordinal_min').drop_columns(['ordinal_min'])
+
+
+def recap_batches(dataset, expression):
+    """Record batches of RECAP_KEY + day (legacy strings) for the successful cross-owner hits, streamed."""
+    expression &= (ds.field('proxyResponseCode') == 200) & (ds.field('targetResponseCode') == 200)
+    for batch in scan_batches(dataset, RECAP_KEY + ['day'], expression):
+        batch = pa.record_batch([legacy_strings(batch[name]) for name in RECAP_KEY] + [batch['day']], names=RECAP_KEY + ['day'])
+        yield batch.filter(differs(batch['applicationOwner'], batch['apiCreator']))
+
+
+def all_dataset_batches(dataset, expression, columns):
+    """Record batches of the requested columns for every row passing expression, streamed."""
+    for batch in scan_batches(dataset, columns, expression):
+        yield pa.record_batch([legacy_strings(batch[name]) if batch.schema.field(name).type == pa.string() else batch[name]
+                               for name in columns], names=columns)
+
+
+def concurrency_batches(dataset, expression):
+    """(epoch seconds, apiName, apiCreatorTenantDomain) per batch, for every row with a Docker `time`.
+
+    Seconds come back as an int64 numpy array; the names as legacy strings.
+    """
+    for batch in scan_batches(dataset, ['time', 'apiName', 'apiCreatorTenantDomain'], expression & ds.field('time').is_valid()):
+        seconds = pc.cast(batch['time'], pa.int64()).to_numpy(zero_copy_only=False) // 1_000_000
+        yield seconds, legacy_strings(batch['apiName']), legacy_strings(batch['apiCreatorTenantDomain'])
+
+
+def latency_batches(dataset, expression, fields):
+    """(apiName list, applicationOwner list, {field: int64 array, -1 where missing}) per batch."""
+    for batch in scan_batches(dataset, ['apiName', 'applicationOwner'] + fields, expression):
+        yield (legacy_strings(batch['apiName']).to_pylist(), legacy_strings(batch['applicationOwner']).to_pylist(),
+               {field: pc.fill_null(pc.cast(batch[field], pa.int64()), -1).to_numpy(zero_copy_only=False) for field in fields})
@@ -0,0 +1,462 @@
+import csv
+import os
+from collections import Counter
+import numpy as np
+import pyarrow as pa
+from approx_sketches import HyperLogLog, SpaceSaving
+from concurrency import HitCounts, epoch_seconds, second_strings
+from latency_sketch import LatencySketch
+from spill_partitions import SpillPartitions
+from log_scan import concat_parts
+from report_writers import open_report
+from parquet_reports import RECAP_KEY, recap_counts, recap_batches, all_dataset_batches, concurrency_batches, latency_batches
+
+ALL_DATASET_FIELDS = ["apiName", "apiCreator", "backendLatency", "requestMediationLatency", "apiId", "applicationName", "applicationOwner", "responseMediationLatency", "applicationId"]
+
+RECAP_HEADER = ["Instansi Pemilik API", "apiCreator", "apiName", "Instansi API Requester", "apiCreatorTenantDomain", "applicationOwner", "applicationName", "userIp", "Occurrence"]
+
+OVERVIEW_KEY = ["apiCreator", "apiName", "applicationOwner", "applicationName", "userIp"]
+OVERVIEW_TOP = 10
+OVERVIEW_COUNTERS = 100
+
+LATENCY_FIELDS = ["backendLatency", "requestMediationLatency", "responseMediationLatency"]
+LATENCY_QUANTILES = [("p50", 0.5), ("p90", 0.9), ("p99", 0.99)]
+
+RESOLUTION_HEADER = ["Scope", "Name", "Resolution", "Active Buckets", "Peak Hits", "Peak At", "Peak Rate/s", "p50 Rate/s", "p95 Rate/s", "p99 Rate/s"]
+
+# Every accumulator takes records with add(timestamp, parsed fields, log_date) during an NDJSON
+# scan, or a whole filtered Parquet dataset with add_dataset(). Each byte range fills its own
+# accumulators; close() ends the range and merge() folds ranges together in file order.
+# write() streams the rows into a report_writers report: output_stem plus the format's extension.
+
+
+class AllDatasetAccumulator:
+    """All Dataset rows, streamed to a part CSV per range and concatenated on write()."""
+    needs_fields = True
+
+    def __init__(self, part_file=None):
+        self.part_files = [part_file] if part_file else []
+        self.outfile = None
+        self.writer = None
+
+    def open_part(self):
+        if self.writer is None:
+            self.outfile = open(self.part_files[-1], 'w', encoding='utf-8', newline='', buffering=1024*1024)
+            self.writer = csv.writer(self.outfile)
+        return self.writer
+
+    def add(self, timestamp, match, log_date):
+        if match is None:
+            return
+        self.open_part().writerow([match[key] for key in ALL_DATASET_FIELDS])
+
+    def add_dataset(self, dataset, expression):
+        writer = self.open_part()
+        for batch in all_dataset_batches(dataset, expression, ALL_DATASET_FIELDS):
+            writer.writerows(zip(*(column.to_pylist() for column in batch.columns)))
+
+    def close(self):
+        self.open_part()
+        self.outfile.close()
+        self.outfile = None
+        self.writer = None
+
+    def merge(self, other):
+        self.part_files += other.part_files
+
+    def write(self, output_file):
+        concat_parts(output_file, ALL_DATASET_FIELDS, self.part_files)
+        self.part_files = []
+
+
+class RecapAccumulator:
+    """Successful cross-owner hits per recap key and day; one accumulator feeds both views.
+
+    Key components are interned into per-column integer codes and a key is one packed int,
+    so a key costs a dict entry and a row of an int32 keys x days matrix instead of a tuple
+    of strings and a dict per key. Rows stay in first-seen order.
+
+    With a spill_prefix and memory_mb, the keys held in memory are written out to
+    SpillPartitions whenever they pass memory_mb, and write() merges them back, so ranges
+    with more keys than RAM still produce the same workbook. Every key carries its
+    first-seen ordinal for that merge.
+    """
+    needs_fields = True
+    code_bits = 32
+    budget_check_rows = 4096
+
+    def __init__(self, spill_prefix=None, memory_mb=None):
+        self.spill_prefix = spill_prefix
+        self.memory_mb = memory_mb
+        self.spilled = SpillPartitions(spill_prefix, RECAP_KEY)
+        self.spilled_days = set()
+        self.next_ordinal = 0
+        self.reset()
+
+    def reset(self):
+        self.values = [{} for _ in RECAP_KEY]
+        self.rows = {}
+        self.days = {}
+        self.counts = np.zeros((1024, 1), np.int32)
+        self.ordinals = np.zeros(1024, np.int64)
+        self.next_check = self.budget_check_rows
+
+    def row(self, key, ordinal=None):
+        packed = 0
+        for values, value in zip(self.values, key):
+            code = values.get(value)
+            if code is None:
+                code = values[value] = len(values)
+            packed = packed << self.code_bits | code
+        row = self.rows.get(packed)
+        if row is None:
+            row = self.rows[packed] = len(self.rows)
+            if row == len(self.counts):
+                self.counts = np.vstack([self.counts, np.zeros_like(self.counts)])
+                self.ordinals = np.concatenate([self.ordinals, np.zeros_like(self.ordinals)])
+            if ordinal is None:
+                ordinal = self.next_ordinal
+                self.next_ordinal += 1
+            self.ordinals[row] = ordinal
+        return row
+
+    def column(self, log_date):
+        column = self.days.get(log_date)
+        if column is None:
+            column = self.days[log_date] = len(self.days)
+            if column == self.counts.shape[1]:
+                self.counts = np.hstack([self.counts, np.zeros_like(self.counts)])
+        return column
+
+    def add_count(self, key, log_date, count):
+        row, column = self.row(key), self.column(log_date)
+        self.counts[row, column] += count
+        if len(self.rows) >= self.next_check:
+            self.check_memory()
+
+    def memory_bytes(self):
+        """Rough size of the in-memory keys: dict entries and packed ints, interned strings, arrays."""
+        return 100*len(self.rows) + 110*sum(len(values) for values in self.values) + self.counts.nbytes + self.ordinals.nbytes
+
+    def check_memory(self):
+        self.next_check = len(self.rows) + self.budget_check_rows
+        if self.spill_prefix and self.memory_mb and self.memory_bytes() > self.memory_mb * 1024*1024:
+            self.spill()
+
+    def spill(self):
+        if not self.rows:
+            return
+        print(f"Recap keys over {self.memory_mb} MB, spilling {len(self.rows)} keys to disk")
+        self.spilled.spill((int(self.ordinals[row]), key, by_date) for row, (key, by_date) in enumerate(self.memory_items()))
+        self.spilled_days.update(self.days)
+        self.reset()
+
+    def add(self, timestamp, match, log_date):
+        if match is None:
+            return
+        if match["applicationOwner"] != match["apiCreator"] and match["proxyResponseCode"] == "200" and match["targetResponseCode"] == "200":
+            self.add_count((match["apiCreator"], match["apiName"], match["applicationOwner"], match["applicationName"], match["userIp"], match["apiCreatorTenantDomain"]), log_date, 1)
+
+    def add_dataset(self, dataset, expression):
+        for row in recap_counts(dataset, expression).to_pylist():
+            self.add_count(tuple(row[key] for key in RECAP_KEY), f"logs_{row['day']}", row['count_all'])
+
+    def close(self):
+        pass
+
+    def keys(self):
+        """Key tuples of the in-memory rows, in row order."""
+        names = [list(values) for values in self.values]
+        mask = (1 << self.code_bits) - 1
+        for packed in self.rows:
+            codes = []
+            for _ in names:
+                codes.append(packed & mask)
+                packed >>= self.code_bits
+            yield tuple(column[code] for column, code in zip(names, reversed(codes)))
+
+    def memory_items(self):
+        dates = list(self.days)
+        for row, key in enumerate(self.keys()):
+            yield key, {dates[column]: int(self.counts[row, column]) for column in np.flatnonzero(self.counts[row, :len(dates)])}
+
+    def items(self):
+        """(key, {log_date: count}) in first-seen order, as the per-key dicts used to hold them."""
+        if not self.spilled.files:
+            yield from self.memory_items()
+            return
+        # Spilled keys can come back in memory later; put them all on disk and merge there
+        self.spill()
+        yield from self.spilled.merged()
+
+    def all_dates(self):
+        return sorted(self.spilled_days | set(self.days))
+
+    def merge(self, other):
+        offset = self.next_ordinal
+        self.next_ordinal += other.next_ordinal
+        self.spilled.extend(other.spilled, offset)
+        self.spilled_days |= other.spilled_days
+        if other.rows:
+            rows = np.array([self.row(key, offset + int(ordinal)) for key, ordinal in zip(other.keys(), other.ordinals)], np.intp)
+            columns = np.array([self.column(log_date) for log_date in other.days], np.intp)
+            self.counts[np.ix_(rows, columns)] += other.counts[:len(other.rows), :len(other.days)]
+            self.check_memory()
+
+    def discard(self):
+        """Remove the spill files once every view is written."""
+        self.spilled.discard()
+
+    def write(self, output_stem, daily, lookup, report_format="xlsx"):
+        """Aggregated view, or with daily=True one extra column per day; lookup maps a key to its instansi."""
+        all_dates = self.all_dates()
+        report = open_report(output_stem, report_format)
+        ws = report.sheet("Recap", RECAP_HEADER + all_dates if daily else RECAP_HEADER)
+        for key, by_date in self.items():
+            line = [lookup(key[0]), key[0], key[1], lookup(key[2]), key[5], key[2], key[3], key[4], sum(by_date.values())]
+            if daily:
+                line += [by_date.get(log_date, 0) for log_date in all_dates]
+            ws.append(line)
+        report.close()
+
+
+class OverviewAccumulator:
+    """Approximate recap per API (apiCreator, apiName) in fixed memory per API.
+
+    Hits are exact; the top consumers (applicationOwner, applicationName) come from a
+    Space-Saving summary of OVERVIEW_COUNTERS counters, and the distinct userIp and
+    applicationOwner counts from HyperLogLog sketches. All of them merge across ranges and
+    days, so memory grows with the number of APIs, not with the date range.
+    """
+    needs_fields = True
+    chunk_records = 65536
+
+    def __init__(self):
+        self.apis = {}
+        self.buffer = []
+
+    def add(self, timestamp, match, log_date):
+        if match is None:
+            return
+        if match["applicationOwner"] != match["apiCreator"] and match["proxyResponseCode"] == "200" and match["targetResponseCode"] == "200":
+            self.buffer.append(tuple(match[key] for key in OVERVIEW_KEY))
+            if len(self.buffer) >= self.chunk_records:
+                self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.add_counts(Counter(self.buffer).items())
+            self.buffer = []
+
+    def api(self, api_key):
+        entry = self.apis.get(api_key)
+        if entry is None:
+            entry = self.apis[api_key] = [0, SpaceSaving(OVERVIEW_COUNTERS), HyperLogLog(), HyperLogLog()]
+        return entry
+
+    def add_counts(self, counts):
+        """Count ((apiCreator, apiName, applicationOwner, applicationName, userIp), hits) pairs."""
+        distinct = {}
+        for (creator, api_name, owner, application, ip), count in counts:
+            entry = self.api((creator, api_name))
+            entry[0] += count
+            entry[1].update((owner, application), count)
+            ips, owners = distinct.setdefault((creator, api_name), (set(), set()))
+            ips.add(ip)
+            owners.add(owner)
+        for api_key, (ips, owners) in distinct.items():
+            entry = self.apis[api_key]
+            entry[2].add_all([ip for ip in ips if ip is not None])
+            entry[3].add_all([owner for owner in owners if owner is not None])
+
+    def add_dataset(self, dataset, expression):
+        for batch in recap_batches(dataset, expression):
+            table = pa.Table.from_batches([batch]).group_by(OVERVIEW_KEY, use_threads=False).aggregate([([], 'count_all')])
+            rows = table.to_pylist()
+            self.add_counts((tuple(row[key] for key in OVERVIEW_KEY), row['count_all']) for row in rows)
+
+    def close(self):
+        self.flush()
+
+    def merge(self, other):
+        for api_key, (hits, consumers, ips, owners) in other.apis.items():
+            entry = self.api(api_key)
+            entry[0] += hits
+            entry[1].merge(consumers)
+            entry[2].merge(ips)
+            entry[3].merge(owners)
+
+    def write(self, output_stem, lookup, report_format="xlsx"):
+        """Per API sheet with hits and distinct counts, Top Consumers sheet with Space-Saving bounds."""
+        report = open_report(output_stem, report_format)
+        ws = report.sheet("Per API", ["Instansi Pemilik API", "apiCreator", "apiName", "Hits", "Distinct userIp (approx.)",
+                                      "Distinct applicationOwner (approx.)", "Distinct Error (95%)"])
+        ranked = sorted(self.apis.items(), key=lambda item: (-item[1][0], str(item[0])))
+        for (creator, api_name), (hits, _, ips, owners) in ranked:
+            ws.append([lookup(creator), creator, api_name, hits, round(ips.estimate()), round(owners.estimate()),
+                       f"±{2 * ips.relative_error:.1%}"])
+        ws = report.sheet("Top Consumers", ["Instansi Pemilik API", "apiCreator", "apiName", "Rank", "Instansi API Requester",
+                                            "applicationOwner", "applicationName", "Hits (estimate)", "Hits (at least)", "Max Overcount"])
+        for (creator, api_name), (hits, consumers, _, _) in ranked:
+            # Space-Saving overcounts any item by at most total / counters
+            bound = consumers.total // consumers.capacity
+            for rank, ((owner, application), count, guaranteed) in enumerate(consumers.top(OVERVIEW_TOP), 1):
+                ws.append([lookup(creator), creator, api_name, rank, lookup(owner), owner, application, count, guaranteed, bound])
+        report.close()
+
+
+class ConcurrentHitsAccumulator:
+    """Hits per second of Docker time, per API and tenant, for the peak, the per-second CSV
+    and the multi-resolution summary."""
+    needs_fields = True
+    chunk_records = 65536
+
+    def __init__(self):
+        self.counts = HitCounts()
+        self.timestamps = []
+        self.apis = []
+        self.tenants = []
+
+    def add(self, timestamp, match, log_date):
+        self.timestamps.append(timestamp)
+        self.apis.append(None if match is None else match["apiName"])
+        self.tenants.append(None if match is None else match["apiCreatorTenantDomain"])
+        if len(self.timestamps) >= self.chunk_records:
+            self.flush()
+
+    def flush(self):
+        """Parse and count the buffered records in bulk."""
+        if not self.timestamps:
+            return
+        seconds, valid = epoch_seconds(self.timestamps)
+        api_codes = self.counts.codes(self.counts.apis, self.apis)
+        tenant_codes = self.counts.codes(self.counts.tenants, self.tenants)
+        self.counts.add(seconds[valid], api_codes[valid], tenant_codes[valid])
+        self.timestamps, self.apis, self.tenants = [], [], []
+
+    def add_dataset(self, dataset, expression):
+        for seconds, apis, tenants in concurrency_batches(dataset, expression):
+            self.counts.add(seconds, self.counts.arrow_codes(self.counts.apis, apis),
+                            self.counts.arrow_codes(self.counts.tenants, tenants))
+
+    def close(self):
+        self.flush()
+
+    def merge(self, other):
+        self.counts.merge(other.counts)
+
+    def hits_per_second(self):
+        """{'YYYY-MM-DD HH:MM:SS': hits} in time order."""
+        seconds, hits = self.counts.per_second()
+        return dict(zip(second_strings(seconds), hits.tolist()))
+
+    def write(self, output_file, report_format="xlsx"):
+        """output_file gets every second's hits; <name>_summary next to it gets the peak
+        and, on a second sheet, peaks and percentile rates per resolution, API and tenant."""
+        seconds, hits = self.counts.per_second()
+        # The second that reached the peak count first in log order, as the old running maximum reported
+        max_second, max_hits = self.counts.running_peak(seconds, hits)
+        max_hits_timestamp = None if max_second is None else second_strings(np.array([max_second]))[0]
+        with open(output_file, 'w', encoding='utf-8', newline='') as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(['Timestamp', 'Hits'])
+            writer.writerows(zip(second_strings(seconds), hits.tolist()))
+        print(f"\nMaximum concurrent hits: {max_hits}")
+        print(f"Timestamp of maximum hits: {max_hits_timestamp}")
+        resolution_rows = self.counts.resolution_rows()
+        for row in resolution_rows:
+            if row[0] == "All":
+                print(f"{row[2]:>5}: peak {row[4]} hits at {row[5]}, p50/p95/p99 {row[7]}/{row[8]}/{row[9]} hits/s")
+        report = open_report(f"{os.path.splitext(output_file)[0]}_summary", report_format)
+        ws = report.sheet("Concurrent Hits Summary", ['Metric', 'Value'])
+        ws.append(['Maximum Concurrent Hits', max_hits])
+        ws.append(['Timestamp of Maximum Hits', max_hits_timestamp])
+        ws.append(['Total Unique Seconds', len(seconds)])
+        ws.append(['Average Hits per Second', int(hits.sum()) / len(seconds) if len(seconds) else 0])
+        ws = report.sheet("Resolutions", RESOLUTION_HEADER)
+        for row in resolution_rows:
+            ws.append(row)
+        report.close()
+
+
+def split_by(codes, values):
+    """(code, values with that code) for every distinct code."""
+    order = np.argsort(codes, kind='stable')
+    codes, values = codes[order], values[order]
+    if not len(codes):
+        return []
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    return zip(codes[starts].tolist(), np.split(values, starts[1:]))
+
+
+class LatencyAccumulator:
+    """Latency sketches per API and per consumer (applicationOwner) for each latency field.
+
+    Records are buffered and sketched a chunk at a time; sketches merge across ranges, so
+    memory depends on the number of APIs and consumers, not on the number of records.
+    """
+    needs_fields = True
+    chunk_records = 65536
+
+    def __init__(self):
+        self.sketches = {}
+        self.buffer = []
+
+    def add(self, timestamp, match, log_date):
+        if match is None:
+            return
+        self.buffer.append((match["apiName"], match["applicationOwner"], *(match[field] for field in LATENCY_FIELDS)))
+        if len(self.buffer) >= self.chunk_records:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        columns = list(zip(*self.buffer))
+        self.buffer = []
+        self.add_columns(columns[0], columns[1], {
+            field: np.array([-1 if value is None else int(value) for value in values], np.int64)
+            for field, values in zip(LATENCY_FIELDS, columns[2:])})
+
+    def add_columns(self, apis, owners, latencies):
+        """Sketch one chunk: API and owner names per record, and each field's values (-1 where missing)."""
+        for scope, names in (("API", apis), ("Consumer", owners)):
+            keys = {}
+            codes = np.fromiter((keys.setdefault(name, len(keys)) for name in names), np.int64, len(names))
+            keys = list(keys)
+            for field, values in latencies.items():
+                present = values >= 0
+                for code, series in split_by(codes[present], values[present]):
+                    key = (scope, keys[code], field)
+                    sketch = self.sketches.get(key)
+                    if sketch is None:
+                        sketch = self.sketches[key] = LatencySketch()
+                    sketch.add(series)
+
+    def add_dataset(self, dataset, expression):
+        for apis, owners, latencies in latency_batches(dataset, expression, LATENCY_FIELDS):
+            self.add_columns(apis, owners, latencies)
+
+    def close(self):
+        self.flush()
+
+    def merge(self, other):
+        for key, sketch in other.sketches.items():
+            if key in self.sketches:
+                self.sketches[key].merge(sketch)
+            else:
+                self.sketches[key] = sketch
+
+    def write(self, output_stem, lookup, report_format="xlsx"):
+        """One sheet per API and one per consumer, with count, p50/p90/p99 and max of each field."""
+        report = open_report(output_stem, report_format)
+        for scope, title, header in (("API", "Per API", ["apiName"]),
+                                     ("Consumer", "Per Consumer", ["Instansi API Requester", "applicationOwner"])):
+            ws = report.sheet(title, header + ["Latency", "Count"] + [label for label, _ in LATENCY_QUANTILES] + ["Max"])
+            keys = sorted((key for key in self.sketches if key[0] == scope),
+                          key=lambda key: (str(key[1]), LATENCY_FIELDS.index(key[2])))
+            for _, name, field in keys:
+                sketch = self.sketches[(scope, name, field)]
+                row = [name] if scope == "API" else [lookup(name), name]
+                ws.append(row + [field, sketch.count] + [round(sketch.quantile(q), 1) for _, q in LATENCY_QUANTILES] + [sketch.max])
+        report.close()
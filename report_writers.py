@@ -0,0 +1,169 @@
+import csv
+import openpyxl
+from openpyxl.utils import get_column_letter
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Rows (header included) an Excel sheet holds back to size its columns before it streams
+WIDTH_SAMPLE_ROWS = 1000
+PARQUET_BATCH_ROWS = 65536
+
+# A report is opened with open_report(stem, format), gets its sheets from sheet(title, header),
+# appends rows to them one at a time and is finished with close(). Only the rows of a sample
+# or a batch are ever held, never the whole report.
+
+
+def sample_widths(rows):
+    """Longest str() + 2 per column over rows, as the widths used to be fitted over whole sheets."""
+    widths = []
+    for row in rows:
+        for index, value in enumerate(row):
+            length = len(str(value)) + 2
+            if index == len(widths):
+                widths.append(length)
+            elif length > widths[index]:
+                widths[index] = length
+    return widths
+
+
+class ExcelSheet:
+    def __init__(self, ws, header):
+        self.ws = ws
+        self.sample = [header]
+
+    def append(self, row):
+        if self.sample is None:
+            self.ws.append(row)
+            return
+        self.sample.append(row)
+        if len(self.sample) >= WIDTH_SAMPLE_ROWS:
+            self.flush_sample()
+
+    def flush_sample(self):
+        # Write-only sheets take their column widths before the first row
+        for index, width in enumerate(sample_widths(self.sample), 1):
+            self.ws.column_dimensions[get_column_letter(index)].width = width
+        for row in self.sample:
+            self.ws.append(row)
+        self.sample = None
+
+    def close(self):
+        if self.sample is not None:
+            self.flush_sample()
+
+
+class ExcelReport:
+    """<stem>.xlsx from a write-only workbook: rows go to disk as they are appended, and
+    column widths come from the first WIDTH_SAMPLE_ROWS rows of each sheet."""
+    extension = ".xlsx"
+
+    def __init__(self, stem):
+        self.path = f"{stem}{self.extension}"
+        self.wb = openpyxl.Workbook(write_only=True)
+        self.sheets = []
+
+    def sheet(self, title, header):
+        self.sheets.append(ExcelSheet(self.wb.create_sheet(title), header))
+        return self.sheets[-1]
+
+    def close(self):
+        for sheet in self.sheets:
+            sheet.close()
+        self.wb.save(self.path)
+
+
+class CsvSheet:
+    def __init__(self, path, header):
+        self.outfile = open(path, 'w', encoding='utf-8', newline='', buffering=1024*1024)
+        self.writer = csv.writer(self.outfile)
+        self.writer.writerow(header)
+
+    def append(self, row):
+        self.writer.writerow(row)
+
+    def close(self):
+        self.outfile.close()
+
+
+class CsvReport:
+    """One CSV per sheet: <stem>.csv for the first, <stem>_<title>.csv for the others."""
+    extension = ".csv"
+
+    def __init__(self, stem):
+        self.stem = stem
+        self.sheets = []
+
+    def sheet_path(self, title):
+        if not self.sheets:
+            return f"{self.stem}{self.extension}"
+        return f"{self.stem}_{title.replace(' ', '_')}{self.extension}"
+
+    def sheet(self, title, header):
+        self.sheets.append(CsvSheet(self.sheet_path(title), header))
+        return self.sheets[-1]
+
+    def close(self):
+        for sheet in self.sheets:
+            sheet.close()
+
+
+def arrow_column(values, arrow_type=None):
+    """values as an Arrow array; without a type, inferred, with mixed or empty columns as strings."""
+    if arrow_type is None:
+        try:
+            array = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            array = None
+        if array is not None and array.type != pa.null():
+            return array
+        arrow_type = pa.string()
+    if arrow_type == pa.string():
+        values = [None if value is None else str(value) for value in values]
+    return pa.array(values, arrow_type)
+
+
+class ParquetSheet:
+    """Rows in PARQUET_BATCH_ROWS row groups; column types are inferred from the first batch."""
+
+    def __init__(self, path, header):
+        self.path = path
+        self.header = header
+        self.rows = []
+        self.writer = None
+
+    def append(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= PARQUET_BATCH_ROWS:
+            self.flush()
+
+    def flush(self):
+        columns = list(zip(*self.rows)) if self.rows else [()] * len(self.header)
+        self.rows = []
+        if self.writer is None:
+            table = pa.table([arrow_column(list(values)) for values in columns], names=self.header)
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        else:
+            table = pa.table([arrow_column(list(values), field.type) for values, field in zip(columns, self.writer.schema)],
+                             schema=self.writer.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.rows or self.writer is None:
+            self.flush()
+        self.writer.close()
+
+
+class ParquetReport(CsvReport):
+    """One Parquet file per sheet, named as the CSV ones."""
+    extension = ".parquet"
+
+    def sheet(self, title, header):
+        self.sheets.append(ParquetSheet(self.sheet_path(title), header))
+        return self.sheets[-1]
+
+
+REPORT_WRITERS = {"xlsx": ExcelReport, "csv": CsvReport, "parquet": ParquetReport}
+
+
+def open_report(stem, report_format="xlsx"):
+    return REPORT_WRITERS[report_format](stem)
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Bump when the counting rules change, so older rollups are recounted instead of reused
+ROLLUP_VERSION = 1
+
+
+def file_signature(path, with_hash=False):
+    """Size and mtime of a source file, plus its SHA-256 when with_hash is set."""
+    stat = os.stat(path)
+    signature = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(8*1024*1024), b""):
+                digest.update(block)
+        signature["sha256"] = digest.hexdigest()
+    return signature
+
+
+class RollupStore:
+    """Recap counters per day file and level/cleanse selection, kept on disk between runs.
+
+    Every source file gets <name>.json in folder: its signature, its record count and the
+    processed count of each stored selection; the counters themselves are in
+    <name>.<selection>.parquet (the recap key columns plus count). An entry is only used
+    while the file's size and mtime (and SHA-256 with with_hash) are unchanged and it was
+    counted under the same settings (cleanse words, fields, ROLLUP_VERSION).
+    """
+    batch_rows = 100000
+
+    def __init__(self, folder, key_columns, settings, with_hash=False):
+        self.folder = Path(folder)
+        self.key_columns = key_columns
+        self.settings = {"version": ROLLUP_VERSION, **settings}
+        self.with_hash = with_hash
+        self.signatures = {}
+
+    def signature(self, source):
+        """The file's signature as first taken in this run; take it before the file is scanned,
+        so a file that grows during the scan is saved as the older, smaller one and recounted."""
+        source = str(source)
+        if source not in self.signatures:
+            self.signatures[source] = file_signature(source, self.with_hash)
+        return self.signatures[source]
+
+    def manifest_path(self, source):
+        return self.folder / f"{Path(source).name}.json"
+
+    def counts_path(self, source, selection):
+        return self.folder / f"{Path(source).name}.{selection}.parquet"
+
+    def manifest(self, source):
+        """The file's manifest if it still describes the file as it is now, else None."""
+        try:
+            with open(self.manifest_path(source)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("settings") != self.settings or manifest.get("signature") != self.signature(source):
+            return None
+        return manifest
+
+    def counts_table(self, batch, schema):
+        keys = list(zip(*(key for key, _ in batch))) if batch else [()] * len(self.key_columns)
+        return pa.table([pa.array(column, pa.string()) for column in keys] + [pa.array([count for _, count in batch], pa.int64())],
+                        schema=schema)
+
+    def load(self, source, selection):
+        """(records, processed, [(key, count)]) stored for the file and selection, or None."""
+        manifest = self.manifest(source)
+        if manifest is None or selection not in manifest["selections"]:
+            return None
+        try:
+            table = pq.read_table(self.counts_path(source, selection))
+        except (OSError, pa.ArrowInvalid):
+            return None
+        keys = zip(*(table[name].to_pylist() for name in self.key_columns))
+        return manifest["records"], manifest["selections"][selection], list(zip(keys, table["count"].to_pylist()))
+
+    def save(self, source, selection, records, processed, counts):
+        """Store a freshly counted file: counts yields (key tuple, hits), written in batches."""
+        os.makedirs(self.folder, exist_ok=True)
+        schema = pa.schema([(name, pa.string()) for name in self.key_columns] + [("count", pa.int64())])
+        with pq.ParquetWriter(self.counts_path(source, selection), schema) as writer:
+            batch = []
+            for item in counts:
+                batch.append(item)
+                if len(batch) == self.batch_rows:
+                    writer.write_table(self.counts_table(batch, schema))
+                    batch = []
+            writer.write_table(self.counts_table(batch, schema))
+        manifest = self.manifest(source) or {"settings": self.settings, "signature": self.signature(source),
+                                             "records": records, "selections": {}}
+        manifest["selections"][selection] = processed
+        temp_path = f"{self.manifest_path(source)}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, self.manifest_path(source))
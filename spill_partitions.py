@@ -0,0 +1,122 @@
+import heapq
+import os
+import pickle
+import tempfile
+import zlib
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+SPILL_PARTITIONS = 16
+
+
+def partition_of(key):
+    """Stable partition of a key tuple; Python's hash() differs between worker processes."""
+    return zlib.crc32(repr(key).encode('utf-8')) % SPILL_PARTITIONS
+
+
+class SpillPartitions:
+    """Partial per-key day counts spilled to disk, hash-partitioned by key.
+
+    Each spill writes one Parquet file per non-empty partition: the key columns, day,
+    count and the key's first-seen ordinal. merged() aggregates one partition at a time,
+    so only a partition's keys are ever in memory, and streams (key, {day: count}) back in
+    first-seen order by merging the partitions' sorted runs.
+    """
+
+    def __init__(self, prefix, key_columns):
+        self.prefix = prefix
+        self.key_columns = key_columns
+        self.files = []
+        self.spills = 0
+
+    def spill(self, rows):
+        """Write rows of (ordinal, key, {day: count}) and forget them.
+
+        Without a prefix of its own, the files go next to the spills taken over by extend().
+        """
+        prefix = self.prefix or os.path.join(os.path.dirname(self.files[0][1]), 'merged')
+        folder = os.path.dirname(prefix) or '.'
+        os.makedirs(folder, exist_ok=True)
+        partitions = [[] for _ in range(SPILL_PARTITIONS)]
+        for ordinal, key, by_date in rows:
+            partitions[partition_of(key)].append((ordinal, key, by_date))
+        for partition, part_rows in enumerate(partitions):
+            if not part_rows:
+                continue
+            columns = {name: [] for name in self.key_columns + ['day']}
+            counts = []
+            ordinals = []
+            for ordinal, key, by_date in part_rows:
+                for day, count in by_date.items():
+                    for name, value in zip(self.key_columns, key):
+                        columns[name].append(value)
+                    columns['day'].append(day)
+                    counts.append(count)
+                    ordinals.append(ordinal)
+            table = pa.table({name: pa.array(values, pa.string()) for name, values in columns.items()}
+                             | {'count': pa.array(counts, pa.int64()), 'ordinal': pa.array(ordinals, pa.int64())})
+            handle, path = tempfile.mkstemp(prefix=f"{os.path.basename(prefix)}.spill{self.spills}.part{partition}.",
+                                            suffix='.parquet', dir=folder)
+            os.close(handle)
+            pq.write_table(table, path)
+            self.files.append((partition, path, 0))
+        self.spills += 1
+
+    def extend(self, other, offset):
+        """Take over another accumulator's spills, its ordinals shifted by offset."""
+        self.files += [(partition, path, shift + offset) for partition, path, shift in other.files]
+
+    def partition_run(self, partition, run_file):
+        """Aggregate one partition and write its keys to run_file sorted by first-seen ordinal."""
+        keys = {}
+        for part, path, shift in self.files:
+            if part != partition:
+                continue
+            table = pq.read_table(path)
+            key_columns = [table[name].to_pylist() for name in self.key_columns]
+            for key, day, count, ordinal in zip(zip(*key_columns), table['day'].to_pylist(),
+                                                table['count'].to_pylist(), table['ordinal'].to_pylist()):
+                entry = keys.get(key)
+                if entry is None:
+                    entry = keys[key] = [ordinal + shift, {}]
+                elif ordinal + shift < entry[0]:
+                    entry[0] = ordinal + shift
+                entry[1][day] = entry[1].get(day, 0) + count
+        with open(run_file, 'wb') as f:
+            for key, (ordinal, by_date) in sorted(keys.items(), key=lambda item: item[1][0]):
+                pickle.dump((ordinal, key, by_date), f)
+
+    @staticmethod
+    def read_run(run_file):
+        with open(run_file, 'rb') as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+
+    def merged(self):
+        """(key, {day: count}) over every spill, in first-seen order."""
+        folder = os.path.dirname(self.files[0][1]) if self.files else '.'
+        run_files = []
+        try:
+            for partition in sorted({part for part, _, _ in self.files}):
+                handle, run_file = tempfile.mkstemp(suffix='.run', dir=folder)
+                os.close(handle)
+                run_files.append(run_file)
+                self.partition_run(partition, run_file)
+            for _, key, by_date in heapq.merge(*(self.read_run(run_file) for run_file in run_files), key=lambda item: item[0]):
+                yield key, by_date
+        finally:
+            for run_file in run_files:
+                os.remove(run_file)
+
+    def discard(self):
+        folders = {os.path.dirname(path) for _, path, _ in self.files}
+        for _, path, _ in self.files:
+            if os.path.exists(path):
+                os.remove(path)
+        for folder in folders:
+            if folder and os.path.isdir(folder) and not os.listdir(folder):
+                os.rmdir(folder)
+        self.files = []
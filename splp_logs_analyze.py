@@ -1,241 +1,538 @@
+import argparse
 import json
 import re
-from collections import defaultdict
 from pathlib import Path
-import csv
 import sys
 import pandas as pd
-import openpyxl
 import logging
 import os
-from datetime import datetime
+import yaml
+from log_scan import get_worker_count, select_day_files, date_matches, split_ranges, iter_range_lines, run_ranges
+from log_parser import parse_fields
+from parquet_reports import open_dataset, log_filter, RECAP_KEY
+from rollup_store import RollupStore
+from instansi_resolver import InstansiIndex
+from report_writers import REPORT_WRITERS
+from report_accumulators import AllDatasetAccumulator, RecapAccumulator, OverviewAccumulator, ConcurrentHitsAccumulator, LatencyAccumulator
 
-#API Owner pattern
-pattern_apiN = re.compile(r'apiName=([^,]+)')
-pattern_apiC = re.compile(r'apiCreator=([^,]+)')
 pattern_apiCTD = re.compile(r'apiCreatorTenantDomain=([^,]+)')
-pattern_apiI = re.compile(r'apiId=([^,]+)')
 
-#Latency Pattern
-pattern_bL = re.compile(r'backendLatency=(\d+)')
-pattern_reqML = re.compile(r'requestMediationLatency=(\d+)')
-pattern_resML = re.compile(r'responseMediationLatency=(\d+)')
-
-#API Requester pattern
-pattern_appI = re.compile(r'applicationId=([^,]+)')
-pattern_appN = re.compile(r'applicationName=([^,]+)')
-pattern_appO = re.compile(r'applicationOwner=([^,]+)')
-pattern_uI = re.compile(r'userIp=([^,]+)')
-
-#Response Code
-pattern_pRC = re.compile(r'proxyResponseCode=([^,]+)')
-pattern_tRC = re.compile(r'targetResponseCode=([^,]+)')
+LOG_FIELDS = [
+    "apiName", "apiCreator", "apiId", "apiCreatorTenantDomain", "backendLatency",
+    "requestMediationLatency", "responseMediationLatency", "applicationId", "applicationName",
+    "applicationOwner", "userIp", "proxyResponseCode", "targetResponseCode"
+]
 
 # folder = Path("logs")
 folder = Path("E:/SPLP_Logs")
+parquet_folder = Path("D:/SPLP_Logs_parquet")
+rollup_folder = Path("E:/SPLP_Logs_rollup")
 
-if not folder.exists() or not any(folder.iterdir()):
-    print("folder berisi logs tidak ditemukan")
-    sys.exit()
+mapping_index = InstansiIndex([], [])
 
 
-df_mapping = pd.read_excel("mapping.xlsx")
-mapping_dict = {}
+# Memory for a recap's keys (per worker process) before they spill to Report/*.spill; None = never spill
+RECAP_MEMORY_MB = 1024
 
+# Report file format: xlsx (streamed, column widths from the first rows), csv or parquet
+REPORT_FORMAT = "xlsx"
 
-def data_cleansing(log_line):
-    clean_word = ["dummy", "admin", "bimtek", "demo", "internal-key-app", "test"]
-    return any(word in log_line for word in clean_word)
+CLEANSE_WORDS = ["dummy", "admin", "bimtek", "demo", "internal-key-app", "test"]
 
 
-def fuzzy_lookup(lookup_dict, search_key):
-    if not lookup_dict:
-        return "Tidak Terdaftar"
-    for pattern_key, inst_name in lookup_dict.items():
-        if not isinstance(pattern_key, str):
-            continue
-        if pattern_key in search_key:
-            return inst_name
-    return "Tidak Terdaftar"
+def data_cleansing(log_line):
+    return any(word in log_line for word in CLEANSE_WORDS)
 
 
-def iterate_logs(date, iL, cleanse_data):
-    total_records = 0
-    processed_records = 0
-    if iL not in ["1", "2"]:
-        logging.error("Invalid Interoperability Level")
-        sys.exit(1)
-    for file in folder.iterdir():
-        if not file.is_file():
-            continue
-        if date is not None:
-            if isinstance(date, tuple):
-                if not (date[0] <= file.stem.split('_')[1] <= date[1]):
-                    continue
-            else:  
-                if file.stem.split('_')[1] != date:
-                    continue
-        print("iterating through file : ", file.name)
-        with file.open("r", encoding="utf-8") as f:
-            for log_record in f:
-                if not log_record.strip():
-                    continue
-                try:
-                    total_records += 1  
-                    log_content = json.loads(log_record)
-                    log_line = log_content["log"]
-                    if (iL == "1" and pattern_apiCTD.search(log_line).group(1) != "carbon.super") or (iL == "2" and pattern_apiCTD.search(log_line).group(1) == "carbon.super"):
-                        continue
-                    if cleanse_data and data_cleansing(str(log_line)):
-                        continue
-                    processed_records += 1
-                    yield log_content["time"], log_line, file.stem
-                except Exception:
-                    continue
-    print(f"\nTotal records in log: {total_records}")
-    print(f"Records Processed: {processed_records}")
+def parquet_filter(date, iL, cleanse_data):
+    return log_filter(date, iL, CLEANSE_WORDS if cleanse_data else None)
 
 
 def parse_log_line(log_line):
     try:
-        return {
-                "apiName" : pattern_apiN.search(log_line).group(1) if pattern_apiN.search(log_line) else None,
-                "apiCreator" : pattern_apiC.search(log_line).group(1) if pattern_apiC.search(log_line) else None,
-                "apiId" : pattern_apiI.search(log_line).group(1) if pattern_apiI.search(log_line) else None,
-                "apiCreatorTenantDomain" : pattern_apiCTD.search(log_line).group(1) if pattern_apiCTD.search(log_line) else None,
-                "backendLatency" : pattern_bL.search(log_line).group(1) if pattern_bL.search(log_line) else None,
-                "requestMediationLatency" : pattern_reqML.search(log_line).group(1) if pattern_reqML.search(log_line) else None,
-                "responseMediationLatency" : pattern_resML.search(log_line).group(1) if pattern_resML.search(log_line) else None,
-                "applicationId" : pattern_appI.search(log_line).group(1) if pattern_appI.search(log_line) else None,
-                "applicationName" : pattern_appN.search(log_line).group(1) if pattern_appN.search(log_line) else None,
-                "applicationOwner" : pattern_appO.search(log_line).group(1) if pattern_appO.search(log_line) else None,
-                "userIp" : pattern_uI.search(log_line).group(1) if pattern_uI.search(log_line) else None,
-                "proxyResponseCode" : pattern_pRC.search(log_line).group(1) if pattern_pRC.search(log_line) else None,
-                "targetResponseCode" : pattern_tRC.search(log_line).group(1) if pattern_tRC.search(log_line) else None
-            }
-    except AttributeError as e:
-        logging.warning(f"Failed to parse log line: Missing required field - {str(e)}")
-        return None
+        return parse_fields(log_line, LOG_FIELDS)
     except Exception as e:
         logging.error(f"Unexpected error parsing log line: {str(e)}")
         return None
 
 
-def normalize_dates(resultDict, all_possible_dates):
-    for data in resultDict.values():
-        for date in all_possible_dates:
-            data["hit_by_date"].setdefault(date, 0)
-    return sorted(all_possible_dates)
+REPORT_ACCUMULATORS = {
+    "all_dataset": AllDatasetAccumulator,
+    "recap_aggregated": RecapAccumulator,
+    "recap_daily": RecapAccumulator,
+    "recap_overview": OverviewAccumulator,
+    "concurrent_hits": ConcurrentHitsAccumulator,
+    "latency": LatencyAccumulator,
+}
+
+LEVELS = {"National": "1", "Internal": "2"}
+
+
+def report_file_name(prefix, date, iL, label=""):
+    return f"{prefix}{('_' + date) if isinstance(date, str) else ('_' + '-'.join(date)) if isinstance(date, tuple) else ''}_{'National' if iL == '1' else 'Internal'}{label}"
+
+
+class ReportRun:
+    """One date x level x cleanse selection and the reports filled from it.
+
+    Reports sharing an accumulator (both recap views) share it here too, so the records
+    are only counted once however many of them are written.
+    """
+
+    def __init__(self, date, iL, cleanse_data, reports, label="", memory_mb=RECAP_MEMORY_MB, report_format=REPORT_FORMAT):
+        if iL not in ["1", "2"]:
+            logging.error("Invalid Interoperability Level")
+            sys.exit(1)
+        self.date = date
+        self.iL = iL
+        self.cleanse_data = cleanse_data
+        self.reports = reports
+        self.label = label
+        self.memory_mb = memory_mb
+        self.report_format = report_format
+        self.total = 0
+        self.processed = 0
+        self.accumulators = self.new_accumulators()
+
+    def file_name(self, prefix):
+        return report_file_name(prefix, self.date, self.iL, self.label)
+
+    def new_accumulators(self, part=None):
+        """Empty accumulators, keyed by class; part numbers the All Dataset part file of a range."""
+        accumulators = {}
+        for report in self.reports:
+            accumulator_class = REPORT_ACCUMULATORS[report]
+            if accumulator_class in accumulators:
+                continue
+            if accumulator_class is AllDatasetAccumulator:
+                accumulators[accumulator_class] = AllDatasetAccumulator(
+                    None if part is None else f"Report/{self.file_name('all_dataset')}.csv.part{part}")
+            elif accumulator_class is RecapAccumulator:
+                accumulators[accumulator_class] = self.new_recap("run" if part is None else part)
+            else:
+                accumulators[accumulator_class] = accumulator_class()
+        return accumulators
+
+    def new_recap(self, part):
+        return RecapAccumulator(f"Report/{self.file_name('recap_')}.spill/{part}", self.memory_mb)
+
+    def merge(self, total, processed, accumulators):
+        self.total += total
+        self.processed += processed
+        for accumulator_class, accumulator in accumulators.items():
+            self.accumulators[accumulator_class].merge(accumulator)
+
+    def write(self, lookup):
+        """Write every report of the run into Report/; lookup maps an account to its instansi."""
+        for report in self.reports:
+            accumulator = self.accumulators[REPORT_ACCUMULATORS[report]]
+            if report == "all_dataset":
+                accumulator.write(f"Report/{self.file_name('all_dataset')}.csv")
+            elif report == "concurrent_hits":
+                accumulator.write(f"Report/{self.file_name('concurrent_hits_')}.csv", self.report_format)
+            elif report == "latency":
+                accumulator.write(f"Report/{self.file_name('latency_')}", lookup, self.report_format)
+            elif report == "recap_overview":
+                accumulator.write(f"Report/{self.file_name('recap_')}_Overview", lookup, self.report_format)
+            else:
+                daily = report == "recap_daily"
+                accumulator.write(f"Report/{self.file_name('recap_')}_{'Daily' if daily else 'Aggregated'}", daily, lookup, self.report_format)
+        if RecapAccumulator in self.accumulators:
+            self.accumulators[RecapAccumulator].discard()
+
+
+# Raw-byte forms of the tenant and cleanse rules, checked before a record is decoded
+RAW_TENANT_KEY = b'apiCreatorTenantDomain='
+RAW_CLEANSE_WORDS = [word.encode() for word in CLEANSE_WORDS]
+RAW_LOG_PREFIXES = (b'{"log":"', b'{"log": "')
+
+SCAN_STAGES = ["records", "raw level", "raw cleanse", "raw no tenant", "decoded", "invalid", "level", "cleanse", "parsed"]
+
+
+def raw_log(log_record):
+    """(bytes of the record's "log" string, plain) read off the raw record.
+
+    The bytes are None when the record doesn't start with its "log" key (reordered keys) or
+    the string doesn't end, leaving the record to decoding. A JSON string matches its decoded
+    text byte for byte except at escapes; plain says the only escape is the newline ending
+    the string, as in most records, so everything read from the bytes holds.
+    """
+    for prefix in RAW_LOG_PREFIXES:
+        if log_record.startswith(prefix):
+            break
+    else:
+        return None, False
+    start = len(prefix)
+    end = log_record.find(b'"', start)
+    # A quote after an odd number of backslashes is part of the string
+    while end != -1 and (end - start - len(log_record[start:end].rstrip(b'\\'))) % 2:
+        end = log_record.find(b'"', end + 1)
+    if end == -1:
+        return None, False
+    text = log_record[start:end]
+    escape = text.find(b'\\')
+    return text, escape == -1 or (escape == len(text) - 2 and text.endswith(b'\\n'))
+
+
+def raw_tenant(text, plain):
+    """True/False for National, None when only decoding can tell, or "missing" when the log
+    string has no apiCreatorTenantDomain at all.
+
+    Outside plain strings a \\u escape anywhere or a backslash or quote in the tenant value
+    leaves it to decoding.
+    """
+    if not plain and b'\\u' in text:
+        return None
+    start = text.find(RAW_TENANT_KEY)
+    if start == -1:
+        return "missing"
+    start += len(RAW_TENANT_KEY)
+    end = text.find(b',', start)
+    tenant = text[start:] if end == -1 else text[start:end]
+    if not tenant or b'\\' in tenant or b'"' in tenant:
+        return None
+    return tenant == b'carbon.super'
+
+
+def raw_dirty(text, plain):
+    """data_cleansing on the raw log string: True/False, or None when only decoding can tell.
+
+    Outside plain strings a word right after a backslash may be the tail of an escape
+    (\\test is a tab and "est"), and a \\u escape may spell one out, so those are left undecided.
+    """
+    if plain:
+        return any(word in text for word in RAW_CLEANSE_WORDS)
+    if b'\\u' in text:
+        return None
+    dirty = False
+    for word in RAW_CLEANSE_WORDS:
+        found = text.find(word)
+        while found != -1:
+            if found == 0 or text[found - 1] != 92:
+                return True
+            dirty = None
+            found = text.find(word, found + 1)
+    return dirty
+
+
+def reachable_selections(selections):
+    """{(national, dirty): indexes of the selections a record can still reach}; None = unknown yet."""
+    reachable = {}
+    for national in (True, False, None):
+        for dirty in (True, False, None):
+            reachable[national, dirty] = [index for index, (iL, cleanse_data, _) in enumerate(selections)
+                                          if (national is None or national == (iL == "1")) and not (cleanse_data and dirty)]
+    return reachable
+
 
+def scan_range(path, start, end, log_date, selections, prefilter=True):
+    """Read one byte range once and feed each record to every selection it passes.
 
-def get_logs_allDataset(date, iL, cleanse_data):
-    resultDict = []
-    file_name = f"all_dataset{('_' + date) if isinstance(date, str) else ('_' + '-'.join(date)) if isinstance(date, tuple) else ''}_{'National' if iL == '1' else 'Internal'}"
-    for timestamp, log_line, log_date in iterate_logs(date, iL, cleanse_data):
-        match = parse_log_line(log_line)
-        if match is None:
+    selections is a list of (iL, cleanse_data, accumulators). The tenant and cleanse rules run
+    on the raw bytes first, so records no selection wants are dropped without being decoded;
+    whatever the bytes can't settle is checked on the decoded line as before. A record is
+    decoded and parsed at most once however many selections take it. Returns per-stage
+    counts (SCAN_STAGES), the processed count per selection and the filled accumulators.
+    """
+    stages = dict.fromkeys(SCAN_STAGES, 0)
+    processed = [0] * len(selections)
+    needs_fields = any(accumulator.needs_fields for _, _, accumulators in selections for accumulator in accumulators.values())
+    reachable = reachable_selections(selections)
+    cleansing = {national: any(selections[index][1] for index in reachable[national, None]) for national in (True, False, None)}
+    for log_record in iter_range_lines(path, start, end):
+        if not log_record.strip():
+            continue
+        stages["records"] += 1
+        national = dirty = None
+        if prefilter:
+            text, plain = raw_log(log_record)
+            national = None if text is None else raw_tenant(text, plain)
+            if national == "missing":
+                stages["raw no tenant"] += 1
+                continue
+            if not reachable[national, None]:
+                stages["raw level"] += 1
+                continue
+            if cleansing[national] and text is not None:
+                dirty = raw_dirty(text, plain)
+                if not reachable[national, dirty]:
+                    stages["raw cleanse"] += 1
+                    continue
+        stages["decoded"] += 1
+        try:
+            log_content = json.loads(log_record)
+            log_line = log_content["log"]
+            timestamp = log_content["time"]
+            if national is None:
+                national = pattern_apiCTD.search(log_line).group(1) == "carbon.super"
+            elif not isinstance(log_line, str):
+                raise TypeError("log is not a string")
+        except Exception:
+            stages["invalid"] += 1
             continue
-        resultDict.append({
-            "apiName" : match["apiName"], 
-            "apiCreator" : match["apiCreator"], 
-            "backendLatency" : match["backendLatency"], 
-            "requestMediationLatency" : match["requestMediationLatency"], 
-            "apiId" : match["apiId"], 
-            "applicationName" : match["applicationName"], 
-            "applicationOwner" : match["applicationOwner"],
-            "responseMediationLatency" : match["responseMediationLatency"],
-            "applicationId" : match["applicationId"]
-        })
-    with open(f'Report/{file_name}.csv', 'w', encoding='utf-8', newline='', buffering=1024*1024) as outfile:
-        writer = csv.writer(outfile)
-        writer.writerow(["apiName", "apiCreator", "backendLatency", "requestMediationLatency", "apiId", "applicationName", "applicationOwner","responseMediationLatency", "applicationId"])
-        for data in resultDict:
-            writer.writerow([data["apiName"], data["apiCreator"], data["backendLatency"], data["requestMediationLatency"], data["apiId"], data["applicationName"], data["applicationOwner"], data["responseMediationLatency"], data["applicationId"]])
-
-
-def recap(date, iL, cleanse_data):
-    resultDict = defaultdict(lambda: {"occurrence": 0, "hit_by_date": defaultdict(int)})
-    all_possible_dates = set()
-    view_type = input("Choose view type:\n1. Aggregated \n2. Daily \nView Type: ")
-    file_name = f"recap_{('_' + date) if isinstance(date, str) else ('_' + '-'.join(date)) if isinstance(date, tuple) else ''}_{'National' if iL == '1' else 'Internal'}_{'Aggregated' if view_type == '1' else 'Daily'}"
-    for timestamp, log_line, log_date in iterate_logs(date, iL, cleanse_data):
-        match = parse_log_line(log_line)
-        if match is None:
+        indexes = reachable[national, dirty]
+        if dirty is None and cleansing[national]:
+            dirty = data_cleansing(str(log_line))
+            indexes = reachable[national, dirty]
+        if not indexes:
+            stages["level" if not reachable[national, None] else "cleanse"] += 1
             continue
-        if match["applicationOwner"] != match["apiCreator"] and match["proxyResponseCode"] == "200" and match["targetResponseCode"] == "200":
-            append_key = (match["apiCreator"], match["apiName"], match["applicationOwner"], match["applicationName"], match["userIp"], match["apiCreatorTenantDomain"])
-            resultDict[append_key]["occurrence"] += 1
-            resultDict[append_key]["hit_by_date"][log_date] += 1
-            all_possible_dates.add(log_date)
-    all_dates = normalize_dates(resultDict, all_possible_dates)
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Recap"
-    if view_type == "1":
-        ws.append(["Instansi Pemilik API", "apiCreator", "apiName", "Instansi API Requester", "apiCreatorTenantDomain", "applicationOwner", "applicationName", "userIp", "Occurrence"])
-        for key, data in resultDict.items():
-            row = [fuzzy_lookup(mapping_dict, key[0]), key[0], key[1], fuzzy_lookup(mapping_dict, key[2]), key[5], key[2], key[3], key[4], data["occurrence"]]
-            ws.append(row)
-    elif view_type == "2":
-        ws.append(["Instansi Pemilik API", "apiCreator", "apiName", "Instansi API Requester", "apiCreatorTenantDomain", "applicationOwner", "applicationName", "userIp", "Occurrence"] + all_dates)
-        for key, data in resultDict.items():
-            row = [fuzzy_lookup(mapping_dict, key[0]), key[0], key[1], fuzzy_lookup(mapping_dict, key[2]), key[5], key[2], key[3], key[4], data["occurrence"]]
-            row += [data["hit_by_date"][date] for date in all_dates]
-            ws.append(row)
-    else:
+        match = None
+        if needs_fields:
+            match = parse_log_line(log_line)
+            stages["parsed"] += 1
+        for index in indexes:
+            processed[index] += 1
+            for accumulator in selections[index][2].values():
+                accumulator.add(timestamp, match, log_date)
+    for _, _, accumulators in selections:
+        for accumulator in accumulators.values():
+            accumulator.close()
+    return stages, processed, [accumulators for _, _, accumulators in selections]
+
+
+def print_stages(stages):
+    print(f"\nDropped before decoding: {stages['raw level']} other level, {stages['raw cleanse']} cleansed, "
+          f"{stages['raw no tenant']} without apiCreatorTenantDomain")
+    print(f"Decoded: {stages['decoded']} (dropped after decoding: {stages['invalid']} invalid, "
+          f"{stages['level']} other level, {stages['cleanse']} cleansed)")
+    print(f"Parsed: {stages['parsed']}")
+
+
+def scan_reports(runs, workers=1, dataset=None, store=None):
+    """Fill the accumulators of every run in one pass over the logs.
+
+    NDJSON day files are split into newline-aligned byte ranges and each range is read once
+    for all the runs whose date covers it; range results merge back in file order, so the
+    reports match a sequential scan. With a Parquet dataset each run is a pruned, projected
+    Arrow scan of its own instead.
+
+    With a RollupStore, recap-only runs take the counters of unchanged day files from the
+    store instead of scanning them, and every freshly counted recap is stored for next time.
+    """
+    if dataset is not None:
+        for run in runs:
+            expression = parquet_filter(run.date, run.iL, run.cleanse_data)
+            accumulators = run.new_accumulators(0)
+            for accumulator in accumulators.values():
+                accumulator.add_dataset(dataset, expression)
+                accumulator.close()
+            run.merge(0, 0, accumulators)
+        return
+    tasks = []
+    plan = []
+    reused = 0
+    for file, file_date in select_day_files(folder, None):
+        indexes = [index for index, run in enumerate(runs) if date_matches(run.date, file_date)]
+        if not indexes:
+            continue
+        if store is not None:
+            for index in [index for index in indexes if set(runs[index].accumulators) == {RecapAccumulator}]:
+                cached = store.load(file, selection_name(runs[index].iL, runs[index].cleanse_data))
+                if cached is not None:
+                    plan.append(("rollup", index, f"logs_{file_date}", cached))
+                    indexes.remove(index)
+                    reused += 1
+            if not indexes:
+                print("using rollups for file : ", file.name)
+                continue
+            # Fix the signature save() will store before any of the file is read
+            store.signature(file)
+        print("iterating through file : ", file.name)
+        ranges = split_ranges(file, workers)
+        for number, (start, end) in enumerate(ranges):
+            selections = [(runs[index].iL, runs[index].cleanse_data, runs[index].new_accumulators(len(tasks))) for index in indexes]
+            plan.append(("scan", file, indexes, len(tasks), number == len(ranges) - 1))
+            tasks.append((str(file), start, end, f"logs_{file_date}", selections))
+    results = run_ranges(scan_range, tasks, workers)
+    stages = dict.fromkeys(SCAN_STAGES, 0)
+    fresh = {}
+    # Rollups and scanned ranges merge in file order, so the reports keep their first-seen row order
+    for number, step in enumerate(plan):
+        if step[0] == "rollup":
+            _, index, log_date, (records, processed, counts) = step
+            accumulators = {RecapAccumulator: runs[index].new_recap(f"rollup{number}")}
+            for key, count in counts:
+                accumulators[RecapAccumulator].add_count(tuple(key), log_date, count)
+            runs[index].merge(records, processed, accumulators)
+            continue
+        _, file, indexes, task, last_range = step
+        range_stages, processed, partials = results[task]
+        for stage, count in range_stages.items():
+            stages[stage] += count
+        for index, run_processed, accumulators in zip(indexes, processed, partials):
+            if store is not None and RecapAccumulator in accumulators:
+                # The file's recap is gathered on its own, stored, then merged into the run
+                entry = fresh.setdefault((file, index), [0, 0, runs[index].new_recap(f"file{task}")])
+                entry[0] += range_stages["records"]
+                entry[1] += run_processed
+                entry[2].merge(accumulators.pop(RecapAccumulator))
+                if last_range:
+                    records, file_processed, accumulator = fresh.pop((file, index))
+                    counts = ((key, sum(by_date.values())) for key, by_date in accumulator.items())
+                    store.save(file, selection_name(runs[index].iL, runs[index].cleanse_data), records, file_processed, counts)
+                    runs[index].accumulators[RecapAccumulator].merge(accumulator)
+            runs[index].merge(range_stages["records"], run_processed, accumulators)
+    for run in runs:
+        if len(runs) > 1:
+            print(f"\n{run.file_name('').lstrip('_')}: {', '.join(run.reports)}")
+        print(f"\nTotal records in log: {run.total}")
+        print(f"Records Processed: {run.processed}")
+    if reused:
+        print(f"\nReused {reused} day rollup(s) from {store.folder}")
+    print_stages(stages)
+
+
+def selection_name(iL, cleanse_data):
+    return f"{'National' if iL == '1' else 'Internal'}{'_Cleansed' if cleanse_data else ''}"
+
+
+def rollup_store(with_hash=False):
+    """RollupStore of per-day recap counters for the NDJSON scans."""
+    return RollupStore(rollup_folder, RECAP_KEY, {"cleanse_words": CLEANSE_WORDS, "fields": LOG_FIELDS}, with_hash)
+
+
+def level_mapping(df_mapping, iL):
+    """InstansiIndex of account (National) or domain (Internal) to Nama Instansi.
+
+    Built through a dict as before: a repeated account keeps its first position and the
+    last row's name.
+    """
+    mapping = dict(zip(df_mapping["Akun Nasional" if iL == "1" else "Domain"], df_mapping["Nama Instansi"]))
+    return InstansiIndex(mapping.keys(), mapping.values())
+
+
+def run_reports(date, iL, cleanse_data, reports, workers=1, dataset=None):
+    run = ReportRun(date, iL, cleanse_data, reports)
+    scan_reports([run], workers, dataset, rollup_store() if dataset is None else None)
+    run.write(mapping_index.within)
+
+
+def get_logs_allDataset(date, iL, cleanse_data, workers=1, dataset=None):
+    run_reports(date, iL, cleanse_data, ["all_dataset"], workers, dataset)
+
+
+def recap(date, iL, cleanse_data, workers=1, dataset=None):
+    view_type = input("Choose view type:\n1. Aggregated \n2. Daily \n3. Overview (approximate, top consumers and distinct counts) \nView Type: ")
+    if view_type not in ["1", "2", "3"]:
         logging.error("Invalid view type selected")
         sys.exit(1)
-    for column_cells in ws.columns:
-        length = max(len(str(cell.value)) for cell in column_cells)
-        ws.column_dimensions[column_cells[0].column_letter].width = length + 2
-    wb.save(f"Report/{file_name}.xlsx")
+    run_reports(date, iL, cleanse_data, [{"1": "recap_aggregated", "2": "recap_daily", "3": "recap_overview"}[view_type]], workers, dataset)
 
 
-def calculate_max_concurrent_hits(date, iL, cleanse_data):
-    hits_per_second = defaultdict(int)
-    max_hits = 0
-    max_hits_timestamp = None
+def calculate_max_concurrent_hits(date, iL, cleanse_data, workers=1, dataset=None):
     print("Calculating concurrent hits...")
-    for timestamp, log_line, log_date in iterate_logs(date, iL, cleanse_data):
+    run_reports(date, iL, cleanse_data, ["concurrent_hits"], workers, dataset)
+
+
+def latency_percentiles(date, iL, cleanse_data, workers=1, dataset=None):
+    print("Calculating latency percentiles...")
+    run_reports(date, iL, cleanse_data, ["latency"], workers, dataset)
+
+
+def parse_date(text):
+    """None for 'all', 'YYYY-MM-DD' as given, or a (start, end) tuple for 'YYYY-MM-DD//YYYY-MM-DD'."""
+    text = str(text).strip()
+    if text.lower() == "all":
+        return None
+    if "//" not in text:
+        pd.to_datetime(text, format="%Y-%m-%d")
+        return text
+    start_date, end_date = (pd.to_datetime(part, format="%Y-%m-%d") for part in text.split("//", 1))
+    if start_date >= end_date:
+        raise ValueError("Invalid Date Range: Start date must be before end date")
+    return (start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
+
+
+def as_list(value):
+    return value if isinstance(value, list) else [value]
+
+
+def load_jobs(spec):
+    """Expand the JOBS of a batch spec into ReportRuns, one per date x level x cleanse.
+
+    Jobs asking for the same selection share one run, so its records are only filtered and
+    counted once for all their reports.
+    """
+    selections = {}
+    for job in spec.get("JOBS") or []:
         try:
-            dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-            second_key = dt.strftime('%Y-%m-%d %H:%M:%S')
-            hits_per_second[second_key] += 1
-            if hits_per_second[second_key] > max_hits:
-                max_hits = hits_per_second[second_key]
-                max_hits_timestamp = second_key
-        except Exception as e:
-            logging.warning(f"Failed to process timestamp: {timestamp} - {str(e)}")
-            continue
-    file_name = f"concurrent_hits_{('_' + date) if isinstance(date, str) else ('_' + '-'.join(date)) if isinstance(date, tuple) else ''}_{'National' if iL == '1' else 'Internal'}"
-    with open(f'Report/{file_name}.csv', 'w', encoding='utf-8', newline='') as outfile:
-        writer = csv.writer(outfile)
-        writer.writerow(['Timestamp', 'Hits'])
-        for timestamp, hits in sorted(hits_per_second.items()):
-            writer.writerow([timestamp, hits])
-    print(f"\nMaximum concurrent hits: {max_hits}")
-    print(f"Timestamp of maximum hits: {max_hits_timestamp}")
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Concurrent Hits Summary"
-    ws.append(['Metric', 'Value'])
-    ws.append(['Maximum Concurrent Hits', max_hits])
-    ws.append(['Timestamp of Maximum Hits', max_hits_timestamp])
-    ws.append(['Total Unique Seconds', len(hits_per_second)])
-    ws.append(['Average Hits per Second', sum(hits_per_second.values()) / len(hits_per_second)])
-    for column_cells in ws.columns:
-        length = max(len(str(cell.value)) for cell in column_cells)
-        ws.column_dimensions[column_cells[0].column_letter].width = length + 2
-    wb.save(f"Report/{file_name}_summary.xlsx")
+            date = parse_date(job.get("DATE", "all"))
+        except ValueError as e:
+            logging.error(f"Invalid DATE {job.get('DATE')!r}: {e}")
+            sys.exit(1)
+        reports = as_list(job.get("REPORTS", list(REPORT_ACCUMULATORS)))
+        for report in reports:
+            if report not in REPORT_ACCUMULATORS:
+                logging.error(f"Unknown report {report!r}, expected one of: {', '.join(REPORT_ACCUMULATORS)}")
+                sys.exit(1)
+        for level in as_list(job.get("LEVEL", list(LEVELS))):
+            if level not in LEVELS:
+                logging.error(f"Unknown LEVEL {level!r}, expected National or Internal")
+                sys.exit(1)
+            for cleanse_data in as_list(job.get("CLEANSE", False)):
+                selection = selections.setdefault((date, LEVELS[level], bool(cleanse_data)), [])
+                selection += [report for report in reports if report not in selection]
+    memory_mb = spec.get("RECAP_MEMORY_MB", RECAP_MEMORY_MB)
+    report_format = str(spec.get("FORMAT", REPORT_FORMAT)).lower()
+    if report_format not in REPORT_WRITERS:
+        logging.error(f"Unknown FORMAT {report_format!r}, expected one of: {', '.join(REPORT_WRITERS)}")
+        sys.exit(1)
+    return [ReportRun(date, iL, cleanse_data, reports, "_Cleansed" if cleanse_data else "", memory_mb, report_format)
+            for (date, iL, cleanse_data), reports in selections.items()]
+
+
+def run_batch(spec_file, df_mapping):
+    """Produce every report of a job spec without prompts, reading the logs once."""
+    with open(spec_file) as f:
+        spec = yaml.safe_load(f)
+    runs = load_jobs(spec)
+    if not runs:
+        logging.error(f"No JOBS in {spec_file}")
+        sys.exit(1)
+    source = str(spec.get("SOURCE", "ndjson")).lower()
+    if source not in ["ndjson", "parquet"]:
+        logging.error("Invalid SOURCE, expected ndjson or parquet")
+        sys.exit(1)
+    source_folder = folder if source == "ndjson" else parquet_folder
+    if not source_folder.exists() or not any(source_folder.iterdir()):
+        print("folder berisi logs tidak ditemukan")
+        sys.exit()
+    workers = int(spec.get("WORKERS") or os.cpu_count() or 1)
+    dataset = open_dataset(parquet_folder) if source == "parquet" else None
+    print(f"{len(runs)} selection(s), {sum(len(run.reports) for run in runs)} report(s) from one scan")
+    store = rollup_store(bool(spec.get("ROLLUP_HASH", False))) if dataset is None and spec.get("ROLLUPS", True) else None
+    scan_reports(runs, workers, dataset, store)
+    mappings = {iL: level_mapping(df_mapping, iL) for iL in LEVELS.values()}
+    for run in runs:
+        run.write(mappings[run.iL].within)
 
     
 if __name__ == "__main__":
     report_dir = Path("Report")
     if not report_dir.exists():
         os.makedirs(report_dir)
+    parser = argparse.ArgumentParser(description="SPLP log reports; prompts for one report unless --batch is given")
+    parser.add_argument("--batch", metavar="JOB_SPEC", help="YAML job spec (see report_jobs.yaml) to produce every listed report from one scan")
+    args = parser.parse_args()
+    if args.batch:
+        if not Path("mapping.xlsx").exists():
+            logging.error("mapping.xlsx file not found")
+            sys.exit(1)
+        run_batch(args.batch, pd.read_excel("mapping.xlsx"))
+        sys.exit()
+    source = input("1. NDJSON Logs\n2. Parquet Dataset\nSource : ")
+    if source not in ["1", "2"]:
+        logging.error("Invalid Source")
+        sys.exit(1)
+    source_folder = folder if source == "1" else parquet_folder
+    if not source_folder.exists() or not any(source_folder.iterdir()):
+        print("folder berisi logs tidak ditemukan")
+        sys.exit()
     if not Path("mapping.xlsx").exists():
         logging.error("mapping.xlsx file not found")
         sys.exit(1)
+    df_mapping = pd.read_excel("mapping.xlsx")
     time_range = input("1. All Date\n2. Single Date\n3. Date Range\nTime Range : ")
     if time_range == "1":
         date = None
@@ -262,26 +559,31 @@ if __name__ == "__main__":
         logging.error("Invalid Time Range")
         sys.exit(1)
     iL = input("1. National\n2. Internal\nInteroperability Level : ")
-    if iL == "1":
-        mapping_dict = dict(zip(df_mapping["Akun Nasional"], df_mapping["Nama Instansi"]))
-    elif iL == "2":
-        mapping_dict = dict(zip(df_mapping["Domain"], df_mapping["Nama Instansi"]))
-    else:
+    if iL not in ["1", "2"]:
         logging.error("Invalid Log Type")
         sys.exit(1)
+    mapping_index = level_mapping(df_mapping, iL)
     cleanse_data_input = input("Cleanse Data ? (Y/n): ")
     if cleanse_data_input.lower() not in ['y', 'n']:
         logging.error("Invalid Input")
         sys.exit(1)
     else:
         cleanse_data = cleanse_data_input.lower() == "y"
-    log_type = input("1. All Dataset\n2. Recap\n3. Concurrent Hits\nLog Type : ")
+    log_type = input("1. All Dataset\n2. Recap\n3. Concurrent Hits\n4. Latency\nLog Type : ")
+    if log_type not in ["1", "2", "3", "4"]:
+        logging.error("Invalid Log Type")
+        sys.exit(1)
+    if source == "1":
+        workers = get_worker_count()
+        dataset = None
+    else:
+        workers = 1
+        dataset = open_dataset(parquet_folder)
     if log_type == "1":
-        get_logs_allDataset(date, iL, cleanse_data)
+        get_logs_allDataset(date, iL, cleanse_data, workers, dataset)
     elif log_type == "2":
-        recap(date, iL, cleanse_data)
+        recap(date, iL, cleanse_data, workers, dataset)
     elif log_type == "3":
-        calculate_max_concurrent_hits(date, iL, cleanse_data)
+        calculate_max_concurrent_hits(date, iL, cleanse_data, workers, dataset)
     else:
-        logging.error("Invalid Log Type")
-        sys.exit(1)
\ No newline at end of file
+        latency_percentiles(date, iL, cleanse_data, workers, dataset)
@@ -0,0 +1,94 @@
+"""The Parquet dataset and the NDJSON day files it was converted from give identical recap workbooks."""
+import os
+import pathlib
+import random
+import shutil
+
+import openpyxl
+import pytest
+
+import fake_loki
+import splp_logs_analyze
+from convert_ndjson_to_parquet import convert_file
+from parquet_reports import open_dataset
+from splp_logs_analyze import ReportRun, scan_reports
+
+DAYS = ["2025-06-16", "2025-06-17"]
+RECORDS_PER_DAY = 8000
+REPO_DIR = pathlib.Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture(scope="module")
+def day_files(tmp_path_factory):
+    """(NDJSON folder, Parquet folder) holding the same synthetic days."""
+    root = tmp_path_factory.mktemp("logs")
+    ndjson, parquet = root / "ndjson", root / "parquet"
+    ndjson.mkdir()
+    parquet.mkdir()
+    rnd = random.Random(0)
+    for number, day in enumerate(DAYS):
+        start = (1750032000 + number * 86400) * 10**9
+        path = ndjson / f"logs_{day}.txt"
+        with open(path, "w", encoding="utf-8") as f:
+            for i in range(RECORDS_PER_DAY):
+                f.write(fake_loki.make_line(rnd, start + i * 2 * 10**9) + "\n")
+        convert_file(str(path), str(parquet), {})
+    return ndjson, parquet
+
+
+@pytest.fixture(scope="module")
+def fetched_files(tmp_path_factory):
+    """(NDJSON archive folder, Parquet export folder) of one get_logs_parquet run against fake_loki.
+
+    The export root holds the checkpoint manifest, plus a copy under its old manifest.json name
+    and an unfinished day file as a crashed run leaves them.
+    """
+    root = tmp_path_factory.mktemp("fetched")
+    ndjson, parquet = root / "ndjson", root / "parquet"
+    server = fake_loki.start_server(port=0, peak_per_hour=1500)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.chdir(REPO_DIR)
+        import get_loki_logs
+        for key, value in {"LOKI_URL": f"http://127.0.0.1:{server.server_address[1]}/loki/api/v1/query_range",
+                           "LOG_DIR_PARQUET": str(parquet), "LOG_DIR_NDJSON": str(ndjson), "ARCHIVE_NDJSON": True,
+                           "NDJSON_COMPRESSION": "none", "BACKOFF_SECONDS": 0.1}.items():
+            mp.setitem(get_loki_logs.config['CONFIG'], key, value)
+        get_loki_logs.get_logs_parquet(f"{DAYS[0]}T00:00:00Z", f"{DAYS[-1]}T23:59:59Z")
+    server.shutdown()
+    assert (parquet / get_loki_logs.MANIFEST_FILE).exists()
+    shutil.copy(parquet / get_loki_logs.MANIFEST_FILE, parquet / "manifest.json")
+    (parquet / f"day={DAYS[0]}" / "_logs.parquet.partial").write_bytes(b"PAR1 no footer")
+    return ndjson, parquet
+
+
+def workbook_cells(path):
+    wb = openpyxl.load_workbook(path)
+    return [(ws.title, [list(row) for row in ws.iter_rows(values_only=True)]) for ws in wb]
+
+
+def write_recaps(folder, dataset, iL, cleanse_data):
+    """Recap workbooks of one selection, written into folder/Report: {file name: cells}."""
+    os.makedirs(folder / "Report")
+    os.chdir(folder)
+    run = ReportRun(tuple(DAYS), iL, cleanse_data, ["recap_aggregated", "recap_daily"])
+    scan_reports([run], 1, dataset)
+    run.write(lambda account: "Tidak Terdaftar")
+    return {name: workbook_cells(folder / "Report" / name) for name in sorted(os.listdir(folder / "Report"))}
+
+
+@pytest.mark.parametrize("source", ["day_files", "fetched_files"], ids=["converted", "fetched"])
+@pytest.mark.parametrize("listing", [sorted, lambda entries: sorted(entries, reverse=True)], ids=["sorted", "reversed"])
+@pytest.mark.parametrize("iL, cleanse_data", [("1", False), ("2", True)])
+def test_recap_workbooks_match(request, source, tmp_path, monkeypatch, iL, cleanse_data, listing):
+    ndjson, parquet = request.getfixturevalue(source)
+    monkeypatch.setattr(splp_logs_analyze, "folder", ndjson)
+    # Day files are read in date order however the filesystem happens to list them
+    iterdir = pathlib.Path.iterdir
+    monkeypatch.setattr(pathlib.Path, "iterdir", lambda path: iter(listing(iterdir(path))))
+    monkeypatch.chdir(tmp_path)
+    from_ndjson = write_recaps(tmp_path / "ndjson", None, iL, cleanse_data)
+    from_parquet = write_recaps(tmp_path / "parquet", open_dataset(parquet), iL, cleanse_data)
+    assert list(from_ndjson) == list(from_parquet) and len(from_ndjson) == 2
+    for name in from_ndjson:
+        assert len(from_ndjson[name][0][1]) > 500
+        assert from_ndjson[name] == from_parquet[name], name
@@ -0,0 +1,121 @@
+"""The raw-byte prefilter of scan_range keeps exactly the records decode-first filtering keeps."""
+import json
+import random
+
+import pytest
+
+import fake_loki
+from report_accumulators import AllDatasetAccumulator, RecapAccumulator, ConcurrentHitsAccumulator
+from splp_logs_analyze import scan_range
+
+SELECTIONS = [("1", False), ("1", True), ("2", False), ("2", True)]
+TIME = "2025-06-16T01:02:03.456789012Z"
+
+
+def metric_fields(**changes):
+    """The Metric Value fields of one fake_loki record as an ordered dict, with changes applied."""
+    line = json.loads(fake_loki.make_line(random.Random(1), 1750035723 * 10**9))["log"]
+    block = line[line.index("Metric Value: {") + len("Metric Value: {"):line.rindex("}")]
+    fields = dict(piece.split("=", 1) for piece in block.split(", ") if "=" in piece)
+    fields.update(apiCreatorTenantDomain="carbon.super", apiCreator="creator1", applicationOwner="owner1",
+                  applicationName="portal", proxyResponseCode="200", targetResponseCode="200")
+    fields.update(changes)
+    return fields
+
+
+def log_text(fields, order=None):
+    names = order or list(fields)
+    names += [name for name in fields if name not in names]
+    return ("[2025-06-16 01:02:03,456]  INFO {org.wso2.am.analytics.publisher.reporter.log.LogCounterMetric} - "
+            "Metric Name: apim:response, Metric Value: {" + ", ".join(f"{name}={fields[name]}" for name in names) + "}\n")
+
+
+def record(log, ensure_ascii=True, keys=("log", "stream", "time"), **extra):
+    values = {"log": log, "stream": "stdout", "time": TIME, **extra}
+    return json.dumps({key: values[key] for key in list(keys) + list(extra)}, ensure_ascii=ensure_ascii)
+
+
+def national_and_internal(**changes):
+    return [log_text(metric_fields(**changes)),
+            log_text(metric_fields(apiCreatorTenantDomain="kemenkeu.go.id", apiCreator="creator1@kemenkeu.go.id", **changes))]
+
+
+ESCAPED_QUOTES = [record(log) for log in national_and_internal(applicationName='"quoted"-app')] + [
+    record(log_text(metric_fields(apiCreatorTenantDomain='carbon.super"'))),
+    record(log_text(metric_fields(apiCreatorTenantDomain='"carbon.super"'))),
+    record(log_text(metric_fields(applicationName='say \\"test\\"'))),
+    record(log_text(metric_fields(apiName='api-"admin"'))),
+]
+
+UNICODE_ESCAPES = [record(log, ensure_ascii) for log in national_and_internal(applicationName="démo-app")
+                   for ensure_ascii in (True, False)] + [
+    record(log_text(metric_fields(applicationName="app-é"))).replace("portal", "p\\u006frtal"),
+    record(log_text(metric_fields(applicationName="tes-app"))).replace("tes-app", "tes\\u0074-app"),
+    record(log_text(metric_fields())).replace("=carbon.super", "=carbon\\u002esuper"),
+    record(log_text(metric_fields(apiCreatorTenantDomain="kemenkeu.go.id"))).replace("=kemenkeu", "=\\u0063arbon.super-kemenkeu"),
+    record(log_text(metric_fields(applicationName="é́中"))),
+]
+
+FIELD_NAMES_IN_VALUES = [
+    # Another field's name and a tenant inside a value that comes before the real field
+    record(log_text(metric_fields(applicationName="apiCreatorTenantDomain=carbon.super", apiCreatorTenantDomain="kemenkeu.go.id"),
+                    order=["applicationName"])),
+    record(log_text(metric_fields(applicationName="apiCreatorTenantDomain=kemenkeu.go.id"), order=["applicationName"])),
+    record(log_text(metric_fields(userAgent="x apiCreatorTenantDomain=carbon.super", apiCreatorTenantDomain="bps.go.id"),
+                    order=["userAgent"])),
+    # ... and after it
+    record(log_text(metric_fields(applicationName="apiCreatorTenantDomain=kemenkeu.go.id"))),
+    record(log_text(metric_fields(applicationOwner="apiCreator=owner1", apiCreator="owner1"))),
+    record(log_text(metric_fields(applicationName="applicationName=test", applicationOwner="x userIp=1.2.3.4"))),
+    # In a JSON value outside the log string
+    record(log_text(metric_fields(apiCreatorTenantDomain="kemenkeu.go.id")), keys=("stream", "time", "log"))
+    .replace('"stdout"', '"apiCreatorTenantDomain=carbon.super"'),
+    record(log_text(metric_fields()), keys=("time", "log", "stream")).replace('"stdout"', '"test"'),
+]
+
+REORDERED_KEYS = [record(log, keys=keys) for log in national_and_internal()
+                  for keys in (("time", "stream", "log"), ("stream", "log", "time"), ("log", "time", "stream"))] + [
+    record(log_text(metric_fields(), order=["apiCreatorTenantDomain", "applicationName", "apiCreator"])),
+    record(log_text(metric_fields(apiCreatorTenantDomain="kemenkeu.go.id"), order=list(reversed(metric_fields())))),
+    record(log_text(metric_fields(applicationName="dummy"), order=["applicationName", "apiCreatorTenantDomain"])),
+    record(log_text(metric_fields()), keys=("time", "stream", "log"), tag="demo"),
+]
+
+
+def scan(path, tmp_path, prefilter):
+    selections = []
+    for index, (iL, cleanse_data) in enumerate(SELECTIONS):
+        part_file = tmp_path / f"{'raw' if prefilter else 'decoded'}_{index}.csv"
+        selections.append((iL, cleanse_data, {AllDatasetAccumulator: AllDatasetAccumulator(str(part_file)),
+                                               RecapAccumulator: RecapAccumulator(),
+                                               ConcurrentHitsAccumulator: ConcurrentHitsAccumulator()}))
+    _, processed, accumulators = scan_range(str(path), 0, path.stat().st_size, "logs_2025-06-16", selections, prefilter)
+    rows = []
+    for partial in accumulators:
+        all_dataset = open(partial[AllDatasetAccumulator].part_files[0], encoding="utf-8").read().splitlines()
+        rows.append((all_dataset, list(partial[RecapAccumulator].items()), partial[ConcurrentHitsAccumulator].hits_per_second()))
+    return processed, rows
+
+
+@pytest.mark.parametrize("records", [ESCAPED_QUOTES, UNICODE_ESCAPES, FIELD_NAMES_IN_VALUES, REORDERED_KEYS],
+                         ids=["escaped_quotes", "unicode_escapes", "field_names_in_values", "reordered_keys"])
+def test_prefilter_matches_decode_first(tmp_path, records):
+    rnd = random.Random(0)
+    path = tmp_path / "logs_2025-06-16.txt"
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(200):
+            f.write(fake_loki.make_line(rnd, 1750032000 * 10**9 + i * 10**8) + "\n")
+        for line in records:
+            f.write(line + "\n")
+    decoded = scan(path, tmp_path, prefilter=False)
+    raw = scan(path, tmp_path, prefilter=True)
+    assert raw[0] == decoded[0]
+    for selection, raw_rows, decoded_rows in zip(SELECTIONS, raw[1], decoded[1]):
+        assert raw_rows == decoded_rows, selection
+
+
+@pytest.mark.parametrize("line", ESCAPED_QUOTES + UNICODE_ESCAPES + FIELD_NAMES_IN_VALUES + REORDERED_KEYS)
+def test_each_awkward_record(tmp_path, line):
+    path = tmp_path / "logs_2025-06-16.txt"
+    path.write_text(line + "\n", encoding="utf-8")
+    assert scan(path, tmp_path, prefilter=True) == scan(path, tmp_path, prefilter=False)